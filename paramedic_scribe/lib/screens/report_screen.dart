@@ -296,6 +296,7 @@ class _ReportScreenState extends State<ReportScreen>
             .searchAttributesWithContext(
           widget.prompt!,
           protocolName: widget.protocolName,
+          pathwayId: selectedProtocol?.conditionId,
         );
         for (final attrPath in searchResults) {
           if (!existingIds.contains(attrPath)) {
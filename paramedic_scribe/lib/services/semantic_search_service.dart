@@ -13,6 +13,13 @@ class SemanticSearchService {
     return 'http://localhost:8000';
   }
 
+  // Sent as X-Deadline-Ms so the server drops work we have already given up on.
+  static const _requestTimeout = Duration(seconds: 10);
+  static final _headers = {
+    'Content-Type': 'application/json',
+    'X-Deadline-Ms': '${_requestTimeout.inMilliseconds}',
+  };
+
   /// Check if the semantic search API is available.
   Future<bool> isAvailable() async {
     try {
@@ -32,14 +39,17 @@ class SemanticSearchService {
   }
 
   /// Search with additional protocol context for better relevance.
+  /// When [pathwayId] (the protocol's condition id) is given, the server re-weights
+  /// results with its pathway prior, so the prompt is sent unchanged.
   Future<List<String>> searchAttributesWithContext(
     String prompt, {
     String? protocolName,
+    String? pathwayId,
     int limit = 20,
   }) async {
     try {
-      // Build the query text, optionally including protocol context
-      final queryText = protocolName != null
+      // Without a pathway id, fall back to appending the protocol name to the query
+      final queryText = pathwayId == null && protocolName != null
           ? '$prompt. Protocol: $protocolName'
           : prompt;
 
@@ -48,14 +58,17 @@ class SemanticSearchService {
       final response = await http
           .post(
             Uri.parse('$_baseUrl/suggest'),
-            headers: {'Content-Type': 'application/json'},
+            headers: _headers,
             body: jsonEncode({
               'text': queryText,
               'max_results': limit,
               'min_results': 3,
+              // Only ids are read; the server skips titles, scores and explanations.
+              'view': 'ids',
+              if (pathwayId != null) 'pathway_id': pathwayId,
             }),
           )
-          .timeout(const Duration(seconds: 10));
+          .timeout(_requestTimeout);
 
       if (response.statusCode == 200) {
         final data = jsonDecode(response.body) as Map<String, dynamic>;
@@ -81,13 +94,13 @@ class SemanticSearchService {
       final response = await http
           .post(
             Uri.parse('$_baseUrl/pathways/suggest'),
-            headers: {'Content-Type': 'application/json'},
+            headers: _headers,
             body: jsonEncode({
               'text': prompt,
               'min_score': 0.35,
             }),
           )
-          .timeout(const Duration(seconds: 10));
+          .timeout(_requestTimeout);
 
       if (response.statusCode == 200) {
         final data = jsonDecode(response.body) as Map<String, dynamic>;
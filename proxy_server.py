@@ -1,27 +1,319 @@
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import hashlib
 import json
+import os
+import signal
+import sys
+import threading
+import time
 import urllib.request
 import urllib.error
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'semantic_search_backend'))
+try:
+    import audio  # Needs numpy; without it /transcribe uploads are forwarded as-is.
+except ImportError:
+    audio = None
+try:
+    import request_log  # Structured, non-blocking request records; without it requests are printed.
+except ImportError:
+    request_log = None
+
+# Followers wait at most this long for an identical in-flight request to finish.
+FOLLOWER_TIMEOUT = float(os.getenv('PROXY_FOLLOWER_TIMEOUT', '90'))
+# Overridable so load tests can point at local stand-ins (semantic_search_backend/stub_upstreams.py).
+CLAUDE_URL = os.getenv('CLAUDE_URL', 'https://api.anthropic.com/v1/messages')
+ELEVENLABS_URL = os.getenv('ELEVENLABS_URL', 'https://api.elevenlabs.io/v1/speech-to-text')
+PORT = int(os.getenv('PROXY_PORT', '8080'))
+# Downmix/resample WAV uploads to 16 kHz mono before forwarding them to speech-to-text.
+TRANSCRIBE_NORMALIZE = os.getenv('TRANSCRIBE_NORMALIZE', '1') == '1' and audio is not None
+# WAV uploads longer than this are split at pauses and the pieces transcribed in parallel (0 disables).
+TRANSCRIBE_CHUNK_S = float(os.getenv('TRANSCRIBE_CHUNK_S', '60')) if audio is not None else 0.0
+TRANSCRIBE_WORKERS = int(os.getenv('TRANSCRIBE_WORKERS', '8'))  # Shared by all uploads.
+TRANSCRIBE_RETRIES = int(os.getenv('TRANSCRIBE_RETRIES', '2'))
+TRANSCRIBE_RETRY_BACKOFF_S = float(os.getenv('TRANSCRIBE_RETRY_BACKOFF_S', '0.5'))  # Doubles per attempt.
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class SingleFlight:
+    """Coalesce identical in-flight upstream calls: one leader calls, followers share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.stats = {'upstream_calls': 0, 'coalesced': 0, 'follower_timeouts': 0}
+
+    def do(self, key, fn, timeout):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self.stats['upstream_calls'] += 1
+        if leader:
+            try:
+                flight.result = fn()
+            except Exception as e:
+                flight.result = (502, 'application/json', json.dumps({'error': str(e)}).encode())
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+            return flight.result, False
+        if not flight.done.wait(timeout):
+            with self._lock:
+                self.stats['follower_timeouts'] += 1
+            return None, True
+        with self._lock:
+            self.stats['coalesced'] += 1
+        return flight.result, True
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, 'in_flight': len(self._flights)}
+
+
+FLIGHTS = SingleFlight()
+
+
+class AudioStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {
+            'files': 0, 'errors': 0, 'bytes_in': 0, 'bytes_out': 0, 'audio_s': 0.0, 'cpu_ms': 0.0,
+            'chunked_uploads': 0, 'chunks': 0, 'chunk_retries': 0, 'chunk_failures': 0,
+        }
+
+    def record(self, bytes_in, bytes_out, audio_s=0.0, cpu_ms=0.0, error=False):
+        with self._lock:
+            self.stats['files'] += 1
+            self.stats['errors'] += error
+            self.stats['bytes_in'] += bytes_in
+            self.stats['bytes_out'] += bytes_out
+            self.stats['audio_s'] += audio_s
+            self.stats['cpu_ms'] += cpu_ms
+
+    def add(self, name, n=1):
+        with self._lock:
+            self.stats[name] += n
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['enabled'] = TRANSCRIBE_NORMALIZE
+        stats['cpu_ms'] = round(stats['cpu_ms'], 1)
+        stats['bytes_saved'] = stats['bytes_in'] - stats['bytes_out']
+        stats['cpu_ms_per_audio_s'] = round(stats['cpu_ms'] / stats['audio_s'], 2) if stats['audio_s'] else None
+        return stats
+
+
+AUDIO = AudioStats()
+REQUEST_LOG = request_log.RequestLog() if request_log is not None else None
+TRANSCRIBE_POOL = ThreadPoolExecutor(max_workers=TRANSCRIBE_WORKERS, thread_name_prefix='transcribe')
+
+
+def _normalize_wav(content):
+    start = time.thread_time()
+    try:
+        out, seconds = audio.normalize_wav(content)
+    except (ValueError, EOFError) as e:
+        print(f'[proxy] forwarding WAV unchanged: {e}')
+        AUDIO.record(len(content), len(content), error=True)
+        return content
+    if len(out) >= len(content):  # Already 16 kHz mono 16-bit (or smaller): keep the original.
+        out = content
+    AUDIO.record(len(content), len(out), seconds, (time.thread_time() - start) * 1000)
+    return out
+
+
+def _normalize_upload(headers, body):
+    boundary = audio.multipart_boundary(headers.get('Content-Type', ''))
+    if boundary is None:
+        return body
+    return audio.rewrite_wav_parts(body, boundary, _normalize_wav)
+
+
+def _request_key(path, headers, body):
+    # Multipart boundaries are random per upload; drop them so retried uploads match.
+    ct = headers.get('Content-Type', '')
+    if 'boundary=' in ct:
+        boundary = ct.split('boundary=', 1)[1].split(';', 1)[0].strip().strip('"')
+        if boundary:
+            ct = ct.replace(boundary, '')
+            body = body.replace(boundary.encode('latin-1'), b'')
+    digest = hashlib.sha256()
+    for part in (path, ct, *(v for k, v in sorted(headers.items()) if k != 'Content-Type')):
+        digest.update(part.encode() + b'\0')
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def _forward(url, headers, body):
+    try:
+        req = urllib.request.Request(url, data=body, headers=headers, method='POST')
+        with urllib.request.urlopen(req) as resp:
+            return resp.status, resp.headers.get('Content-Type', 'application/json'), resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, 'application/json', e.read()
+
+
+def _forward_retrying(url, headers, body):
+    for attempt in range(TRANSCRIBE_RETRIES + 1):
+        if attempt:
+            AUDIO.add('chunk_retries')
+            time.sleep(TRANSCRIBE_RETRY_BACKOFF_S * 2 ** (attempt - 1))
+        try:
+            result = _forward(url, headers, body)
+        except OSError as e:
+            result = (502, 'application/json', json.dumps({'error': str(e)}).encode())
+        if result[0] != 429 and result[0] < 500:
+            break
+    return result
+
+
+def _stitch(spans, rate, results):
+    """One ElevenLabs-shaped transcript from per-chunk results, with word timings shifted to the recording."""
+    merged, texts, words, chunks, failed = {}, [], [], [], None
+    for idx, ((start, end), (status, _, raw)) in enumerate(zip(spans, results)):
+        offset = start / rate
+        chunk = {'index': idx, 'start': round(offset, 3), 'end': round(end / rate, 3)}
+        try:
+            data = json.loads(raw) if status == 200 else None
+        except ValueError:
+            data = None
+        if data is None:
+            chunk['error'] = status
+            failed = failed or (status if status != 200 else 502, raw)
+        else:
+            merged = merged or {k: v for k, v in data.items() if k not in ('text', 'words')}
+            chunk['text'] = data.get('text', '').strip()
+            texts.append(chunk['text'])
+            for word in data.get('words') or ():
+                words.append({**word, **{k: round(word[k] + offset, 3) for k in ('start', 'end') if k in word}})
+        chunks.append(chunk)
+    merged.update(text=' '.join(t for t in texts if t), chunks=chunks)
+    if words:
+        merged['words'] = words
+    if failed:
+        # Keep what was transcribed; the client can retry the whole upload.
+        AUDIO.add('chunk_failures', sum('error' in c for c in chunks))
+        merged['error'] = 'Some chunks failed to transcribe: ' + failed[1].decode('utf-8', 'replace')[:200]
+        return failed[0], 'application/json', json.dumps(merged).encode()
+    return 200, 'application/json', json.dumps(merged).encode()
+
+
+def _transcribe_piece(url, headers, before, mono, rate, after):
+    """(upstream result, encoded WAV size, CPU ms spent encoding) for one chunk."""
+    start = time.thread_time()
+    if TRANSCRIBE_NORMALIZE and rate > audio.TARGET_RATE:
+        mono, rate = audio.resample(mono, rate, audio.TARGET_RATE), audio.TARGET_RATE
+    piece = audio.encode_wav(mono, rate)
+    cpu_ms = (time.thread_time() - start) * 1000
+    return _forward_retrying(url, headers, before + piece + after), len(piece), cpu_ms
+
+
+def _transcribe_chunked(url, headers, body):
+    """Split a long single-WAV upload at pauses and transcribe the pieces concurrently, or None."""
+    boundary = audio.multipart_boundary(headers.get('Content-Type', ''))
+    split = audio.single_wav_part(body, boundary) if boundary else None
+    if split is None:
+        return None
+    before, content, after = split
+    start = time.thread_time()
+    try:
+        pcm = audio.decode_wav(content)
+    except (ValueError, EOFError):
+        return None
+    if pcm.seconds <= TRANSCRIBE_CHUNK_S:
+        return None
+    # Pauses are found on the source-rate mono; each pool task resamples and encodes its own piece.
+    mono = audio.downmix(pcm)
+    spans = audio.split_on_silence(mono, pcm.rate, TRANSCRIBE_CHUNK_S)
+    AUDIO.add('chunked_uploads')
+    AUDIO.add('chunks', len(spans))
+    split_ms = (time.thread_time() - start) * 1000
+    futures = [
+        TRANSCRIBE_POOL.submit(_transcribe_piece, url, headers, before, mono[a:b], pcm.rate, after) for a, b in spans
+    ]
+    results = [f.result() for f in futures]
+    if TRANSCRIBE_NORMALIZE:
+        AUDIO.record(len(content), sum(size for _, size, _ in results), pcm.seconds, split_ms + sum(ms for _, _, ms in results))
+    return _stitch(spans, pcm.rate, [result for result, _, _ in results])
+
+
+def _request_record(path, body, status, coalesced, bytes_out, wall, marks):
+    """Built on the log writer thread: the request itself only queues the raw pieces."""
+    stages = {name: round((end - start) * 1000, 2) for name, start, end in zip(('read', 'upstream', 'send'), marks, marks[1:])}
+    record = {
+        't': round(wall, 3),
+        'path': path,
+        'status': status,
+        'latency_ms': round((marks[-1] - marks[0]) * 1000, 2),
+        'stages_ms': stages,
+        'coalesced': coalesced,
+        'bytes_in': len(body),
+        'bytes_out': bytes_out,
+    }
+    if path == '/claude':
+        record.update(request_log.claude_fields(body))
+    elif path == '/transcribe':
+        record['audio_s'] = request_log.wav_seconds(body)
+    return record
+
+
+def _forward_transcribe(url, headers, body):
+    if TRANSCRIBE_CHUNK_S > 0:
+        result = _transcribe_chunked(url, headers, body)
+        if result is not None:
+            return result
+    if TRANSCRIBE_NORMALIZE:
+        body = _normalize_upload(headers, body)
+    return _forward(url, headers, body)
+
+
 class ProxyHandler(BaseHTTPRequestHandler):
     def do_OPTIONS(self):
         self.send_response(200)
         self._cors_headers()
         self.end_headers()
 
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_response(404)
+            self._cors_headers()
+            self.end_headers()
+            self.wfile.write(b'Not found')
+            return
+        metrics = {
+            'singleflight': FLIGHTS.snapshot(),
+            'audio': AUDIO.snapshot(),
+            'request_log': REQUEST_LOG.snapshot() if REQUEST_LOG is not None and REQUEST_LOG.enabled else None,
+        }
+        self._send(200, 'application/json', json.dumps(metrics).encode())
+
     def do_POST(self):
+        wall, marks = time.time(), [time.perf_counter()]
         content_length = int(self.headers.get('Content-Length', 0))
         body = self.rfile.read(content_length)
+        marks.append(time.perf_counter())
 
+        forward = _forward
         if self.path == '/claude':
-            url = 'https://api.anthropic.com/v1/messages'
+            url = CLAUDE_URL
             headers = {
                 'Content-Type': 'application/json',
                 'x-api-key': self.headers.get('x-api-key', ''),
                 'anthropic-version': self.headers.get('anthropic-version', '2023-06-01'),
             }
         elif self.path == '/transcribe':
-            url = 'https://api.elevenlabs.io/v1/speech-to-text'
+            url = ELEVENLABS_URL
             headers = {
                 'xi-api-key': self.headers.get('xi-api-key', ''),
             }
@@ -29,46 +321,62 @@ class ProxyHandler(BaseHTTPRequestHandler):
             ct = self.headers.get('Content-Type', '')
             if ct:
                 headers['Content-Type'] = ct
+            forward = _forward_transcribe
         else:
             self.send_response(404)
             self._cors_headers()
             self.end_headers()
             self.wfile.write(b'Not found')
+            self._log_request(body, 404, None, 0, wall, marks + [time.perf_counter()] * 2)
             return
 
-        try:
-            req = urllib.request.Request(url, data=body, headers=headers, method='POST')
-            with urllib.request.urlopen(req) as resp:
-                resp_body = resp.read()
-                self.send_response(resp.status)
-                self._cors_headers()
-                self.send_header('Content-Type', resp.headers.get('Content-Type', 'application/json'))
-                self.end_headers()
-                self.wfile.write(resp_body)
-        except urllib.error.HTTPError as e:
-            resp_body = e.read()
-            self.send_response(e.code)
-            self._cors_headers()
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(resp_body)
-        except Exception as e:
-            self.send_response(502)
-            self._cors_headers()
-            self.end_headers()
-            self.wfile.write(json.dumps({'error': str(e)}).encode())
+        # Keyed on the upload as received; only the leader pays for normalisation.
+        key = _request_key(self.path, headers, body)
+        result, shared = FLIGHTS.do(key, lambda: forward(url, headers, body), FOLLOWER_TIMEOUT)
+        marks.append(time.perf_counter())
+        if result is None:
+            status, content_type, resp_body = 504, 'application/json', b'{"error": "Timed out waiting for identical in-flight request"}'
+        else:
+            status, content_type, resp_body = result
+        coalesced = 'follower' if shared else 'leader'
+        self._send(status, content_type, resp_body, coalesced=coalesced if result is not None else None)
+        marks.append(time.perf_counter())
+        self._log_request(body, status, coalesced, len(resp_body), wall, marks)
+
+    def _log_request(self, body, status, coalesced, bytes_out, wall, marks):
+        if REQUEST_LOG is None:
+            return
+        if REQUEST_LOG.sample() or status >= 400:  # Errors are logged whether sampled or not.
+            path = self.path
+            REQUEST_LOG.emit(lambda: _request_record(path, body, status, coalesced, bytes_out, wall, marks))
+
+    def _send(self, status, content_type, body, coalesced=None):
+        self.send_response(status)
+        self._cors_headers()
+        self.send_header('Content-Type', content_type)
+        if coalesced:
+            self.send_header('X-Coalesced', coalesced)
+        self.end_headers()
+        self.wfile.write(body)
 
     def _cors_headers(self):
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type, x-api-key, anthropic-version, xi-api-key')
 
+    def log_request(self, code='-', size='-'):
+        if REQUEST_LOG is None:  # Otherwise POSTs get a structured record from _log_request.
+            super().log_request(code, size)
+
     def log_message(self, format, *args):
         print(f"[proxy] {args[0]}")
 
 if __name__ == '__main__':
-    port = 8080
-    server = HTTPServer(('localhost', port), ProxyHandler)
+    port = PORT
+    # Threaded so concurrent identical requests can actually be coalesced.
+    server = ThreadingHTTPServer(('localhost', port), ProxyHandler)
+    # Exit (rather than die) on SIGTERM so queued request log records are written.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     print(f'Proxy server running on http://localhost:{port}')
-    print('Routes: POST /claude -> Anthropic API, POST /transcribe -> ElevenLabs API')
+    print('Routes: POST /claude -> Anthropic API, POST /transcribe -> ElevenLabs API, GET /metrics')
     server.serve_forever()
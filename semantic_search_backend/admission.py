@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Future
+from contextlib import contextmanager
+import heapq
+import itertools
+import math
+import os
+import sys
+import threading
+from time import monotonic, perf_counter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+PRIORITIES = {"interactive": 0, "batch": 1, "offline": 2}
+# Lower classes may only fill part of the queue, so a batch burst can't starve interactive work.
+QUEUE_SHARE = {0: 1.0, 1: 0.5, 2: 0.25}
+
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", str(os.cpu_count() or 1)))
+ENCODE_MAX_QUEUE = int(os.getenv("ENCODE_MAX_QUEUE", "64"))
+ENCODE_MAX_WAIT_S = float(os.getenv("ENCODE_MAX_WAIT_S", "2.0"))
+
+
+def limit_torch_threads(concurrency: int) -> None:
+    """Split the cores between concurrent encodes, if the transformer backend pulled torch in."""
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // max(1, concurrency)))
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after_s: float, reason: str) -> None:
+        super().__init__(reason)
+        self.retry_after_s = retry_after_s
+        self.reason = reason
+
+
+class DeadlineExceeded(Exception):
+    """The caller's deadline passed (or would pass in the queue) before the work could run."""
+
+
+class EncodeExecutor:
+    """Fixed pool of encode threads behind a bounded priority queue with load shedding.
+
+    Work is rejected up front (Overloaded) when the queue is full for its priority class or
+    the predicted wait (work ahead of it x mean service time / workers) exceeds the budget.
+    Work with a deadline (a time.monotonic() instant) is refused if the predicted wait already
+    overruns it and dropped unrun if it expires in the queue. Threads start lazily and are
+    restarted after fork, so pre-forked workers each get a pool. Time a task spends in
+    `untimed()` (one-off work such as a first-use catalog load) stays out of the service time.
+    """
+
+    def __init__(
+        self,
+        workers: int = ENCODE_WORKERS,
+        max_queue: int = ENCODE_MAX_QUEUE,
+        max_wait_s: float = ENCODE_MAX_WAIT_S,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.max_wait_s = max_wait_s
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()  # Serialises (re)starts; _cond itself is replaced by one.
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[int, int, Optional[float], Future, Callable[[], object]]] = []
+        self._seq = itertools.count()
+        self._queued = [0] * len(PRIORITIES)
+        self._busy = 0
+        self._idle = threading.Event()  # Set while nothing is queued or running.
+        self._idle.set()
+        self._service_s = 0.01  # EWMA of per-task run time
+        self._untimed = threading.local()
+        self.stats: Dict[str, object] = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "expired": 0,
+            "shed": {name: 0 for name in PRIORITIES},
+        }
+
+    def _ensure_started(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # Fresh lock and threads in this process (threads don't survive fork).
+            self._cond = threading.Condition()
+            self._heap.clear()
+            self._queued = [0] * len(PRIORITIES)
+            self._busy = 0
+            self._idle = threading.Event()
+            self._idle.set()
+            self._pid = os.getpid()
+            for idx in range(self.workers):
+                threading.Thread(target=self._worker, name=f"encode-{idx}", daemon=True).start()
+
+    def _update_idle(self) -> None:
+        # Called with _cond held, after every change to the heap or _busy.
+        if self._busy == 0 and not self._heap:
+            self._idle.set()
+        else:
+            self._idle.clear()
+
+    def _predicted_wait_s(self, priority: int) -> float:
+        ahead = sum(self._queued[: priority + 1]) + self._busy
+        return max(0, ahead - self.workers + 1) * self._service_s / self.workers
+
+    def submit(
+        self,
+        fn: Callable[[], T],
+        priority: str = "interactive",
+        deadline: Optional[float] = None,
+    ) -> "Future[T]":
+        level = PRIORITIES[priority]
+        self._ensure_started()
+        with self._cond:
+            wait_s = self._predicted_wait_s(level)
+            if deadline is not None and monotonic() + wait_s >= deadline:
+                self.stats["expired"] += 1
+                raise DeadlineExceeded("deadline passes before the work could start")
+            cap = max(1, int(self.max_queue * QUEUE_SHARE[level]))
+            if len(self._heap) >= cap or wait_s > self.max_wait_s:
+                self.stats["shed"][priority] += 1
+                reason = "queue_full" if len(self._heap) >= cap else "predicted_wait"
+                raise Overloaded(max(1.0, math.ceil(wait_s)), reason)
+            future: Future = Future()
+            heapq.heappush(self._heap, (level, next(self._seq), deadline, future, fn))
+            self._queued[level] += 1
+            self.stats["submitted"] += 1
+            self._idle.clear()
+            self._cond.notify()
+        return future
+
+    @contextmanager
+    def untimed(self) -> Iterator[None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self._untimed.s = getattr(self._untimed, "s", 0.0) + perf_counter() - start
+
+    async def run(self, fn: Callable[[], T], priority: str = "interactive", deadline: Optional[float] = None) -> T:
+        # Cancelling the awaiting task cancels the queued future, so the work never runs.
+        return await asyncio.wrap_future(self.submit(fn, priority, deadline))
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                level, _, deadline, future, fn = heapq.heappop(self._heap)
+                self._queued[level] -= 1
+                if not future.set_running_or_notify_cancel():
+                    self.stats["cancelled"] += 1
+                    self._update_idle()
+                    continue
+                if deadline is not None and monotonic() >= deadline:
+                    self.stats["expired"] += 1
+                    future.set_exception(DeadlineExceeded("deadline passed in the queue"))
+                    self._update_idle()
+                    continue
+                self._busy += 1
+            self._untimed.s = 0.0
+            start = perf_counter()
+            try:
+                result = fn()
+            except BaseException as exc:
+                future.set_exception(exc)
+                outcome = "failed"
+            else:
+                future.set_result(result)
+                outcome = "completed"
+            elapsed = perf_counter() - start - self._untimed.s
+            with self._cond:
+                self._busy -= 1
+                self._service_s = 0.8 * self._service_s + 0.2 * elapsed
+                self.stats[outcome] += 1
+                self._update_idle()
+
+    @property
+    def idle(self) -> bool:
+        return self._idle.is_set()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until nothing is queued or running (or `timeout` passes); whether it went idle."""
+        return self._idle.wait(timeout)
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._cond:
+            return {
+                **self.stats,
+                "shed": dict(self.stats["shed"]),
+                "workers": self.workers,
+                "queue_depth": {name: self._queued[level] for name, level in PRIORITIES.items()},
+                "busy": self._busy,
+                "mean_service_ms": round(self._service_s * 1000, 2),
+                "predicted_wait_ms": round(self._predicted_wait_s(len(PRIORITIES) - 1) * 1000, 1),
+            }
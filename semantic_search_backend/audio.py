@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import io
+import math
+import struct
+from typing import Callable, List, Optional, Tuple
+import wave
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+"""
+WAV normalisation for /transcribe uploads: decode PCM, downmix to mono, resample to
+16 kHz and re-encode as 16-bit PCM, which speech-to-text needs no more than. A 48 kHz
+stereo recording shrinks 6x for ~2 ms CPU per second of audio. Used by proxy_server.py
+before forwarding upstream.
+
+Long recordings are split at pauses (`split_on_silence`, energy-based voice activity
+detection) so the proxy can transcribe the pieces in parallel.
+"""
+
+TARGET_RATE = 16000
+# Windowed-sinc half-width in input samples at the output rate; 16 gives > 60 dB stopband.
+RESAMPLE_HALF_TAPS = 16
+VAD_FRAME_S = 0.03
+# A frame is silent below noise floor + this fraction of the floor-to-speech range (in dB).
+VAD_THRESHOLD = 0.3
+
+
+@dataclass
+class PCM:
+    samples: np.ndarray  # float32 in [-1, 1], shape (frames, channels)
+    rate: int
+
+    @property
+    def seconds(self) -> float:
+        return self.samples.shape[0] / self.rate if self.rate else 0.0
+
+
+def is_wav(data: bytes) -> bool:
+    return len(data) >= 12 and data[:4] == b"RIFF" and data[8:12] == b"WAVE"
+
+
+def decode_wav(data: bytes) -> PCM:
+    """Integer PCM (8/16/24/32-bit) and float32 WAV, including WAVE_FORMAT_EXTENSIBLE."""
+    if not is_wav(data):
+        raise ValueError("not a RIFF/WAVE file")
+    fmt: Optional[Tuple[int, int, int, int]] = None
+    payload: Optional[bytes] = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id, size = data[pos : pos + 4], struct.unpack("<I", data[pos + 4 : pos + 8])[0]
+        body = data[pos + 8 : pos + 8 + size]
+        if chunk_id == b"fmt ":
+            tag, channels, rate = struct.unpack("<HHI", body[:8])
+            bits = struct.unpack("<H", body[14:16])[0]
+            if tag == 0xFFFE and len(body) >= 26:  # Extensible: the real format is the sub-format GUID prefix.
+                tag = struct.unpack("<H", body[24:26])[0]
+            fmt = (tag, channels, rate, bits)
+        elif chunk_id == b"data":
+            # Streaming recorders may leave the size at 0 or 0xFFFFFFFF; take what is there.
+            payload = data[pos + 8 :] if size in (0, 0xFFFFFFFF) else body
+            break
+        pos += 8 + size + (size & 1)
+    if fmt is None or payload is None:
+        raise ValueError("WAV has no fmt or data chunk")
+
+    tag, channels, rate, bits = fmt
+    width = bits // 8
+    if channels < 1 or width < 1:
+        raise ValueError(f"unsupported WAV layout: {channels} channels, {bits} bits")
+    payload = payload[: len(payload) // (width * channels) * width * channels]
+    if tag == 3 and bits == 32:
+        samples = np.frombuffer(payload, dtype="<f4").astype(np.float32)
+    elif tag == 1 and bits == 8:
+        samples = (np.frombuffer(payload, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif tag == 1 and bits == 16:
+        samples = np.frombuffer(payload, dtype="<i2").astype(np.float32) / 32768.0
+    elif tag == 1 and bits == 24:
+        raw = np.frombuffer(payload, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        samples = (np.where(ints >= 1 << 23, ints - (1 << 24), ints) / float(1 << 23)).astype(np.float32)
+    elif tag == 1 and bits == 32:
+        samples = (np.frombuffer(payload, dtype="<i4") / float(1 << 31)).astype(np.float32)
+    else:
+        raise ValueError(f"unsupported WAV format tag {tag} at {bits} bits")
+    return PCM(samples.reshape(-1, channels), rate)
+
+
+def encode_wav(mono: np.ndarray, rate: int) -> bytes:
+    pcm16 = np.clip(np.rint(mono * 32767.0), -32768, 32767).astype("<i2")
+    out = io.BytesIO()
+    with wave.open(out, "wb") as fh:
+        fh.setnchannels(1)
+        fh.setsampwidth(2)
+        fh.setframerate(rate)
+        fh.writeframes(pcm16.tobytes())
+    return out.getvalue()
+
+
+def resample(mono: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """Band-limited (Hann-windowed sinc) polyphase resampling: one BLAS matrix-vector product per phase."""
+    if src_rate == dst_rate or mono.size == 0:
+        return mono.astype(np.float32, copy=False)
+    g = math.gcd(src_rate, dst_rate)
+    up, down = dst_rate // g, src_rate // g
+    cutoff = min(1.0, dst_rate / src_rate)  # Low-pass at the lower Nyquist to avoid aliasing.
+    half = int(math.ceil(RESAMPLE_HALF_TAPS / cutoff))
+    offsets = np.arange(-half + 1, half + 1)
+
+    # Output sample n sits at input position n * down / up: only `up` distinct fractional phases.
+    x = offsets[None, :] - (np.arange(up) / up)[:, None]
+    table = np.sinc(x * cutoff) * (0.5 + 0.5 * np.cos(np.pi * x / half))
+    table = (table / table.sum(axis=1, keepdims=True)).astype(np.float32)  # Unity DC gain per phase.
+
+    padded = np.concatenate([np.zeros(half, np.float32), mono.astype(np.float32), np.zeros(half + 1, np.float32)])
+    windows = sliding_window_view(padded, 2 * half)  # windows[b + 1] = input[b - half + 1 : b + half + 1]
+    n_out = mono.size * up // down
+    out = np.empty(n_out, dtype=np.float32)
+    # Outputs r, r + up, r + 2 * up, ... share a phase and their windows step by `down`: a strided view, no copy.
+    for r in range(min(up, n_out)):
+        base, phase = divmod(r * down, up)
+        count = len(range(r, n_out, up))
+        out[r::up] = windows[base + 1 : base + 1 + count * down : down] @ table[phase]
+    return out
+
+
+def downmix(pcm: PCM) -> np.ndarray:
+    channels = pcm.samples.shape[1]
+    if channels == 1:
+        return pcm.samples[:, 0]
+    return pcm.samples @ np.full(channels, 1.0 / channels, dtype=np.float32)  # ~10x faster than mean(axis=1).
+
+
+def normalize_wav(data: bytes, target_rate: int = TARGET_RATE) -> Tuple[bytes, float]:
+    """(16-bit mono WAV at <= target_rate, seconds of audio). Never upsamples."""
+    pcm = decode_wav(data)
+    rate = min(pcm.rate, target_rate)
+    return encode_wav(resample(downmix(pcm), pcm.rate, rate), rate), pcm.seconds
+
+
+def frame_energy_db(mono: np.ndarray, rate: int, frame_s: float = VAD_FRAME_S) -> np.ndarray:
+    size = max(1, int(rate * frame_s))
+    frames = mono[: mono.size // size * size].reshape(-1, size).astype(np.float64)
+    return 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+
+
+def split_on_silence(
+    mono: np.ndarray, rate: int, max_s: float, min_s: Optional[float] = None, min_pause_s: float = 0.3
+) -> List[Tuple[int, int]]:
+    """Sample spans of at most `max_s` seconds (and at least `min_s`, bar the last), cut mid-pause.
+
+    Within each allowed window the cut goes in the longest pause; with no pause there, at
+    the quietest frame.
+    """
+    min_s = max_s / 3 if min_s is None else min_s
+    db = frame_energy_db(mono, rate)
+    size = max(1, int(rate * VAD_FRAME_S))
+    max_f, min_f = max(1, int(max_s / VAD_FRAME_S)), max(1, int(min_s / VAD_FRAME_S))
+    if db.size <= max_f:
+        return [(0, mono.size)]
+
+    floor, speech = np.percentile(db, [10, 90])
+    quiet = np.concatenate([[0], (db < floor + VAD_THRESHOLD * (speech - floor)).astype(np.int8), [0]])
+    edges = np.diff(quiet)
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    long_enough = ends - starts >= max(1, int(min_pause_s / VAD_FRAME_S))
+    cuts, lengths = ((starts + ends) // 2)[long_enough], (ends - starts)[long_enough]
+
+    bounds = [0]
+    while db.size - bounds[-1] > max_f:
+        lo, hi = bounds[-1] + min_f, bounds[-1] + max_f
+        window = np.flatnonzero((cuts >= lo) & (cuts <= hi))
+        if window.size:
+            cut = int(cuts[window[np.argmax(lengths[window])]])
+        else:
+            cut = lo + int(np.argmin(db[lo:hi]))
+        bounds.append(cut)
+    samples = [b * size for b in bounds] + [mono.size]
+    return list(zip(samples[:-1], samples[1:]))
+
+
+def multipart_boundary(content_type: str) -> Optional[bytes]:
+    if not content_type.lower().startswith("multipart/") or "boundary=" not in content_type:
+        return None
+    boundary = content_type.split("boundary=", 1)[1].split(";", 1)[0].strip().strip('"')
+    return boundary.encode("latin-1") or None
+
+
+def part_content(part: bytes) -> Tuple[bytes, bytes, bytes]:
+    """(leading CRLF + headers + blank line, content, trailing CRLF) of one multipart part."""
+    head_end = part.find(b"\r\n\r\n")
+    if head_end < 0 or not part.endswith(b"\r\n"):
+        return part, b"", b""
+    return part[: head_end + 4], part[head_end + 4 : -2], b"\r\n"
+
+
+def single_wav_part(body: bytes, boundary: bytes) -> Optional[Tuple[bytes, bytes, bytes]]:
+    """(bytes before, WAV content, bytes after) when the body carries exactly one WAV part."""
+    delimiter = b"--" + boundary
+    segments = body.split(delimiter)
+    found = None
+    for idx in range(1, len(segments) - 1):
+        head, content, tail = part_content(segments[idx])
+        if tail and is_wav(content):
+            if found is not None:
+                return None
+            found = (delimiter.join(segments[:idx] + [head]), content, delimiter.join([tail] + segments[idx + 1 :]))
+    return found
+
+
+def rewrite_wav_parts(body: bytes, boundary: bytes, rewrite: Callable[[bytes], bytes]) -> bytes:
+    """Replace the content of every WAV part via `rewrite(content) -> bytes`; other bytes are kept as-is."""
+    delimiter = b"--" + boundary
+    segments = body.split(delimiter)  # [preamble, part, ..., part, "--" + epilogue]
+    for idx in range(1, len(segments) - 1):
+        head, content, tail = part_content(segments[idx])
+        if tail and is_wav(content):
+            replacement = rewrite(content)
+            if delimiter not in replacement:
+                segments[idx] = head + replacement + tail
+    return delimiter.join(segments)
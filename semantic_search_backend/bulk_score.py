@@ -0,0 +1,409 @@
+from __future__ import annotations
+
+import argparse
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+import csv
+import ctypes
+import gc
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import signal
+import sys
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+
+    _HAS_ARROW = True
+except ModuleNotFoundError:
+    _HAS_ARROW = False
+
+"""
+Offline scoring of archived handover texts (audits, threshold tuning), without the server.
+
+Streams a JSONL or CSV file, scores texts in batches (one embedder call per batch) across
+a pool of forked workers that share the preloaded model, and writes a record per input
+row as the batches complete, in input order:
+
+    python bulk_score.py archive.jsonl scored.jsonl --workers 4
+    python bulk_score.py archive.csv scored/ --format npz --text-field handover --id-field incident
+
+Records carry the row's id (or its 1-based row number), the answering tier, the selected
+ids with their final scores and the selection meta of /suggest with the same parameters.
+JSONL output is one object per row; `npz` and `parquet` (needs pyarrow) write a directory
+of column parts, list columns flattened Arrow-style (`selected` + `selected_offsets`).
+
+Output is committed every --commit-rows rows, with a checkpoint (`<output>.checkpoint.json`)
+of the input position. An interrupted run resumes from it; whatever was written after the
+last checkpoint is discarded and scored again. Memory stays bounded by the batches in
+flight (two per worker) and the uncommitted rows, whatever the input size.
+"""
+
+BULK_BATCH = 256
+BULK_COMMIT_ROWS = 8192
+PR_SET_PDEATHSIG = 1
+# The columns of select_categories' meta copied into each record.
+SELECTION_FIELDS = (
+    "strategy_used",
+    "s_max",
+    "low_confidence_mode",
+    "threshold_score",
+    "floor_score",
+    "forced_ids",
+    "floor_added_ids",
+    "topk_added_ids",
+)
+
+# (row number, id, text or None if the row has none or it is blank)
+Row = Tuple[int, object, Optional[str]]
+
+_STATE: Dict[str, object] = {}
+
+
+def read_batches(
+    fh: TextIO, fmt: str, text_field: str, id_field: str, batch: int, offset: int = 0, row: int = 0
+) -> Iterator[Tuple[List[Row], int]]:
+    """Batches of rows and the input position after each, starting at `offset` (after row `row`)."""
+    header: Optional[List[str]] = None
+    if fmt == "csv":
+        header = next(csv.reader([fh.readline()]), None)
+        if not header:
+            return
+    if offset:
+        fh.seek(offset)
+    lines = iter(fh.readline, "")
+    records = csv.reader(lines) if header is not None else lines
+    rows: List[Row] = []
+    for record in records:
+        if not record or (header is None and not record.strip()):
+            continue  # Blank lines are not rows.
+        row += 1
+        if header is not None:
+            fields: object = dict(zip(header, record))
+        else:
+            try:
+                fields = json.loads(record)
+            except ValueError:
+                fields = None
+        if not isinstance(fields, dict):
+            fields = {}
+        text = fields.get(text_field)
+        rows.append((row, fields.get(id_field, row), text if isinstance(text, str) and text.strip() else None))
+        if len(rows) >= batch:
+            yield rows, fh.tell()
+            rows = []
+    if rows:
+        yield rows, fh.tell()
+
+
+def _load(settings: Dict[str, object]) -> None:
+    import main
+
+    _STATE["main"] = main
+    _STATE["catalog"] = main.get_catalog(settings["catalog"])
+    _STATE["settings"] = settings
+
+
+def _init_worker(parent: int) -> None:
+    from admission import limit_torch_threads
+
+    limit_torch_threads(1)  # The pool already has a process per core.
+    # Pool workers outlive a killed parent (they wait on its queue); have the kernel end them too.
+    try:
+        ctypes.CDLL("libc.so.6").prctl(PR_SET_PDEATHSIG, signal.SIGTERM)
+    except (OSError, AttributeError):
+        pass
+    if os.getppid() != parent:
+        os._exit(1)
+
+
+def score_rows(rows: List[Row]) -> List[Dict[str, object]]:
+    """Score a batch (in a worker, or in-process); one record per row."""
+    main, catalog, settings = _STATE["main"], _STATE["catalog"], _STATE["settings"]
+    scorable = [r for r in rows if r[2] is not None]
+    metas: List[Dict[str, object]] = [{} for _ in scorable]
+    scored = main._score_candidates_batch([r[2] for r in scorable], metas, catalog, explain=False)
+    results = {r[0]: (candidates, meta) for r, candidates, meta in zip(scorable, scored, metas)}
+    records: List[Dict[str, object]] = []
+    for row, row_id, _text in rows:
+        if row not in results:
+            records.append({"id": row_id, "row": row, "error": f"no text in {settings['text_field']!r}"})
+            continue
+        candidates, meta = results[row]
+        # As /suggest: vitals-only texts select just the fields their readings fill.
+        min_results = 1 if meta["tier"] == main.VITALS_TIER else settings["min_results"]
+        selected, selection = main.select_categories(
+            candidates, settings["delta"], settings["min_score"], min_results, settings["max_results"]
+        )
+        record = {
+            "id": row_id,
+            "row": row,
+            "tier": meta["tier"],
+            "selected": [c.id for c in selected],
+            "scores": [round(c.final_score, 4) for c in selected],
+            "meta": {name: selection[name] for name in SELECTION_FIELDS},
+        }
+        if meta["vitals"]:
+            record["vitals"] = meta["vitals"]
+        records.append(record)
+    return records
+
+
+def _flat(record: Dict[str, object]) -> Dict[str, object]:
+    meta = record.get("meta") or {}
+    return {
+        "id": str(record["id"]),
+        "row": record["row"],
+        "tier": record.get("tier") or "",
+        "error": record.get("error", ""),
+        "selected": record.get("selected", []),
+        "scores": record.get("scores", []),
+        "strategy_used": meta.get("strategy_used", ""),
+        "s_max": meta.get("s_max"),
+        "low_confidence_mode": bool(meta.get("low_confidence_mode")),
+        "threshold_score": meta.get("threshold_score"),
+        "floor_score": meta.get("floor_score"),
+    }
+
+
+def _npz_columns(rows: List[Dict[str, object]]) -> Dict[str, np.ndarray]:
+    def floats(name: str) -> np.ndarray:
+        return np.array([np.nan if r[name] is None else r[name] for r in rows], dtype=np.float32)
+
+    lengths = [len(r["selected"]) for r in rows]
+    return {
+        "id": np.array([r["id"] for r in rows], dtype=str),
+        "row": np.array([r["row"] for r in rows], dtype=np.int64),
+        "tier": np.array([r["tier"] for r in rows], dtype=str),
+        "error": np.array([r["error"] for r in rows], dtype=str),
+        "selected": np.array([cid for r in rows for cid in r["selected"]], dtype=str),
+        "selected_offsets": np.concatenate(([0], np.cumsum(lengths))).astype(np.int64),
+        "scores": np.array([score for r in rows for score in r["scores"]], dtype=np.float32),
+        "strategy_used": np.array([r["strategy_used"] for r in rows], dtype=str),
+        "s_max": floats("s_max"),
+        "low_confidence_mode": np.array([r["low_confidence_mode"] for r in rows], dtype=bool),
+        "threshold_score": floats("threshold_score"),
+        "floor_score": floats("floor_score"),
+    }
+
+
+def _fsync(fh) -> None:
+    fh.flush()
+    os.fsync(fh.fileno())
+
+
+class JsonlWriter:
+    """Appends records; a resumed run first cuts the file back to its last checkpoint."""
+
+    def __init__(self, path: Path, state: Dict[str, int]) -> None:
+        self.path = path
+        self.fh = open(path, "ab")
+        self.fh.truncate(state.get("bytes", 0))
+        self.fh.seek(0, os.SEEK_END)
+
+    def write(self, records: List[Dict[str, object]]) -> Dict[str, int]:
+        self.fh.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode("utf-8"))
+        _fsync(self.fh)
+        return {"bytes": self.fh.tell()}
+
+    def close(self) -> None:
+        self.fh.close()
+
+
+class ColumnWriter:
+    """One part file per commit in a directory; a resumed run removes parts past its checkpoint."""
+
+    def __init__(self, path: Path, state: Dict[str, int], fmt: str) -> None:
+        if fmt == "parquet" and not _HAS_ARROW:
+            raise SystemExit("--format parquet needs pyarrow; use --format npz or jsonl.")
+        self.path = path
+        self.fmt = fmt
+        self.parts = state.get("parts", 0)
+        path.mkdir(parents=True, exist_ok=True)
+        for stale in path.glob(f"part-*.{fmt}*"):
+            if stale.name.endswith(".tmp") or int(stale.name[5:10]) >= self.parts:
+                stale.unlink()
+
+    def write(self, records: List[Dict[str, object]]) -> Dict[str, int]:
+        rows = [_flat(r) for r in records]
+        final = self.path / f"part-{self.parts:05d}.{self.fmt}"
+        tmp = final.with_name(final.name + ".tmp")
+        with open(tmp, "wb") as fh:
+            if self.fmt == "parquet":
+                pq.write_table(pyarrow.Table.from_pylist(rows), fh)
+            else:
+                np.savez(fh, **_npz_columns(rows))
+            _fsync(fh)
+        os.replace(tmp, final)  # A part exists whole or not at all.
+        self.parts += 1
+        return {"parts": self.parts}
+
+    def close(self) -> None:
+        pass
+
+
+def read_columns(path: Path) -> Dict[str, np.ndarray]:
+    """The npz parts of a column output, concatenated (offsets rebased); for checks and notebooks."""
+    parts = [dict(np.load(part)) for part in sorted(path.glob("part-*.npz"))]
+    if not parts:
+        return {}
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0] if name != "selected_offsets"}
+    offsets = [np.zeros(1, dtype=np.int64)]
+    for part in parts:
+        offsets.append(part["selected_offsets"][1:] + offsets[-1][-1])
+    columns["selected_offsets"] = np.concatenate(offsets)
+    return columns
+
+
+class _InProcess:
+    def submit(self, fn, *args) -> Future:
+        future: Future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        pass
+
+
+def _checkpoint_path(output: Path) -> Path:
+    return output.with_name(output.name + ".checkpoint.json")
+
+
+def _save_checkpoint(path: Path, checkpoint: Dict[str, object]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(checkpoint, fh, indent=2)
+        _fsync(fh)
+    os.replace(tmp, path)
+
+
+def _resume_point(args: argparse.Namespace, settings: Dict[str, object]) -> Dict[str, object]:
+    path = _checkpoint_path(args.output)
+    if args.restart or not path.exists():
+        if args.output.exists() and not args.restart:
+            raise SystemExit(f"{args.output} exists without a checkpoint; pass --restart to overwrite it.")
+        return {"input": str(args.input.resolve()), "offset": 0, "rows": 0, "output": {}, "settings": settings}
+    checkpoint = json.loads(path.read_text())
+    changed = sorted(k for k in settings if checkpoint["settings"].get(k) != settings[k])
+    if changed or checkpoint["input"] != str(args.input.resolve()):
+        raise SystemExit(f"{path} is for a different run (changed: {changed or ['input']}); pass --restart.")
+    return checkpoint
+
+
+def run(args: argparse.Namespace) -> Dict[str, object]:
+    settings = {
+        "catalog": args.catalog,
+        "delta": args.delta,
+        "min_score": args.min_score,
+        "min_results": args.min_results,
+        "max_results": args.max_results,
+        "text_field": args.text_field,
+        "id_field": args.id_field,
+        "input_format": args.input_format or ("csv" if args.input.suffix.lower() == ".csv" else "jsonl"),
+        "format": args.format,
+    }
+    _load(settings)  # Before forking, so workers share the model and matrices copy-on-write.
+    settings["model"] = _STATE["catalog"].embedder.name
+    checkpoint = _resume_point(args, settings)
+    if args.restart and args.output.is_file():
+        args.output.unlink()
+    writer = (
+        JsonlWriter(args.output, checkpoint["output"])
+        if args.format == "jsonl"
+        else ColumnWriter(args.output, checkpoint["output"], args.format)
+    )
+    if args.workers > 1:
+        gc.collect()
+        gc.freeze()  # As serve.py: keep the GC from un-sharing pre-fork pages.
+        pool = ProcessPoolExecutor(
+            args.workers, multiprocessing.get_context("fork"), initializer=_init_worker, initargs=(os.getpid(),)
+        )
+    else:
+        pool = _InProcess()
+
+    start = perf_counter()
+    resumed_rows = checkpoint["rows"]
+    tiers: Dict[str, int] = {}
+    buffer: List[Dict[str, object]] = []
+    in_flight: "deque[Tuple[Future, int, int]]" = deque()
+
+    def commit() -> None:
+        if buffer:
+            checkpoint["output"] = writer.write(buffer)
+            buffer.clear()
+        _save_checkpoint(_checkpoint_path(args.output), checkpoint)
+        if not args.quiet:
+            rate = (checkpoint["rows"] - resumed_rows) / max(perf_counter() - start, 1e-9)
+            print(json.dumps({"rows": checkpoint["rows"], "rows_per_s": round(rate, 1)}), file=sys.stderr)
+
+    def collect() -> None:
+        future, offset, last_row = in_flight.popleft()
+        for record in future.result():
+            tier = "error" if "error" in record else str(record["tier"])
+            tiers[tier] = tiers.get(tier, 0) + 1
+            buffer.append(record)
+        checkpoint["offset"], checkpoint["rows"] = offset, last_row
+        if len(buffer) >= args.commit_rows:
+            commit()
+
+    try:
+        with open(args.input, encoding="utf-8", newline="") as fh:
+            batches = read_batches(
+                fh, settings["input_format"], args.text_field, args.id_field, args.batch, checkpoint["offset"], checkpoint["rows"]
+            )
+            for rows, offset in batches:
+                in_flight.append((pool.submit(score_rows, rows), offset, rows[-1][0]))
+                if len(in_flight) >= 2 * args.workers:
+                    collect()
+            while in_flight:
+                collect()
+        checkpoint["done"] = True
+        commit()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        writer.close()
+
+    elapsed = perf_counter() - start
+    scored = checkpoint["rows"] - resumed_rows
+    return {
+        "output": str(args.output),
+        "rows": checkpoint["rows"],
+        "scored": scored,
+        "resumed_at": resumed_rows,
+        "tiers": tiers,
+        "elapsed_s": round(elapsed, 2),
+        "rows_per_s": round(scored / max(elapsed, 1e-9), 1),
+        "model": settings["model"],
+    }
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Score an archive of handover texts against a catalog.")
+    parser.add_argument("input", type=Path, help="JSONL (one object per line) or CSV with a header row.")
+    parser.add_argument("output", type=Path, help="A .jsonl file, or a directory for --format npz/parquet.")
+    parser.add_argument("--format", choices=("jsonl", "npz", "parquet"), default="jsonl")
+    parser.add_argument("--input-format", choices=("jsonl", "csv"), help="Default: from the input's suffix.")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--id-field", default="id", help="Rows without it are identified by row number.")
+    parser.add_argument("--catalog", default=None)
+    parser.add_argument("--delta", type=float, default=0.12)
+    parser.add_argument("--min-score", type=float, default=None)
+    parser.add_argument("--min-results", type=int, default=3)
+    parser.add_argument("--max-results", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch", type=int, default=BULK_BATCH, help="Rows per embedder call.")
+    parser.add_argument("--commit-rows", type=int, default=BULK_COMMIT_ROWS, help="Rows per output write and checkpoint.")
+    parser.add_argument("--restart", action="store_true", help="Ignore (and overwrite) an existing checkpoint and output.")
+    parser.add_argument("--quiet", action="store_true", help="No progress lines on stderr.")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(_parse_args()), indent=2))
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+import logging
+import threading
+from time import perf_counter
+from typing import Callable, Dict, Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger("semantic_search")
+
+
+class CatalogCache(Generic[T]):
+    """Memory-bounded LRU of catalog indexes, loaded on first use.
+
+    `loader(name)` builds an index and `size_of(index)` reports its resident bytes. Loads of
+    the same name are serialised (concurrent first requests wait for one load); loads of
+    different names run in parallel. Pinned entries are never evicted. The most recently
+    loaded index stays resident even if it alone exceeds the budget.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], T],
+        size_of: Callable[[T], int],
+        max_bytes: int,
+        pinned: Optional[Dict[str, T]] = None,
+    ) -> None:
+        self._loader = loader
+        self._size_of = size_of
+        self.max_bytes = max_bytes
+        self._pinned: Dict[str, T] = dict(pinned or {})
+        self._resident: "OrderedDict[str, T]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self.stats: Dict[str, float] = {"hits": 0, "loads": 0, "load_failures": 0, "evictions": 0, "load_ms_total": 0.0}
+
+    def get(self, name: str) -> T:
+        with self._lock:
+            if name in self._pinned:
+                self.stats["hits"] += 1
+                return self._pinned[name]
+            if name in self._resident:
+                self.stats["hits"] += 1
+                self._resident.move_to_end(name)
+                return self._resident[name]
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            with self._lock:
+                if name in self._resident:  # Loaded by the request we waited behind.
+                    self.stats["hits"] += 1
+                    self._resident.move_to_end(name)
+                    return self._resident[name]
+            start = perf_counter()
+            try:
+                index = self._loader(name)
+            except Exception:
+                with self._lock:
+                    self.stats["load_failures"] += 1
+                raise
+            size = self._size_of(index)
+            with self._lock:
+                self.stats["loads"] += 1
+                self.stats["load_ms_total"] += (perf_counter() - start) * 1000
+                self._resident[name] = index
+                self._sizes[name] = size
+                self._evict(keep=name)
+        return index
+
+    def _evict(self, keep: str) -> None:
+        while self.resident_bytes > self.max_bytes:
+            victim = next((n for n in self._resident if n != keep), None)
+            if victim is None:
+                break
+            del self._resident[victim]
+            freed = self._sizes.pop(victim)
+            self.stats["evictions"] += 1
+            logger.info("catalog evicted name=%s freed_mb=%.1f", victim, freed / 2**20)
+
+    def values(self) -> List[T]:
+        """Pinned and resident indexes."""
+        with self._lock:
+            return list(self._pinned.values()) + list(self._resident.values())
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                **self.stats,
+                "load_ms_total": round(self.stats["load_ms_total"], 1),
+                "pinned": sorted(self._pinned),
+                "resident": {name: round(self._sizes[name] / 2**20, 2) for name in self._resident},
+                "resident_mb": round(self.resident_bytes / 2**20, 2),
+                "max_mb": round(self.max_bytes / 2**20, 2),
+            }
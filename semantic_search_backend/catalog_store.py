@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+from functools import cached_property
+import json
+import mmap
+import os
+from pathlib import Path
+import struct
+import sys
+from typing import Callable, Dict, Generic, Iterator, List, Mapping, Optional, Sequence, TypeVar, Union, overload
+
+import numpy as np
+
+from selection import CatalogEntry
+
+"""
+Columnar storage for catalogs of 100k+ categories.
+
+A catalog is a handful of flat arrays rather than one dataclass (plus example and synonym
+lists) per entry. Every distinct string is stored once in a UTF-8 blob and rows refer to
+it by index: id, title and description are one reference per row, and examples and
+synonyms are CSR-style reference lists. Only ids and titles are decoded eagerly, as every
+query needs them; the rest is decoded on access.
+
+`load_store` compiles a JSON catalog into `<name>.json.store` next to it on first use and
+memory-maps that file afterwards, so worker processes share its pages. The compiled file
+is rebuilt whenever the JSON's size or mtime changes.
+
+    python catalog_store.py categories.json --compare
+"""
+
+STORE_MAGIC = b"CATSTORE"
+STORE_VERSION = 1
+_HEADER = struct.Struct("<8sI")
+_ALIGN = 8
+
+ItemT = TypeVar("ItemT")
+ValueT = TypeVar("ValueT")
+
+
+def build_doc(title: str, description: str, examples: Sequence[str], synonyms: Sequence[str]) -> str:
+    """The text a catalog entry is embedded as."""
+    return f"{title}. {description}. Examples: {'; '.join(examples)}. Synonyms: {', '.join(synonyms)}."
+
+
+class LazyColumn(Sequence[ValueT]):
+    """A read-only sequence whose values are computed from the store when accessed."""
+
+    def __init__(self, length: int, get: Callable[[int], ValueT]) -> None:
+        self._length = length
+        self._get = get
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, idx: int) -> ValueT: ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> List[ValueT]: ...
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[ValueT, List[ValueT]]:
+        if isinstance(idx, slice):
+            return [self._get(i) for i in range(*idx.indices(self._length))]
+        if not -self._length <= idx < self._length:
+            raise IndexError(idx)
+        return self._get(idx % self._length)
+
+    def __iter__(self) -> Iterator[ValueT]:
+        return map(self._get, range(self._length))
+
+
+class StringTable:
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray) -> None:
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, ref: int) -> str:
+        return self.blob[self.offsets[ref] : self.offsets[ref + 1]].tobytes().decode("utf-8")
+
+    def many(self, refs: np.ndarray) -> List[str]:
+        data = memoryview(self.blob)
+        starts, ends = self.offsets[refs].tolist(), self.offsets[refs + 1].tolist()
+        return [str(data[start:end], "utf-8") for start, end in zip(starts, ends)]
+
+
+class CatalogStore(Generic[ItemT]):
+    """Categories or pathways as columns. Indexing builds an `item_type` instance on demand."""
+
+    def __init__(self, arrays: Mapping[str, np.ndarray], item_type: Callable[..., ItemT], source: Optional[List[int]] = None) -> None:
+        self.arrays = dict(arrays)
+        self.item_type = item_type
+        self.source = source  # [size, mtime_ns] of the JSON it was compiled from.
+        self.strings = StringTable(self.arrays["blob"], self.arrays["string_offsets"])
+        self._rows = self.arrays["rows"]  # (n, 3): id, title, description refs.
+
+    @classmethod
+    def from_items(cls, items: Sequence[object], item_type: Callable[..., ItemT], kind: str = "category") -> "CatalogStore[ItemT]":
+        """From dicts (parsed JSON) or objects with id/title/description/examples/synonyms."""
+        refs: Dict[str, int] = {}
+
+        def intern(text: str) -> int:
+            ref = refs.get(text)
+            if ref is None:
+                ref = refs[text] = len(refs)
+            return ref
+
+        rows: List[List[int]] = []
+        lists: Dict[str, List[int]] = {"examples": [], "synonyms": []}
+        bounds: Dict[str, List[int]] = {"examples": [0], "synonyms": [0]}
+        seen = set()
+        for item in items:
+            fields = item if isinstance(item, dict) else vars(item)
+            if fields["id"] in seen:
+                raise ValueError(f"Duplicate {kind} id: {fields['id']}")
+            seen.add(fields["id"])
+            rows.append([intern(fields["id"]), intern(fields["title"]), intern(fields["description"])])
+            for field in ("examples", "synonyms"):
+                lists[field].extend(intern(text) for text in fields.get(field) or ())
+                bounds[field].append(len(lists[field]))
+
+        encoded = [text.encode("utf-8") for text in refs]
+        return cls(
+            {
+                "blob": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+                "string_offsets": np.concatenate([[0], np.cumsum([len(b) for b in encoded])]).astype(np.uint64),
+                "rows": np.asarray(rows, dtype=np.uint32).reshape(-1, 3),
+                "examples": np.asarray(lists["examples"], dtype=np.uint32),
+                "example_offsets": np.asarray(bounds["examples"], dtype=np.uint32),
+                "synonyms": np.asarray(lists["synonyms"], dtype=np.uint32),
+                "synonym_offsets": np.asarray(bounds["synonyms"], dtype=np.uint32),
+            },
+            item_type,
+        )
+
+    @classmethod
+    def from_json(cls, path: Path, item_type: Callable[..., ItemT], kind: str = "category") -> "CatalogStore[ItemT]":
+        store = cls.from_items(json.loads(path.read_text(encoding="utf-8")), item_type, kind)
+        stat = path.stat()
+        store.source = [stat.st_size, stat.st_mtime_ns]
+        return store
+
+    def save(self, path: Path) -> None:
+        layout: Dict[str, List[object]] = {}
+        position = 0
+        for name, array in self.arrays.items():
+            position = -(-position // _ALIGN) * _ALIGN
+            layout[name] = [array.dtype.str, list(array.shape), position]
+            position += array.nbytes
+        header = json.dumps({"version": STORE_VERSION, "source": self.source, "arrays": layout}).encode("utf-8")
+        start = -(-(_HEADER.size + len(header)) // _ALIGN) * _ALIGN
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with tmp_path.open("wb") as fh:
+            fh.write(_HEADER.pack(STORE_MAGIC, len(header)) + header)
+            for name, array in self.arrays.items():
+                fh.seek(start + int(layout[name][2]))
+                fh.write(np.ascontiguousarray(array).tobytes())
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path, item_type: Callable[..., ItemT]) -> "CatalogStore[ItemT]":
+        with path.open("rb") as fh:
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_len = _HEADER.unpack_from(mapped)
+        header = json.loads(mapped[_HEADER.size : _HEADER.size + header_len])
+        if magic != STORE_MAGIC or header["version"] != STORE_VERSION:
+            raise ValueError(f"{path} is not a version {STORE_VERSION} catalog store")
+        start = -(-(_HEADER.size + header_len) // _ALIGN) * _ALIGN
+        arrays = {}
+        for name, (dtype, shape, offset) in header["arrays"].items():
+            count = int(np.prod(shape))
+            arrays[name] = np.frombuffer(mapped, dtype=dtype, count=count, offset=start + offset).reshape(shape)
+        return cls(arrays, item_type, header["source"])
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @overload
+    def __getitem__(self, idx: int) -> ItemT: ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> List[ItemT]: ...
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[ItemT, List[ItemT]]:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        row = self._rows[idx]
+        return self.item_type(
+            id=self.ids[idx],
+            title=self.titles[idx],
+            description=self.strings[row[2]],
+            examples=self.examples(idx),
+            synonyms=self.synonyms(idx),
+        )
+
+    def __iter__(self) -> Iterator[ItemT]:
+        return map(self.__getitem__, range(len(self)))
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, CatalogStore):
+            return self.ids == other.ids and all(
+                np.array_equal(self.arrays[name], other.arrays[name]) for name in self.arrays
+            )
+        return isinstance(other, list) and list(self) == other
+
+    __hash__ = None  # type: ignore[assignment]
+
+    @cached_property
+    def ids(self) -> List[str]:
+        return self.strings.many(self._rows[:, 0])
+
+    @cached_property
+    def titles(self) -> List[str]:
+        return self.strings.many(self._rows[:, 1])
+
+    def description(self, idx: int) -> str:
+        return self.strings[self._rows[idx, 2]]
+
+    def examples(self, idx: int) -> List[str]:
+        offsets = self.arrays["example_offsets"]
+        return self.strings.many(self.arrays["examples"][offsets[idx] : offsets[idx + 1]])
+
+    def synonyms(self, idx: int) -> List[str]:
+        offsets = self.arrays["synonym_offsets"]
+        return self.strings.many(self.arrays["synonyms"][offsets[idx] : offsets[idx + 1]])
+
+    @property
+    def entries(self) -> LazyColumn[CatalogEntry]:
+        """(id, title) per row, for candidate building; nothing else is decoded."""
+        return LazyColumn(len(self), lambda idx: CatalogEntry(self.ids[idx], self.titles[idx]))
+
+    @property
+    def docs(self) -> LazyColumn[str]:
+        """Embedding texts, built on access rather than held."""
+        return LazyColumn(
+            len(self),
+            lambda idx: build_doc(self.titles[idx], self.description(idx), self.examples(idx), self.synonyms(idx)),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Column arrays (shared page cache when memory-mapped) plus the decoded ids and titles."""
+        decoded = sum(sys.getsizeof(text) for text in self.ids) + sum(sys.getsizeof(text) for text in self.titles)
+        return sum(array.nbytes for array in self.arrays.values()) + decoded + 16 * len(self)
+
+
+def load_store(path: Path, item_type: Callable[..., ItemT], kind: str = "category") -> CatalogStore[ItemT]:
+    """The catalog at `path` (JSON), via its compiled `.store` file, which is (re)built as needed."""
+    store_path = path.with_name(f"{path.name}.store")
+    stat = path.stat()
+    try:
+        store = CatalogStore.load(store_path, item_type)
+        if store.source == [stat.st_size, stat.st_mtime_ns]:
+            return store
+    except (OSError, ValueError, KeyError, struct.error):
+        pass
+    store = CatalogStore.from_json(path, item_type, kind)
+    try:
+        store.save(store_path)
+    except OSError:
+        pass  # Read-only catalog directory: keep the in-memory store.
+    return store
+
+
+def _compare(path: Path, scale: int) -> None:
+    """Resident Python heap and load time: one dataclass per entry (the previous loader) vs the store."""
+    from dataclasses import dataclass
+    import tempfile
+    from time import perf_counter
+    import tracemalloc
+
+    @dataclass
+    class Entry:
+        id: str
+        title: str
+        description: str
+        examples: List[str]
+        synonyms: List[str]
+
+    raw = json.loads(path.read_text(encoding="utf-8"))
+    # Scaled copies get unique ids, titles and one unique example each; the rest repeats, as in real catalogs.
+    items = [
+        {**item, "id": f"{item['id']}#{k}", "title": f"{item['title']} {k}", "examples": [f"{ex} ({k})" for ex in item.get("examples", [])[:1]] + item.get("examples", [])[1:]}
+        for k in range(scale)
+        for item in raw
+    ] if scale > 1 else raw
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "categories.json"
+        source.write_text(json.dumps(items), encoding="utf-8")
+
+        def measure(load: Callable[[], object]) -> Dict[str, float]:
+            start = perf_counter()
+            load()
+            seconds = perf_counter() - start
+            tracemalloc.start()  # Separate run: tracing slows allocation several-fold.
+            kept = load()
+            resident = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del kept
+            return {"load_ms": round(seconds * 1000, 1), "heap_mb": round(resident / 2**20, 1)}
+
+        def legacy() -> object:
+            entries = [
+                Entry(i["id"], i["title"], i["description"], list(i.get("examples", [])), list(i.get("synonyms", [])))
+                for i in json.loads(source.read_text(encoding="utf-8"))
+            ]
+            docs = [build_doc(e.title, e.description, e.examples, e.synonyms) for e in entries]
+            return entries, docs
+
+        def compiled() -> object:
+            store = load_store(source, Entry)
+            return store, store.ids, store.titles
+
+        def compile_only() -> object:
+            store = CatalogStore.from_json(source, Entry)
+            store.save(source.with_name(f"{source.name}.store"))
+            return store, store.ids, store.titles
+
+        report = {
+            "entries": len(items),
+            "json_mb": round(source.stat().st_size / 2**20, 1),
+            "dataclasses": measure(legacy),
+            "store_compile": measure(compile_only),
+            "store_load": measure(compiled),  # The compiled file is memory-mapped.
+        }
+        store = load_store(source, Entry)
+        report["store_file_mb"] = round(sum(a.nbytes for a in store.arrays.values()) / 2**20, 1)
+        report["distinct_strings"] = len(store.strings)
+    print(json.dumps(report, indent=2))
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile a JSON catalog into a columnar store.")
+    parser.add_argument("path", type=Path, help="categories.json or pathways.json")
+    parser.add_argument("--compare", action="store_true", help="Report heap and load time against dataclasses.")
+    parser.add_argument("--scale", type=int, default=1, help="With --compare, replicate the catalog this many times.")
+    args = parser.parse_args()
+    if args.compare:
+        _compare(args.path, args.scale)
+        return
+    store = load_store(args.path, dict)
+    print(f"{args.path.name}.store: {len(store)} entries, {len(store.strings)} distinct strings")
+
+
+if __name__ == "__main__":
+    main()
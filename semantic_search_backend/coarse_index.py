@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import os
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+# Below this many fields a flat matrix-vector product is already cheap.
+COARSE_INDEX_MIN_FIELDS = int(os.getenv("COARSE_INDEX_MIN_FIELDS", "2000"))
+COARSE_TOP_GROUPS = int(os.getenv("COARSE_TOP_GROUPS", "8"))
+# Parents whose centroid is within this (raw) margin of the best are searched too; if that
+# band holds more than COARSE_MAX_GROUPS parents the coarse ranking is undecided and the
+# query falls back to exact search.
+COARSE_MIN_MARGIN = float(os.getenv("COARSE_MIN_MARGIN", "0.05"))
+COARSE_MAX_GROUPS = int(os.getenv("COARSE_MAX_GROUPS", "64"))
+
+
+class CoarseIndex:
+    """Two-level index over "Parent.field" rows: parent centroids first, then only their fields.
+
+    Stands in for the catalog matrix (`index @ query_vec`), so embedders score against it
+    unchanged. Fields of pruned parents score -inf (0 once clipped). When too many parents
+    are within `min_margin` of the best one, it falls back to exact search over every row.
+    """
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        groups: Sequence[str],
+        top_groups: int = COARSE_TOP_GROUPS,
+        min_margin: float = COARSE_MIN_MARGIN,
+        max_groups: int = COARSE_MAX_GROUPS,
+    ) -> None:
+        first_seen: Dict[str, int] = {}
+        keys = np.asarray([first_seen.setdefault(g, len(first_seen)) for g in groups])
+        order = np.argsort(keys, kind="stable")
+        # Generated catalogs are already grouped by parent; only reorder (copy) when they are not.
+        self._order = None if np.array_equal(order, np.arange(len(order))) else order
+        self.matrix = matrix if self._order is None else np.ascontiguousarray(matrix[order])
+        self.group_names = list(first_seen)
+
+        bounds = np.flatnonzero(np.diff(keys[order])) + 1
+        starts = np.concatenate(([0], bounds)).astype(int)
+        ends = np.concatenate((bounds, [len(order)])).astype(int)
+        self.spans: List[Tuple[int, int]] = list(zip(starts.tolist(), ends.tolist()))
+
+        centroids = np.stack([self.matrix[s:e].mean(axis=0) for s, e in self.spans]).astype(np.float32)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        self.centroids = centroids / np.where(norms == 0, 1.0, norms)
+        self.top_groups = top_groups
+        self.min_margin = min_margin
+        self.max_groups = max(max_groups, top_groups)
+        self.stats = {"coarse": 0, "exact": 0, "fields_scored": 0}
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.matrix.shape
+
+    def _restore(self, scores: np.ndarray) -> np.ndarray:
+        if self._order is None:
+            return scores
+        restored = np.empty_like(scores)
+        restored[self._order] = scores
+        return restored
+
+    def __matmul__(self, query_vec: np.ndarray) -> np.ndarray:
+        n_groups = len(self.spans)
+        if n_groups <= self.top_groups:
+            return self._exact(query_vec)
+
+        coarse = self.centroids @ query_vec
+        top = np.argpartition(coarse, -self.top_groups)[-self.top_groups:]
+        floor = min(float(coarse.max()) - self.min_margin, float(coarse[top].min()))
+        kept = np.flatnonzero(coarse >= floor)
+        if len(kept) > self.max_groups:
+            return self._exact(query_vec)
+
+        scores = np.full(self.matrix.shape[0], -np.inf, dtype=np.float32)
+        for group in kept:
+            start, end = self.spans[group]
+            scores[start:end] = self.matrix[start:end] @ query_vec
+            self.stats["fields_scored"] += end - start
+        self.stats["coarse"] += 1
+        return self._restore(scores)
+
+    def _exact(self, query_vec: np.ndarray) -> np.ndarray:
+        self.stats["exact"] += 1
+        self.stats["fields_scored"] += self.matrix.shape[0]
+        return self._restore(np.asarray(self.matrix @ query_vec, dtype=np.float32))
+
+
+def build_index(matrix: np.ndarray, ids: Sequence[str]) -> CoarseIndex | None:
+    """A coarse index over the parent of each id, or None when the catalog is small enough to scan.
+
+    Sparse (hashed TF-IDF) matrices are never indexed: their scoring already touches only
+    the columns a query shares with the catalog.
+    """
+    if len(ids) < COARSE_INDEX_MIN_FIELDS or not isinstance(matrix, np.ndarray):
+        return None
+    return CoarseIndex(matrix, [cid.split(".", 1)[0] for cid in ids])
+
+
+def _benchmark(fields: int, fields_per_group: int = 20, dim: int = 384, queries: int = 200) -> None:
+    import json
+    from time import perf_counter
+
+    rng = np.random.default_rng(0)
+    n_groups = max(1, fields // fields_per_group)
+    centers = rng.standard_normal((n_groups, dim)).astype(np.float32)
+    groups = np.repeat(np.arange(n_groups), fields_per_group)[:fields]
+    matrix = centers[groups] + 0.3 * rng.standard_normal((len(groups), dim)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    picks = rng.integers(0, len(groups), queries)
+    query_vecs = matrix[picks] + 0.5 * rng.standard_normal((queries, dim)).astype(np.float32)
+    query_vecs /= np.linalg.norm(query_vecs, axis=1, keepdims=True)
+
+    index = CoarseIndex(matrix, [f"g{g}" for g in groups])
+    start = perf_counter()
+    flat = [matrix @ q for q in query_vecs]
+    flat_ms = (perf_counter() - start) / queries * 1000
+    start = perf_counter()
+    coarse = [index @ q for q in query_vecs]
+    coarse_ms = (perf_counter() - start) / queries * 1000
+
+    recall = np.mean(
+        [
+            len(set(np.argsort(f)[-10:]) & set(np.argsort(c)[-10:])) / 10
+            for f, c in zip(flat, coarse)
+        ]
+    )
+    print(
+        json.dumps(
+            {
+                "fields": len(groups),
+                "groups": n_groups,
+                "flat_ms_per_query": round(flat_ms, 3),
+                "coarse_ms_per_query": round(coarse_ms, 3),
+                "recall_at_10": round(float(recall), 3),
+                **index.stats,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark coarse-to-fine search against a flat scan.")
+    parser.add_argument("--bench", type=int, default=50000, metavar="FIELDS")
+    parser.add_argument("--fields-per-group", type=int, default=20)
+    args = parser.parse_args()
+    _benchmark(args.bench, args.fields_per_group)
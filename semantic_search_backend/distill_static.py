@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import argparse
+from collections import Counter
+import json
+import math
+import os
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, Iterable, List, Sequence, Set
+
+import numpy as np
+
+from embedder import (
+    _HAS_ST,
+    STATIC_EMBEDDER_PATH,
+    Embedder,
+    StaticEmbedder,
+    TfidfEmbedder,
+    _sentence_transformer,
+    similarity_scores,
+    static_ngrams,
+)
+from generate_categories import ABBREVIATIONS
+from generate_pathways import NAME_EXPANSIONS
+from selection import select_categories
+
+"""
+Distil a SentenceTransformer into a static n-gram -> vector table (Model2Vec-style).
+
+Every 1..MAX_NGRAM word n-gram in the catalog docs, plus the generators' abbreviation
+tables and CLINICAL_JARGON, is embedded once by the teacher model. Vectors are optionally
+PCA-reduced, and each entry gets a smoothed IDF weight. At query time StaticEmbedder
+(EMBEDDER_MODE=static) pools the table in NumPy, with no model forward pass.
+
+    python distill_static.py --dims 128
+    python distill_static.py --report   # latency and agreement with the teacher
+"""
+
+BASE_DIR = Path(__file__).resolve().parent
+MAX_NGRAM = 2
+
+# Common handover wording that the catalog docs don't necessarily contain.
+CLINICAL_JARGON = (
+    "hypotensive", "hypertensive", "tachycardic", "bradycardic", "tachypnoeic", "hypoxic",
+    "pyrexial", "febrile", "clammy", "pale", "cyanosed", "mottled", "diaphoretic",
+    "syncope", "collapse", "fall", "loc", "unresponsive", "confused", "drowsy", "agitated",
+    "post ictal", "incontinent", "vomiting", "haematemesis", "melaena", "palpitations",
+    "chest tightness", "pleuritic", "productive cough", "stridor", "wheeze", "crackles",
+    "anaphylaxis", "urticaria", "angioedema", "epipen", "salbutamol", "gtn", "aspirin",
+    "naloxone", "overdose", "od", "etoh", "intoxicated", "head injury", "c spine",
+    "deformity", "laceration", "haemorrhage", "tourniquet", "burns", "pregnant", "labour",
+    "nad", "pmh", "dhx", "nkda", "hx", "pt", "obs",
+)
+
+
+def _vocabulary(docs: Sequence[str], extra: Iterable[str], max_ngram: int) -> Dict[str, int]:
+    """n-gram -> document frequency over the catalog docs (extra terms get df 0)."""
+    df: Counter[str] = Counter()
+    for doc in docs:
+        df.update(set(static_ngrams(doc, max_ngram)))
+    vocab: Dict[str, int] = dict(df)
+    for term in extra:
+        for gram in static_ngrams(term, max_ngram):
+            vocab.setdefault(gram, 0)
+        vocab.setdefault(" ".join(static_ngrams(term, 1)), 0)
+    vocab.pop("", None)
+    return vocab
+
+
+def _jargon(path: Path | None) -> List[str]:
+    terms: List[str] = list(CLINICAL_JARGON)
+    for key, values in {**ABBREVIATIONS, **NAME_EXPANSIONS}.items():
+        terms.append(key)
+        terms.extend(values)
+    if path is not None:
+        terms.extend(line.strip() for line in path.read_text(encoding="utf-8").splitlines() if line.strip())
+    return terms
+
+
+def _pca(vectors: np.ndarray, dims: int) -> np.ndarray:
+    if dims <= 0 or dims >= min(vectors.shape):
+        return vectors
+    centered = vectors - vectors.mean(axis=0, keepdims=True)
+    _, _, components = np.linalg.svd(centered, full_matrices=False)
+    return centered @ components[:dims].T
+
+
+def distill(
+    teacher: Embedder,
+    docs: Sequence[str],
+    extra: Iterable[str] = (),
+    dims: int = 0,
+    max_ngram: int = MAX_NGRAM,
+    batch_size: int = 512,
+) -> Dict[str, np.ndarray]:
+    vocab = _vocabulary(docs, extra, max_ngram)
+    tokens = sorted(vocab)
+    vectors = np.concatenate(
+        [teacher.embed_texts(tokens[i : i + batch_size]) for i in range(0, len(tokens), batch_size)]
+    ).astype(np.float32)
+    vectors = _pca(vectors, dims)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1.0, norms)
+    n_docs = len(docs)
+    weights = np.asarray([math.log((1 + n_docs) / (1 + vocab[t])) + 1.0 for t in tokens], dtype=np.float32)
+    return {
+        "tokens": np.asarray(tokens),
+        "vectors": vectors.astype(np.float32),
+        "weights": weights,
+        "max_ngram": np.asarray(max_ngram),
+        "model": np.asarray(teacher.name),
+    }
+
+
+def _teacher(name: str, docs: Sequence[str]) -> Embedder:
+    if name == "tfidf":  # Smoke-testing the pipeline without a transformer.
+        return TfidfEmbedder(docs)
+    if not _HAS_ST:
+        raise SystemExit("distill_static.py needs sentence-transformers for the teacher model (or --teacher tfidf).")
+    return _sentence_transformer(name)
+
+
+def _selected(scores: np.ndarray) -> List[str]:
+    from main import _candidates_from_scores
+
+    selected, _ = select_categories(_candidates_from_scores(scores), 0.12, None, 3, 8)
+    return [c.id for c in selected]
+
+
+def _timed_scores(embedder: Embedder, matrix: np.ndarray, texts: Sequence[str]) -> tuple[List[np.ndarray], float]:
+    start = perf_counter()
+    scores = [similarity_scores(embedder, embedder.embed_text(text), matrix) for text in texts]
+    return scores, (perf_counter() - start) / max(1, len(texts)) * 1e6
+
+
+def report(static: StaticEmbedder, teacher: Embedder, labelled: Path) -> Dict[str, object]:
+    from main import CATEGORY_DOCS
+
+    rows = [json.loads(line) for line in labelled.read_text(encoding="utf-8").splitlines() if line.strip()]
+    texts = [row["text"] for row in rows]
+    static_scores, static_us = _timed_scores(static, static.embed_texts(CATEGORY_DOCS), texts)
+    teacher_scores, teacher_us = _timed_scores(teacher, teacher.embed_texts(CATEGORY_DOCS), texts)
+
+    jaccard: List[float] = []
+    top1: List[bool] = []
+    hits: Dict[str, List[bool]] = {"static": [], "teacher": []}
+    for row, s_scores, t_scores in zip(rows, static_scores, teacher_scores):
+        s_ids, t_ids = _selected(s_scores), _selected(t_scores)
+        s_set: Set[str] = set(s_ids)
+        jaccard.append(len(s_set & set(t_ids)) / len(s_set | set(t_ids)) if s_set | set(t_ids) else 1.0)
+        top1.append(bool(s_ids) and bool(t_ids) and s_ids[0] == t_ids[0])
+        prefixes = row.get("categories") or []
+        if prefixes:
+            for label, ids in (("static", s_ids), ("teacher", t_ids)):
+                hits[label].append(any(cid == p or cid.startswith(p + ".") for p in prefixes for cid in ids))
+
+    return {
+        "queries": len(rows),
+        "static": static.name,
+        "teacher": teacher.name,
+        "vocab": len(static.vocab),
+        "dims": int(static.vectors.shape[1]),
+        "static_us_per_query": round(static_us, 1),
+        "teacher_us_per_query": round(teacher_us, 1),
+        "selection_jaccard": round(float(np.mean(jaccard)), 3),
+        "top1_agreement": round(float(np.mean(top1)), 3),
+        "label_hit_rate": {k: round(float(np.mean(v)), 3) if v else None for k, v in hits.items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Distil the transformer into a static embedding table.")
+    parser.add_argument("--teacher", default=os.getenv("EMBEDDER_MODEL", "all-MiniLM-L6-v2"))
+    parser.add_argument("--output", type=Path, default=STATIC_EMBEDDER_PATH)
+    parser.add_argument("--dims", type=int, default=0, help="PCA-reduce vectors to this many dims (0 keeps all).")
+    parser.add_argument("--max-ngram", type=int, default=MAX_NGRAM)
+    parser.add_argument("--jargon", type=Path, help="Extra newline-separated terms to include.")
+    parser.add_argument("--report", action="store_true", help="Only compare an existing table with the teacher.")
+    parser.add_argument("--labelled", type=Path, default=BASE_DIR / "labelled_queries.jsonl")
+    args = parser.parse_args()
+
+    # Only the catalog docs are needed from main; don't load a transformer there as well.
+    os.environ["EMBEDDER_MODE"] = "tfidf"
+    from main import CATEGORY_DOCS, PATHWAY_DOCS
+
+    docs = list(CATEGORY_DOCS) + list(PATHWAY_DOCS)
+    teacher = _teacher(args.teacher, docs)
+    if not args.report:
+        start = perf_counter()
+        table = distill(teacher, docs, _jargon(args.jargon), args.dims, args.max_ngram)
+        np.savez(args.output, **table)
+        print(
+            f"Wrote {args.output} ({len(table['tokens'])} entries x {table['vectors'].shape[1]} dims) "
+            f"in {perf_counter() - start:.1f}s"
+        )
+    print(json.dumps(report(StaticEmbedder(args.output), teacher, args.labelled), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,17 @@
 from __future__ import annotations
 
+import ctypes
 from dataclasses import dataclass
+from functools import lru_cache
+import gc
+import logging
 import os
-from typing import Sequence, Tuple
+from pathlib import Path
+import re
+import threading
+from time import monotonic, perf_counter
+from typing import Dict, List, Optional, Sequence, Tuple
+import warnings
 
 import numpy as np
 
@@ -13,7 +22,40 @@ try:
 except Exception:
     _HAS_ST = False
 
-from sklearn.feature_extraction.text import TfidfVectorizer
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+
+
+# Cascade gate: the lexical tier answers when its top score and its margin over the best
+# candidate from a different group both clear these (tune with tune_cascade.py).
+CASCADE_MIN_SCORE = float(os.getenv("CASCADE_MIN_SCORE", "0.30"))
+CASCADE_MIN_MARGIN = float(os.getenv("CASCADE_MIN_MARGIN", "0.08"))
+# Lexical answers are mapped onto the semantic tier's scale (scale * cosine + offset) so that
+# selection thresholds mean the same whichever tier answers. Unset: the semantic tier's own
+# transform, (cos + 1) / 2 for a cosine model; tune_cascade.py fits a map for a given model.
+CASCADE_LEXICAL_SCALE = os.getenv("CASCADE_LEXICAL_SCALE")
+CASCADE_LEXICAL_OFFSET = os.getenv("CASCADE_LEXICAL_OFFSET")
+STATIC_EMBEDDER_PATH = Path(os.getenv("STATIC_EMBEDDER_PATH", Path(__file__).resolve().parent / "static_embedder.npz"))
+# Hashed feature space of HashingEmbedder; 2**20 keeps bucket collisions rare for catalogs of ~100k n-grams.
+HASHING_FEATURES = int(os.getenv("HASHING_FEATURES", str(1 << 20)))
+# Local safetensors copies of transformer models, so a reload after an idle unload is a memory-mapped read.
+MODEL_CACHE_DIR = Path(os.getenv("MODEL_CACHE_DIR", Path(__file__).resolve().parent / ".model_cache"))
+
+# meta.tier of queries answered by a catalog's TF-IDF fallback while its model reloads (see idle.py).
+FALLBACK_TIER = "fallback"
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_TRANSFORMERS: List["SentenceTransformerEmbedder"] = []
+
+logger = logging.getLogger("semantic_search")
+
+
+def release_memory() -> None:
+    """Collect garbage and hand freed heap back to the OS (glibc keeps it otherwise)."""
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
 
 
 @dataclass
@@ -27,16 +69,122 @@ class Embedder:
     def embed_text(self, text: str) -> np.ndarray:
         return self.embed_texts([text])[0]
 
+    def acquire(self) -> bool:
+        """Whether queries can use this embedder now. A model unloaded while idle starts reloading and returns False."""
+        return True
+
+    @property
+    def loaded(self) -> bool:
+        return True
+
+    def score(self, text: str, matrix: np.ndarray) -> Tuple[np.ndarray, str]:
+        """Score one query against a catalog matrix; also returns which tier answered."""
+        return similarity_scores(self, self.embed_text(text), matrix), self.name
+
+    def score_batch(self, texts: Sequence[str], matrix: np.ndarray) -> List[Tuple[np.ndarray, str]]:
+        """`score` for many queries, encoded in one embed_texts call (bulk scoring)."""
+        vectors = self.embed_texts(texts)
+        if isinstance(matrix, np.ndarray):
+            rows = similarity_scores(self, vectors.T, matrix).T  # One matrix product for the batch.
+        else:  # A CoarseIndex prunes per query.
+            rows = [similarity_scores(self, vector, matrix) for vector in vectors]
+        return [(scores, self.name) for scores in rows]
+
 
 class SentenceTransformerEmbedder(Embedder):
+    """The model can be freed with `unload()`; `acquire()` then reloads it in the background.
+
+    The first load saves a copy to MODEL_CACHE_DIR, and reloads read that copy, whose
+    safetensors weights are memory-mapped rather than parsed.
+    """
+
     def __init__(self, model_name: str = "all-MiniLM-L6-v2", device: str = "cpu") -> None:
-        self.model = SentenceTransformer(model_name, device=device)
+        self.model_name = model_name
+        self.device = device
+        self._lock = threading.Lock()
+        self._reload: Optional[threading.Thread] = None
+        self.stats: Dict[str, object] = {"unloads": 0, "reloads": 0, "reload_failures": 0, "last_reload_ms": None}
+        self.model: Optional[SentenceTransformer] = self._load()
+        self.last_used = monotonic()
         super().__init__(name=f"sentence-transformers:{model_name}", score_range="cosine-1-1")
 
+    @property
+    def local_path(self) -> Path:
+        return MODEL_CACHE_DIR / re.sub(r"[^A-Za-z0-9_.-]+", "_", self.model_name)
+
+    def _load(self) -> SentenceTransformer:
+        local = self.local_path
+        if (local / "modules.json").exists():
+            return SentenceTransformer(str(local), device=self.device)
+        model = SentenceTransformer(self.model_name, device=self.device)
+        try:
+            model.save(str(local))
+        except OSError as exc:
+            logger.warning("could not cache model=%s at %s: %s", self.model_name, local, exc)
+        return model
+
     def embed_texts(self, texts: Sequence[str]) -> np.ndarray:
-        vectors = self.model.encode(list(texts), normalize_embeddings=True)
+        self.last_used = monotonic()
+        model = self.model
+        if model is None:  # Catalog builds need vectors now: wait for the reload.
+            reload = self.reload()
+            if reload is not None:
+                reload.join()
+            model = self.model
+            if model is None:
+                raise RuntimeError(f"Could not reload {self.model_name}")
+        vectors = model.encode(list(texts), normalize_embeddings=True)
         return np.asarray(vectors, dtype=np.float32)
 
+    def acquire(self) -> bool:
+        self.last_used = monotonic()
+        if self.model is not None:
+            return True
+        self.reload()
+        return False
+
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None
+
+    def unload(self) -> bool:
+        """Drop the model (encodes in flight keep their reference until they finish)."""
+        with self._lock:
+            if self.model is None or self._reload is not None:
+                return False
+            self.model = None
+            self.stats["unloads"] += 1
+        release_memory()
+        return True
+
+    def reload(self) -> Optional[threading.Thread]:
+        """Start (or join) the background reload; None if the model is loaded."""
+        with self._lock:
+            if self.model is not None:
+                return None
+            if self._reload is None:
+                self._reload = threading.Thread(target=self._reload_model, name="model-reload", daemon=True)
+                self._reload.start()
+            return self._reload
+
+    def _reload_model(self) -> None:
+        start = perf_counter()
+        try:
+            model = self._load()
+        except Exception:
+            logger.exception("model reload failed model=%s", self.model_name)
+            with self._lock:
+                self._reload = None
+                self.stats["reload_failures"] += 1
+            return
+        elapsed_ms = (perf_counter() - start) * 1000
+        with self._lock:
+            self.model = model
+            self._reload = None
+            self.stats["reloads"] += 1
+            self.stats["last_reload_ms"] = round(elapsed_ms, 1)
+        logger.info("model reloaded model=%s reload_ms=%d", self.model_name, elapsed_ms)
+
 
 class TfidfEmbedder(Embedder):
     def __init__(self, corpus: Sequence[str]) -> None:
@@ -56,13 +204,349 @@ class TfidfEmbedder(Embedder):
     def embed_texts(self, texts: Sequence[str]) -> np.ndarray:
         return self.vectorizer.transform(list(texts)).toarray().astype(np.float32)
 
+    def sparse_scores(self, text: str) -> np.ndarray:
+        """Cosine scores against the fitted corpus without densifying either side."""
+        query = self.vectorizer.transform([text])
+        return np.asarray((self._matrix @ query.T).toarray().ravel(), dtype=np.float32)
+
+
+class HashingEmbedder(Embedder):
+    """TF-IDF over hashed word 1-2-grams whose documents can be added, replaced and removed online.
+
+    The analyzer is TfidfEmbedder's, but features are hashed into a fixed `n_features`, so
+    there is no vocabulary to refit. `add`/`remove` hash one document and adjust the document
+    frequencies of its features. Term counts are appended to flat sparse arrays, and replaced
+    documents leave zeroed segments that are compacted away once they outweigh the live ones.
+    Smoothed idf (as sklearn) is applied at query time. Document norms depend on every idf,
+    so they are recomputed in one vectorised pass on the first query after a change. Scores
+    match a TfidfEmbedder fitted on the same documents except where n-grams share a bucket.
+
+    `sparse_scores` reads the live documents; `score` reads the `document_matrix` snapshot the
+    caller indexed, like every other embedder. Edits reach a Catalog only by rebuilding it.
+    """
+
+    def __init__(
+        self, corpus: Sequence[str] = (), keys: Optional[Sequence[str]] = None, n_features: int = HASHING_FEATURES
+    ) -> None:
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            lowercase=True,
+            stop_words="english",
+            ngram_range=(1, 2),
+            alternate_sign=False,
+            norm=None,
+            dtype=np.float32,
+        )
+        self.n_features = n_features
+        self.df = np.zeros(n_features, dtype=np.int32)
+        self.keys: List[str] = []  # Row order of scores and document_matrix.
+        self._segment: Dict[str, int] = {}
+        self._starts: List[int] = []
+        self._indices = np.empty(0, dtype=np.int32)
+        self._counts = np.empty(0, dtype=np.float32)
+        self._nnz = 0
+        self._dead_nnz = 0
+        self._index: Optional[Tuple[sparse.csc_matrix, np.ndarray, np.ndarray]] = None
+        self._lock = threading.Lock()
+        super().__init__(name="hashing", score_range="0-1")
+
+        counts = self.vectorizer.transform(list(corpus))
+        for row, key in enumerate(keys if keys is not None else [str(i) for i in range(counts.shape[0])]):
+            lo, hi = counts.indptr[row], counts.indptr[row + 1]
+            self._append(key, counts.indices[lo:hi], counts.data[lo:hi])
+
+    def add(self, key: str, text: str) -> None:
+        """Add a document, or replace the one with this key in place (its row keeps its position)."""
+        counts = self.vectorizer.transform([text])
+        with self._lock:
+            self._append(key, counts.indices, counts.data)
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self._release(self._segment.pop(key))
+            self.keys.remove(key)
+            self._index = None
+
+    def _append(self, key: str, cols: np.ndarray, counts: np.ndarray) -> None:
+        if key in self._segment:
+            self._release(self._segment[key])
+        else:
+            self.keys.append(key)
+        end = self._nnz + len(cols)
+        if end > len(self._indices):
+            capacity = max(end, 2 * len(self._indices), 1024)
+            self._indices = np.resize(self._indices, capacity)
+            self._counts = np.resize(self._counts, capacity)
+        self._indices[self._nnz : end] = cols
+        self._counts[self._nnz : end] = counts
+        self._segment[key] = len(self._starts)
+        self._starts.append(self._nnz)
+        self._nnz = end
+        self.df[cols] += 1
+        self._index = None
+
+    def _release(self, segment: int) -> None:
+        start = self._starts[segment]
+        end = self._starts[segment + 1] if segment + 1 < len(self._starts) else self._nnz
+        self.df[self._indices[start:end]] -= 1
+        self._counts[start:end] = 0.0
+        self._dead_nnz += end - start
+
+    def _compact(self) -> None:
+        order = [self._segment[key] for key in self.keys]
+        bounds = self._starts + [self._nnz]
+        keep = np.concatenate([np.arange(bounds[seg], bounds[seg + 1]) for seg in order] or [np.empty(0, int)])
+        lengths = [bounds[seg + 1] - bounds[seg] for seg in order]
+        self._indices, self._counts = self._indices[keep], self._counts[keep]
+        self._starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(int).tolist() if order else []
+        self._segment = {key: seg for seg, key in enumerate(self.keys)}
+        self._nnz, self._dead_nnz = len(keep), 0
+
+    def idf(self, cols: np.ndarray) -> np.ndarray:
+        return (np.log((1.0 + len(self.keys)) / (1.0 + self.df[cols])) + 1.0).astype(np.float32)
+
+    def _current(self) -> Tuple[sparse.csc_matrix, np.ndarray, np.ndarray]:
+        """(term counts by column, tf-idf norm per segment, segment of each key), rebuilt after a change."""
+        with self._lock:
+            if self._index is not None:
+                return self._index
+            if self._dead_nnz > self._nnz - self._dead_nnz:
+                self._compact()
+            segments = len(self._starts)
+            indptr = np.asarray(self._starts + [self._nnz], dtype=np.int64)
+            indices, counts = self._indices[: self._nnz], self._counts[: self._nnz]
+            norms = self._norms(counts, indices, indptr)
+            matrix = sparse.csr_matrix((counts, indices, indptr), shape=(segments, self.n_features)).tocsc()
+            order = np.asarray([self._segment[key] for key in self.keys], dtype=np.int64)
+            self._index = (matrix, norms, order)
+            return self._index
+
+    def _norms(self, counts: np.ndarray, cols: np.ndarray, indptr: np.ndarray) -> np.ndarray:
+        weights = counts * self.idf(cols)
+        rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        return np.sqrt(np.bincount(rows, weights * weights, minlength=len(indptr) - 1)).astype(np.float32)
+
+    def _normalised(self, counts: sparse.csr_matrix, norms: np.ndarray) -> sparse.csr_matrix:
+        rows = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))
+        data = counts.data * self.idf(counts.indices) / np.where(norms == 0, 1.0, norms)[rows]
+        return sparse.csr_matrix((data.astype(np.float32), counts.indices, counts.indptr), shape=counts.shape)
+
+    def embed_texts(self, texts: Sequence[str]) -> sparse.csr_matrix:
+        """L2-normalised tf-idf rows under the current document frequencies (sparse: n_features is large)."""
+        counts = self.vectorizer.transform(list(texts))
+        return self._normalised(counts, self._norms(counts.data, counts.indices, counts.indptr))
+
+    @property
+    def document_matrix(self) -> sparse.csc_matrix:
+        """Normalised tf-idf rows in `keys` order, by column so scoring touches only the query's n-grams."""
+        matrix, norms, order = self._current()
+        return self._normalised(matrix.tocsr(), norms)[order].tocsc()
+
+    def _query(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(columns, L2-normalised tf-idf weights) of the query's n-grams seen in some document."""
+        query = self.vectorizer.transform([text])
+        seen = self.df[query.indices] > 0  # Unseen n-grams, as outside a fitted vocabulary.
+        cols = query.indices[seen]
+        if not len(cols):
+            return cols, np.empty(0, dtype=np.float32)
+        weights = query.data[seen] * self.idf(cols)
+        return cols, weights / np.linalg.norm(weights)
+
+    def sparse_scores(self, text: str) -> np.ndarray:
+        """Against the live documents, as edited so far."""
+        matrix, norms, order = self._current()
+        cols, weights = self._query(text)
+        if not len(cols) or not len(order):
+            return np.zeros(len(order), dtype=np.float32)
+        raw = matrix[:, cols] @ (weights * self.idf(cols))
+        scores = raw[order] / np.where(norms[order] == 0, 1.0, norms[order])
+        return np.clip(scores, 0.0, 1.0).astype(np.float32)
+
+    def score(self, text: str, matrix: sparse.spmatrix) -> Tuple[np.ndarray, str]:
+        """Against `matrix`, a document_matrix snapshot: documents edited since it was taken are not
+        seen (the query's idf weights do follow the live document frequencies)."""
+        cols, weights = self._query(text)
+        if not len(cols) or not matrix.shape[0]:
+            return np.zeros(matrix.shape[0], dtype=np.float32), self.name
+        scores = matrix[:, cols] @ weights
+        return np.clip(scores, 0.0, 1.0).astype(np.float32), self.name
+
+    def score_batch(self, texts: Sequence[str], matrix: np.ndarray) -> List[Tuple[np.ndarray, str]]:
+        return [self.score(text, matrix) for text in texts]
+
+    @property
+    def nbytes(self) -> int:
+        return self.df.nbytes + self._indices.nbytes + self._counts.nbytes + 8 * len(self._starts)
+
+
+def static_ngrams(text: str, max_ngram: int) -> List[str]:
+    """Lowercase word n-grams (1..max_ngram) as looked up in a static token table."""
+    words = _WORD_RE.findall(text.lower())
+    return [" ".join(words[i : i + n]) for n in range(1, max_ngram + 1) for i in range(len(words) - n + 1)]
+
+
+class StaticEmbedder(Embedder):
+    """Weighted mean of distilled token/phrase vectors (see distill_static.py); NumPy only."""
+
+    def __init__(self, path: Path = STATIC_EMBEDDER_PATH) -> None:
+        with np.load(path, allow_pickle=False) as table:
+            tokens = table["tokens"].tolist()
+            self.vectors = table["vectors"].astype(np.float32)
+            self.weights = table["weights"].astype(np.float32)
+            self.max_ngram = int(table["max_ngram"])
+            model = str(table["model"])
+        self.vocab: Dict[str, int] = {token: idx for idx, token in enumerate(tokens)}
+        super().__init__(name=f"static:{model}", score_range="cosine-1-1")
+
+    def embed_texts(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.vectors.shape[1]), dtype=np.float32)
+        for row, text in enumerate(texts):
+            ids = [self.vocab[g] for g in static_ngrams(text, self.max_ngram) if g in self.vocab]
+            if not ids:
+                continue
+            pooled = self.weights[ids] @ self.vectors[ids]
+            norm = float(np.linalg.norm(pooled))
+            out[row] = pooled / norm if norm else pooled
+        return out
+
+
+def gate_margin(scores: np.ndarray, groups: Optional[np.ndarray] = None) -> float:
+    """Top score minus the best score outside the top item's group (or the runner-up)."""
+    if scores.size < 2:
+        return float(scores.max(initial=0.0))
+    top = int(np.argmax(scores))
+    if groups is not None:
+        rivals = scores[groups != groups[top]]
+        return float(scores[top] - rivals.max(initial=0.0))
+    return float(scores[top] - np.partition(scores, -2)[-2])
+
+
+class CascadeEmbedder(Embedder):
+    """Answer from a cheap lexical index when it is clearly decided, else escalate.
+
+    `groups` (e.g. the parent of "Category.field" ids) lets sibling fields tie without
+    counting as ambiguity. Embedding (for the catalog matrix) always uses the semantic tier.
+    The gate sees raw lexical cosines; accepted answers are calibrated onto the semantic scale.
+    """
+
+    def __init__(
+        self,
+        corpus: Sequence[str],
+        semantic: Embedder,
+        groups: Optional[Sequence[str]] = None,
+        min_score: float = CASCADE_MIN_SCORE,
+        min_margin: float = CASCADE_MIN_MARGIN,
+        calibration: Optional[Tuple[float, float]] = None,
+    ) -> None:
+        self.lexical = TfidfEmbedder(corpus)
+        self.semantic = semantic
+        self.groups = np.asarray(groups) if groups is not None else None
+        self.min_score = min_score
+        self.min_margin = min_margin
+        if calibration is None:
+            default = (0.5, 0.5) if semantic.score_range == "cosine-1-1" else (1.0, 0.0)
+            calibration = (
+                float(CASCADE_LEXICAL_SCALE or default[0]),
+                float(CASCADE_LEXICAL_OFFSET or default[1]),
+            )
+        self.calibration = calibration
+        super().__init__(name=f"cascade:tfidf>{semantic.name}", score_range=semantic.score_range)
+
+    def embed_texts(self, texts: Sequence[str]) -> np.ndarray:
+        return self.semantic.embed_texts(texts)
+
+    def acquire(self) -> bool:
+        return self.semantic.acquire()
+
+    @property
+    def loaded(self) -> bool:
+        return self.semantic.loaded
+
+    def lexical_scores(self, text: str) -> np.ndarray:
+        return self.lexical.sparse_scores(text)
+
+    def accepts(self, scores: np.ndarray) -> bool:
+        return float(scores.max(initial=0.0)) >= self.min_score and gate_margin(scores, self.groups) >= self.min_margin
+
+    def calibrated(self, scores: np.ndarray) -> np.ndarray:
+        scale, offset = self.calibration
+        return np.clip(scores * scale + offset, 0.0, 1.0).astype(np.float32)
+
+    def score(self, text: str, matrix: np.ndarray) -> Tuple[np.ndarray, str]:
+        lexical = self.lexical_scores(text)
+        if self.accepts(lexical):
+            return self.calibrated(lexical), "lexical"
+        return similarity_scores(self.semantic, self.semantic.embed_text(text), matrix), "semantic"
+
+    def score_batch(self, texts: Sequence[str], matrix: np.ndarray) -> List[Tuple[np.ndarray, str]]:
+        """Lexical scores for all; the queries the gate rejects are encoded together."""
+        results = [(self.lexical_scores(text), "lexical") for text in texts]
+        escalate = [i for i, (scores, _) in enumerate(results) if not self.accepts(scores)]
+        results = [(self.calibrated(scores), tier) for scores, tier in results]
+        if escalate:
+            semantic = self.semantic.score_batch([texts[i] for i in escalate], matrix)
+            for i, (scores, _) in zip(escalate, semantic):
+                results[i] = (scores, "semantic")
+        return results
+
+
+@lru_cache(maxsize=None)
+def _sentence_transformer(model_name: str) -> SentenceTransformerEmbedder:
+    # Shared so category and pathway indexes never load the same weights twice.
+    embedder = SentenceTransformerEmbedder(model_name=model_name)
+    _TRANSFORMERS.append(embedder)
+    return embedder
+
+
+def transformer_models() -> List[SentenceTransformerEmbedder]:
+    """Every transformer loaded in this process (each model name once)."""
+    return list(_TRANSFORMERS)
+
+
+@lru_cache(maxsize=None)
+def _static_embedder(path: Path) -> StaticEmbedder:
+    return StaticEmbedder(path)
+
+
+def backend_settings(spec: Optional[str] = None) -> Tuple[str, str, Path]:
+    """(mode, transformer model, static table) for a backend spec; from the environment when None.
+
+    Specs are those of sweep_embedders.py: tfidf | hashing | static[:table.npz] | st:<model> | cascade:<model>.
+    """
+    model_name = os.getenv("EMBEDDER_MODEL", "all-MiniLM-L6-v2")
+    if spec is None:
+        return os.getenv("EMBEDDER_MODE", "").strip().lower(), model_name, STATIC_EMBEDDER_PATH
+    kind, _, arg = spec.strip().partition(":")
+    if kind in ("tfidf", "hashing"):
+        return kind, model_name, STATIC_EMBEDDER_PATH
+    if kind == "static":
+        return kind, model_name, Path(arg) if arg else STATIC_EMBEDDER_PATH
+    if kind in ("st", "cascade"):
+        return "" if kind == "st" else kind, arg or "all-MiniLM-L6-v2", STATIC_EMBEDDER_PATH
+    raise ValueError(f"Unknown embedder backend: {spec}")
+
 
-def create_embedder(corpus: Sequence[str]) -> Tuple[Embedder, np.ndarray]:
-    mode = os.getenv("EMBEDDER_MODE", "").strip().lower()
+def create_embedder(
+    corpus: Sequence[str],
+    groups: Optional[Sequence[str]] = None,
+    keys: Optional[Sequence[str]] = None,
+    backend: Optional[str] = None,
+) -> Tuple[Embedder, np.ndarray]:
+    """The embedder for `backend` (see backend_settings; EMBEDDER_MODE/EMBEDDER_MODEL by default) and the corpus vectors."""
+    mode, model_name, static_path = backend_settings(backend)
+    if mode == "hashing":
+        hashing = HashingEmbedder(corpus, keys)
+        return hashing, hashing.document_matrix
+    if mode == "static":
+        if static_path.exists():
+            embedder = _static_embedder(static_path)
+            return embedder, embedder.embed_texts(corpus)
+        warnings.warn(f"{static_path} not found (run distill_static.py); using the default embedder.")
     if mode != "tfidf" and _HAS_ST:
-        model_name = os.getenv("EMBEDDER_MODEL", "all-MiniLM-L6-v2")
-        embedder = SentenceTransformerEmbedder(model_name=model_name)
+        embedder = _sentence_transformer(model_name)
         category_vectors = embedder.embed_texts(corpus)
+        if mode == "cascade":
+            return CascadeEmbedder(corpus, embedder, groups), category_vectors
         return embedder, category_vectors
 
     embedder = TfidfEmbedder(corpus)
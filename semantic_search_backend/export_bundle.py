@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import argparse
+from dataclasses import asdict
+import gzip
+import json
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict
+
+import numpy as np
+
+from embedder import TfidfEmbedder
+from reference_scorer import BUNDLE_FORMAT, BUNDLE_VERSION, ReferenceScorer, encode_array
+from selection import LOW_CONF_THRESHOLD, select_categories
+
+if TYPE_CHECKING:
+    from main import Catalog
+
+"""
+Export a catalog's TF-IDF index as a compact bundle for offline, on-device scoring.
+
+    python export_bundle.py --output suggest_bundle.json.gz [--catalog trust_a] [--quantize f32]
+
+Category weights are quantized to uint16 by default (`--quantize f32` keeps float32).
+After writing, the bundle is re-read with reference_scorer.py and checked against the
+server's scoring on the catalog's own example phrases.
+"""
+
+BASE_DIR = Path(__file__).resolve().parent
+U16_SCALE = 1 / 65535
+
+
+def build_bundle(catalog: Catalog, quantize: str = "u16") -> Dict[str, object]:
+    embedder = catalog.embedder
+    if not isinstance(embedder, TfidfEmbedder):
+        embedder = TfidfEmbedder(catalog.category_docs)
+    vectorizer = embedder.vectorizer
+    terms = [""] * len(vectorizer.vocabulary_)
+    for term, col in vectorizer.vocabulary_.items():
+        terms[col] = term
+
+    rows = embedder._matrix.tocsr()
+    rows.sort_indices()
+    if quantize == "u16":
+        # Rows are L2-normalised, so every weight is in (0, 1].
+        data = encode_array(np.rint(rows.data / U16_SCALE).astype(np.uint16).tolist(), "u2")
+        scale = U16_SCALE
+    else:
+        data = encode_array(rows.data.astype(np.float32).tolist(), "f4")
+        scale = 1.0
+
+    return {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "catalog": catalog.name,
+        "catalog_version": catalog.version,
+        "low_conf_threshold": LOW_CONF_THRESHOLD,
+        "tokenizer": {
+            "lowercase": vectorizer.lowercase,
+            "token_pattern": vectorizer.token_pattern,
+            "ngram_range": list(vectorizer.ngram_range),
+            "stop_words": sorted(vectorizer.get_stop_words() or ()),
+        },
+        "vocabulary": "\n".join(terms),
+        "idf": encode_array(vectorizer.idf_.astype(np.float32).tolist(), "f4"),
+        "matrix": {
+            "shape": list(rows.shape),
+            "indptr": encode_array(rows.indptr.tolist(), "u4"),
+            "indices": encode_array(rows.indices.tolist(), "u2" if len(terms) <= 65536 else "u4"),
+            "data": data,
+            "scale": scale,
+        },
+        "categories": [{"id": cid, "title": title} for cid, title in zip(catalog.categories.ids, catalog.categories.titles)],
+        "rules": [asdict(rule) for rule in catalog.rule_engine.rules],
+        "rule_ids": catalog.categories.ids + catalog.pathways.ids,
+    }
+
+
+def write_bundle(bundle: Dict[str, object], path: Path) -> None:
+    payload = json.dumps(bundle, separators=(",", ":")).encode("utf-8")
+    # mtime=0 so identical catalogs export byte-identical bundles.
+    with path.open("wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as fh:
+        fh.write(payload)
+
+
+def check_parity(scorer: ReferenceScorer, catalog: Catalog) -> Dict[str, object]:
+    """Max score difference and selection agreement with the server on the catalog's examples."""
+    import main as service
+
+    texts = [example for idx in range(len(catalog.categories)) for example in catalog.categories.examples(idx)[:1]]
+    max_diff = 0.0
+    same_selection = 0
+    for text in texts:
+        server = service._score_candidates(text, catalog=catalog)
+        local = scorer.score_candidates(text)
+        max_diff = max(max_diff, max(abs(a.final_score - b.final_score) for a, b in zip(server, local)))
+        selected_server, _ = select_categories(server, 0.12, None, 3, 8)
+        selected_local, _ = select_categories(local, 0.12, None, 3, 8)
+        same_selection += [c.id for c in selected_server] == [c.id for c in selected_local]
+    return {"queries": len(texts), "max_score_diff": max_diff, "same_selection": same_selection}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export the TF-IDF index as an offline scoring bundle.")
+    parser.add_argument("--output", type=Path, default=BASE_DIR / "suggest_bundle.json.gz")
+    parser.add_argument("--catalog", help="Named catalog under CATALOG_DIR (default: the root catalog).")
+    parser.add_argument("--quantize", choices=("u16", "f32"), default="u16")
+    args = parser.parse_args()
+
+    # The bundle is the TF-IDF index; don't load a transformer for the export.
+    os.environ["EMBEDDER_MODE"] = "tfidf"
+    import main as service
+
+    catalog = service.get_catalog(args.catalog)
+    bundle = build_bundle(catalog, args.quantize)
+    write_bundle(bundle, args.output)
+    print(f"Wrote {args.output} ({args.output.stat().st_size / 1024:.0f} KiB, {len(catalog.categories)} categories)")
+    print(json.dumps(check_parity(ReferenceScorer(bundle), catalog)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 from __future__ import annotations
 
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import hashlib
 import json
+import os
 import re
 from pathlib import Path
 
@@ -9,12 +14,21 @@ Generate categories.json from Merged_Clinical_Attributes.json.
 
 Goal: make semantic search robust for real-world paramedic free-text (jargon, abbreviations,
 and short under-pressure phrases), not "fieldName: Value" training text.
+
+Generation is incremental: a manifest stores a content hash per attribute, so only added or
+edited attributes are rebuilt (in a process pool when there are many), and a changelog of
+added/changed/removed ids is written for downstream consumers.
 """
 
 
 BASE_DIR = Path(__file__).resolve().parent
 MERGED_PATH = BASE_DIR / "Merged_Clinical_Attributes.json"
 OUTPUT_PATH = BASE_DIR / "categories.json"
+MANIFEST_PATH = BASE_DIR / "categories.manifest.json"
+CHANGELOG_PATH = BASE_DIR / "categories.changelog.json"
+
+# Below this many attributes to rebuild, process start-up costs more than it saves.
+PARALLEL_MIN_FIELDS = 2000
 
 # Baseline attributes from SYSTEM_DOCUMENTATION.md which are always suggested elsewhere
 # and should not dilute semantic search suggestions.
@@ -85,15 +99,22 @@ def _ascii(text: str) -> str:
     return text.encode("ascii", "ignore").decode("ascii") if text else ""
 
 
+_SPACES_RE = re.compile(r"\s+")
+_NON_ALNUM_RE = re.compile(r"[^a-zA-Z0-9\s]")
+_ACRONYM_BREAK_RE = re.compile(r"(?<=[A-Z])(?=[A-Z][a-z])")
+_CAMEL_BREAK_RE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_TERM_PUNCT = str.maketrans({"_": " ", ".": " ", ":": " ", "/": " "})
+
+
 def _norm_spaces(text: str) -> str:
-    return re.sub(r"\s+", " ", text).strip()
+    return _SPACES_RE.sub(" ", text).strip()
 
 
+@lru_cache(maxsize=65536)
 def _norm_term(text: str) -> str:
     # Lowercase and strip punctuation so synonyms match TF-IDF tokens too.
-    text = _ascii(text)
-    text = text.replace("_", " ").replace(".", " ").replace(":", " ").replace("/", " ")
-    text = re.sub(r"[^a-zA-Z0-9\s]", " ", text)
+    text = _ascii(text).translate(_TERM_PUNCT)
+    text = _NON_ALNUM_RE.sub(" ", text)
     return _norm_spaces(text).lower()
 
 
@@ -109,8 +130,8 @@ def _humanize(field: str) -> str:
     if " " in field:
         return field.strip()
     s = field.replace("_", " ")
-    s = re.sub(r"(?<=[A-Z])(?=[A-Z][a-z])", " ", s)
-    s = re.sub(r"(?<=[a-z0-9])(?=[A-Z])", " ", s)
+    s = _ACRONYM_BREAK_RE.sub(" ", s)
+    s = _CAMEL_BREAK_RE.sub(" ", s)
     s = _norm_spaces(s)
     if not s:
         return field
@@ -177,6 +198,7 @@ CATEGORY_OVERRIDES: dict[str, str] = {
 }
 
 
+@lru_cache(maxsize=None)
 def _short_category(category_name: str) -> str:
     normalized = _norm_term(category_name)
     if normalized in CATEGORY_OVERRIDES:
@@ -422,11 +444,79 @@ def _build_synonyms(category_name: str, field_title: str, field_name: str, descr
     return _dedupe_preserve(base)[:14]
 
 
+def _build_entry(category_name: str, field_name: str, field_info: dict) -> dict:
+    field_title = _humanize(field_name)
+    title = f"{category_name} - {field_title}"
+    description = field_info.get("description", "") or f"{field_title} field in {category_name}."
+    return {
+        "id": _ascii(f"{category_name}.{field_name}"),
+        "title": _ascii(title),
+        "description": _ascii(description),
+        "examples": _build_examples(category_name, field_name, field_title, field_info),
+        "synonyms": _build_synonyms(category_name, field_title, field_name, description),
+    }
+
+
+def _build_group(group: tuple[str, list[tuple[str, dict]]]) -> list[dict]:
+    category_name, fields = group
+    return [_build_entry(category_name, field_name, field_info) for field_name, field_info in fields]
+
+
+def _content_hash(category_name: str, field_name: str, field_info: dict) -> str:
+    payload = json.dumps([category_name, field_name, field_info], sort_keys=True, ensure_ascii=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _generator_hash() -> str:
+    # Any edit to the generation rules invalidates every cached attribute.
+    return hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
+
+def _read_json(path: Path, default: object) -> object:
+    if not path.exists():
+        return default
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _build_groups(groups: list[tuple[str, list[tuple[str, dict]]]], workers: int | None) -> list[dict]:
+    total = sum(len(fields) for _, fields in groups)
+    if workers is None:
+        workers = (os.cpu_count() or 1) if total >= PARALLEL_MIN_FIELDS else 1
+    workers = min(workers, len(groups))
+    if workers <= 1:
+        built = [_build_group(group) for group in groups]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map() preserves input order, so output is identical to a serial run.
+            built = list(pool.map(_build_group, groups, chunksize=max(1, len(groups) // (workers * 4))))
+    return [entry for entries in built for entry in entries]
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--input", type=Path, default=MERGED_PATH)
+    parser.add_argument("--output", type=Path, default=OUTPUT_PATH)
+    parser.add_argument("--manifest", type=Path, default=MANIFEST_PATH)
+    parser.add_argument("--changelog", type=Path, default=CHANGELOG_PATH)
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: auto).")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and rebuild everything.")
+    return parser.parse_args()
+
+
 def main() -> None:
-    merged = json.loads(MERGED_PATH.read_text(encoding="utf-8"))
+    args = _parse_args()
+    merged = json.loads(args.input.read_text(encoding="utf-8"))
     attributes = merged.get("attributes", {})
 
-    categories: list[dict] = []
+    generator_hash = _generator_hash()
+    manifest = _read_json(args.manifest, {})
+    reuse = not args.full and manifest.get("generator") == generator_hash
+    previous_hashes: dict[str, str] = manifest.get("attributes", {}) if reuse else {}
+    previous = {item["id"]: item for item in _read_json(args.output, [])}
+
+    ordered_ids: list[str] = []
+    hashes: dict[str, str] = {}
+    dirty: dict[str, list[tuple[str, dict]]] = {}
     excluded_baseline: list[str] = []
     excluded_hidden: list[str] = []
 
@@ -445,25 +535,42 @@ def main() -> None:
                 excluded_hidden.append(path)
                 continue
 
-            field_title = _humanize(field_name)
-            title = f"{category_name} - {field_title}"
-            description = field_info.get("description", "") or f"{field_title} field in {category_name}."
-
-            categories.append(
-                {
-                    "id": _ascii(path),
-                    "title": _ascii(title),
-                    "description": _ascii(description),
-                    "examples": _build_examples(category_name, field_name, field_title, field_info),
-                    "synonyms": _build_synonyms(category_name, field_title, field_name, description),
-                }
-            )
-
-    OUTPUT_PATH.write_text(json.dumps(categories, indent=2, ensure_ascii=True) + "\n", encoding="utf-8")
+            entry_id = _ascii(path)
+            ordered_ids.append(entry_id)
+            hashes[entry_id] = _content_hash(category_name, field_name, field_info)
+            if previous_hashes.get(entry_id) == hashes[entry_id] and entry_id in previous:
+                continue
+            dirty.setdefault(category_name, []).append((field_name, field_info))
+
+    rebuilt = {entry["id"]: entry for entry in _build_groups(list(dirty.items()), args.workers)}
+    categories = [rebuilt[i] if i in rebuilt else previous[i] for i in ordered_ids]
+
+    current_ids = set(ordered_ids)
+    changelog = {
+        "added": sorted(current_ids - previous.keys()),
+        "changed": sorted(i for i in rebuilt if i in previous and rebuilt[i] != previous[i]),
+        "removed": sorted(previous.keys() - current_ids),
+    }
+
+    # A reorder or a generator edit changes the output without changing any entry's content.
+    stale = manifest.get("ids") != ordered_ids or manifest.get("generator") != generator_hash
+    if any(changelog.values()) or stale or not args.output.exists():
+        args.output.write_text(json.dumps(categories, indent=2, ensure_ascii=True) + "\n", encoding="utf-8")
+    args.manifest.write_text(
+        json.dumps({"generator": generator_hash, "attributes": hashes, "ids": ordered_ids}, indent=2, sort_keys=True)
+        + "\n",
+        encoding="utf-8",
+    )
+    args.changelog.write_text(json.dumps(changelog, indent=2) + "\n", encoding="utf-8")
     print(
         json.dumps(
             {
                 "total_generated": len(categories),
+                "rebuilt": len(rebuilt),
+                "reused": len(categories) - len(rebuilt),
+                "added": len(changelog["added"]),
+                "changed": len(changelog["changed"]),
+                "removed": len(changelog["removed"]),
                 "excluded_baseline": excluded_baseline,
                 "excluded_hidden": excluded_hidden,
             },
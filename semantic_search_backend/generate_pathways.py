@@ -1,12 +1,25 @@
 from __future__ import annotations
 
+import argparse
+import codecs
 import json
 import re
+import tempfile
 from pathlib import Path
+from time import perf_counter
+from typing import BinaryIO, Iterable, Iterator
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported.
+    resource = None  # type: ignore[assignment]
 
 """
-Generate pathways.json from JRCALC_Protocols.json, using a tolerant line-based parser.
+Generate pathways.json from JRCALC_Protocols.json, using a tolerant streaming JSON parser.
 Goal: capture pathway name, category, and triggers for semantic search on natural language.
+
+Protocols are read in fixed-size chunks and yielded one record at a time, so memory stays
+constant regardless of file size, and minified or slightly malformed JSON still parses.
 """
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -53,14 +66,18 @@ def _ascii(text: str) -> str:
     return text.encode("ascii", "ignore").decode("ascii") if text else ""
 
 
+_SPACES_RE = re.compile(r"\s+")
+_NON_ALNUM_RE = re.compile(r"[^a-zA-Z0-9\s]")
+_TERM_PUNCT = str.maketrans({"_": " ", ".": " ", ":": " ", "/": " "})
+
+
 def _norm_spaces(text: str) -> str:
-    return re.sub(r"\s+", " ", text).strip()
+    return _SPACES_RE.sub(" ", text).strip()
 
 
 def _norm_term(text: str) -> str:
-    text = _ascii(text)
-    text = text.replace("_", " ").replace(".", " ").replace(":", " ").replace("/", " ")
-    text = re.sub(r"[^a-zA-Z0-9\s]", " ", text)
+    text = _ascii(text).translate(_TERM_PUNCT)
+    text = _NON_ALNUM_RE.sub(" ", text)
     return _norm_spaces(text).lower()
 
 
@@ -74,62 +91,135 @@ def _dedupe_preserve(items: list[str]) -> list[str]:
     return out
 
 
-def _extract_string(line: str) -> str:
-    match = re.search(r'"[^"]+"\s*:\s*"([^"]*)"', line)
-    return match.group(1) if match else ""
-
-
-def _parse_protocols(text: str) -> list[dict]:
-    protocols: list[dict] = []
-    current: dict[str, object] = {}
-    in_triggers = False
-    trigger_buffer: list[str] = []
-
-    def flush_current() -> None:
-        nonlocal current
-        if current.get("condition_id") and current.get("name"):
-            protocols.append(current)
-        current = {}
-
-    for raw in text.splitlines():
-        line = raw.strip()
-
-        if "\"condition_id\"" in line:
-            flush_current()
-            current["condition_id"] = _extract_string(line)
-            continue
-
-        if "\"name\"" in line and "condition_id" in current and "name" not in current:
-            current["name"] = _extract_string(line)
-            continue
-
-        if "\"category\"" in line and "condition_id" in current and "category" not in current:
-            current["category"] = _extract_string(line)
-            continue
-
-        if "\"triggers\"" in line and "condition_id" in current:
-            in_triggers = True
-            trigger_buffer = [line]
-            if "]" in line:
-                in_triggers = False
-                blob = " ".join(trigger_buffer)
-                triggers = re.findall(r"\"([^\"]+)\"", blob)
-                if triggers and triggers[0].lower() == "triggers":
-                    triggers = triggers[1:]
-                current["triggers"] = triggers
-            continue
-
-        if in_triggers:
-            trigger_buffer.append(line)
-            if "]" in line:
-                in_triggers = False
-                blob = " ".join(trigger_buffer)
-                triggers = re.findall(r"\"([^\"]+)\"", blob)
-                current["triggers"] = triggers
-            continue
-
-    flush_current()
-    return protocols
+CHUNK_SIZE = 1 << 16
+RECORD_KEYS = ("condition_id", "name", "category")
+
+# Commas carry no information for record extraction, so they are skipped with whitespace.
+# Strings may not span lines, so an unterminated string only loses its own line.
+_TOKEN_RE = re.compile(
+    r"""
+    [\s,]*
+    (?:
+        (?P<string>"(?:[^"\\\n]|\\.)*")
+      | (?P<punct>[{}\[\]:])
+      | (?P<bare>[^\s{}\[\]:,"/]+)
+      | (?P<comment>//[^\n]*|/\*.*?\*/)
+      | (?P<stray>.)
+    )
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_YIELDED_KINDS = {"string", "punct", "bare"}
+
+
+def _tokens(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[tuple[str, str]]:
+    """Yield (kind, text) JSON tokens from a byte stream, holding one chunk plus one token."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    buf = ""
+    eof = False
+    while not eof:
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buf += decoder.decode(chunk, final=eof)
+        pos = len(buf)
+        for match in _TOKEN_RE.finditer(buf):
+            kind = match.lastgroup
+            if not eof and (
+                match.end() == len(buf)
+                or (kind == "stray" and match.group(kind) in "\"/" and "\n" not in buf[match.start(kind):])
+            ):
+                # May continue in the next chunk (a bare word, comment or string still open).
+                pos = match.start()
+                break
+            if kind in _YIELDED_KINDS:
+                yield kind, match.group(kind)  # type: ignore[misc]
+        buf = buf[pos:]
+
+
+def _unquote(token: str) -> str:
+    if "\\" not in token:
+        return token[1:-1]
+    try:
+        return json.loads(token)
+    except ValueError:
+        return token[1:-1]
+
+
+def _close(frame: list, parent: list | None) -> dict | None:
+    """Pop bookkeeping: hand a finished triggers array to its object, or return a finished record."""
+    kind, data, _ = frame
+    if kind == "arr":
+        if data is not None and parent is not None:
+            parent[1].setdefault("triggers", data)
+        return None
+    if data.get("condition_id") and data.get("name"):
+        return data
+    return None
+
+
+def _iter_protocols(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """Yield {condition_id, name, category, triggers} for every object carrying those keys.
+
+    Only the record fields of currently open objects are kept; everything else (steps,
+    prompts, nested data) is skipped as it streams past. Missing or trailing commas and
+    comments are ignored, a mismatched bracket closes the nearest matching container, and
+    objects still open at end of input (truncated files) are flushed.
+    """
+    # Frames are [kind, data, pending_key]; data is the record fields for objects, and the
+    # collected strings for a "triggers" array (None for arrays we don't care about).
+    stack: list[list] = []
+    last_string: str | None = None
+
+    def value(text: str, quoted: bool) -> None:
+        if not stack:
+            return
+        frame = stack[-1]
+        if frame[0] == "obj":
+            if quoted and frame[2] in RECORD_KEYS:
+                frame[1].setdefault(frame[2], text)
+            frame[2] = None
+        elif quoted and frame[1] is not None:
+            frame[1].append(text)
+
+    for kind, text in _tokens(stream, chunk_size):
+        if last_string is not None:
+            pending, last_string = last_string, None
+            if text == ":":
+                if stack and stack[-1][0] == "obj":
+                    stack[-1][2] = pending
+                continue
+            value(pending, quoted=True)
+        if kind == "string":
+            last_string = _unquote(text)
+        elif kind == "bare":
+            value(text, quoted=False)
+        elif text == "{":
+            stack.append(["obj", {}, None])
+        elif text == "[":
+            parent = stack[-1] if stack else None
+            wanted = parent is not None and parent[0] == "obj" and parent[2] == "triggers"
+            stack.append(["arr", [] if wanted else None, None])
+        elif text in "}]":
+            want = "obj" if text == "}" else "arr"
+            if not any(frame[0] == want for frame in stack):
+                continue
+            while True:
+                frame = stack.pop()
+                record = _close(frame, stack[-1] if stack else None)
+                if record is not None:
+                    yield record
+                if frame[0] == want:
+                    break
+            if stack and stack[-1][0] == "obj":
+                stack[-1][2] = None
+
+    if last_string is not None:
+        value(last_string, quoted=True)
+    while stack:
+        frame = stack.pop()
+        record = _close(frame, stack[-1] if stack else None)
+        if record is not None:
+            yield record
 
 
 def _build_examples(name: str, triggers: list[str]) -> list[str]:
@@ -171,11 +261,7 @@ def _build_synonyms(name: str, category: str, triggers: list[str]) -> list[str]:
     return _dedupe_preserve([s for s in syns if s])[:20]
 
 
-def main() -> None:
-    text = PROTOCOLS_PATH.read_text(encoding="utf-8", errors="ignore")
-    protocols = _parse_protocols(text)
-
-    pathways: list[dict] = []
+def _iter_pathways(protocols: Iterable[dict]) -> Iterator[dict]:
     for proto in protocols:
         condition_id = str(proto.get("condition_id", "")).strip()
         name = str(proto.get("name", "")).strip()
@@ -189,18 +275,86 @@ def main() -> None:
         if category:
             description = f"JRCalc pathway for {name} ({category})."
 
-        pathways.append(
-            {
-                "id": _ascii(condition_id),
-                "title": _ascii(name),
-                "description": _ascii(description),
-                "examples": _build_examples(name, triggers),
-                "synonyms": _build_synonyms(name, category, triggers),
+        yield {
+            "id": _ascii(condition_id),
+            "title": _ascii(name),
+            "description": _ascii(description),
+            "examples": _build_examples(name, triggers),
+            "synonyms": _build_synonyms(name, category, triggers),
+        }
+
+
+def _write_json_array(path: Path, items: Iterable[dict]) -> int:
+    """Stream items to path, byte-identical to json.dumps(list(items), indent=2)."""
+    count = 0
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as out:
+        out.write("[")
+        for item in items:
+            body = json.dumps(item, indent=2, ensure_ascii=True).replace("\n", "\n  ")
+            out.write(("\n  " if count == 0 else ",\n  ") + body)
+            count += 1
+        out.write("\n]\n" if count else "]\n")
+    tmp_path.replace(path)
+    return count
+
+
+def _generate(protocols_path: Path, output_path: Path) -> int:
+    with protocols_path.open("rb") as stream:
+        return _write_json_array(output_path, _iter_pathways(_iter_protocols(stream)))
+
+
+def _write_synthetic(path: Path, count: int) -> None:
+    names = ["Asthma", "Chest Pain", "Stroke", "Anaphylaxis", "Hypoglycaemia", "Convulsion"]
+    with path.open("w", encoding="utf-8") as out:
+        out.write('{"protocols":[')
+        for idx in range(count):
+            name = names[idx % len(names)]
+            proto = {
+                "condition_id": f"jrc_synthetic_{idx}",
+                "name": f"{name} {idx}",
+                "category": "Synthetic",
+                "triggers": [name.lower(), f"trigger {idx}", "pt unwell"],
+                "steps": [{"step_order": step, "instruction": "Assess", "value_options": ["A", "B"]} for step in range(3)],
             }
-        )
+            out.write(("," if idx else "") + json.dumps(proto, separators=(",", ":")))
+        out.write("]}")
 
-    OUTPUT_PATH.write_text(json.dumps(pathways, indent=2, ensure_ascii=True) + "\n", encoding="utf-8")
-    print(json.dumps({"total_pathways": len(pathways)}, indent=2))
+
+def _benchmark(count: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        protocols_path = Path(tmp) / "protocols.json"
+        output_path = Path(tmp) / "pathways.json"
+        _write_synthetic(protocols_path, count)
+
+        start = perf_counter()
+        total = _generate(protocols_path, output_path)
+        elapsed = perf_counter() - start
+
+        report: dict[str, object] = {
+            "protocols": total,
+            "input_mb": round(protocols_path.stat().st_size / 1e6, 1),
+            "seconds": round(elapsed, 2),
+            "protocols_per_second": int(total / elapsed),
+        }
+        if resource is not None:
+            # ru_maxrss is KiB on Linux.
+            report["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        print(json.dumps(report, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate pathways.json from JRCALC protocols.")
+    parser.add_argument("--input", type=Path, default=PROTOCOLS_PATH)
+    parser.add_argument("--output", type=Path, default=OUTPUT_PATH)
+    parser.add_argument("--bench", type=int, metavar="N", help="Benchmark on N synthetic protocols instead.")
+    args = parser.parse_args()
+
+    if args.bench:
+        _benchmark(args.bench)
+        return
+    total = _generate(args.input, args.output)
+    print(json.dumps({"total_pathways": total}, indent=2))
 
 
 if __name__ == "__main__":
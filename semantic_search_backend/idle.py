@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import os
+import threading
+from time import monotonic
+from typing import Callable, Dict, Iterable, Optional
+
+from embedder import SentenceTransformerEmbedder, release_memory, transformer_models
+from memory import process_memory
+
+"""
+Idle unloading of transformer models for bursty, memory-constrained deployments.
+
+After MODEL_IDLE_S seconds without a query, each worker drops its transformer (and with
+MODEL_IDLE_DROP_MATRICES its catalog matrices' resident pages). The next query starts a
+background reload from the local model cache and is answered from a TF-IDF fallback
+(`meta.tier == "fallback"`) until the model is back. See main.Catalog.release.
+
+    python idle.py --bench   # RSS reclaimed and cold-reload latency for the configured model
+"""
+
+# Seconds without a query before the transformer is unloaded; 0 keeps it loaded.
+MODEL_IDLE_S = float(os.getenv("MODEL_IDLE_S", "0"))
+MODEL_IDLE_DROP_MATRICES = os.getenv("MODEL_IDLE_DROP_MATRICES", "0").strip().lower() in ("1", "true", "yes")
+
+
+class IdleUnloader:
+    """Background check that unloads models unused for `idle_s`.
+
+    `release()` runs after each unload (main passes one that prepares the fallback indexes
+    and drops matrix pages). The thread starts lazily and is restarted after fork, like
+    the encode pool, so pre-forked workers each watch their own models.
+    """
+
+    def __init__(
+        self,
+        idle_s: float = MODEL_IDLE_S,
+        models: Callable[[], Iterable[SentenceTransformerEmbedder]] = transformer_models,
+        release: Optional[Callable[[], None]] = None,
+        check_s: Optional[float] = None,
+    ) -> None:
+        self.idle_s = idle_s
+        self.models = models
+        self.release = release
+        self.check_s = check_s if check_s is not None else min(10.0, max(0.05, idle_s / 4))
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"unloads": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.idle_s > 0
+
+    def ensure_started(self) -> None:
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="idle-unloader", daemon=True).start()
+
+    def _run(self) -> None:
+        stop = threading.Event()  # Never set: just an interruptible sleep.
+        while not stop.wait(self.check_s):
+            self.check()
+
+    def check(self, now: Optional[float] = None) -> int:
+        """Unload every model idle for at least idle_s; returns how many were unloaded."""
+        now = monotonic() if now is None else now
+        unloaded = sum(1 for model in self.models() if now - model.last_used >= self.idle_s and model.unload())
+        if unloaded:
+            self.stats["unloads"] += unloaded
+            if self.release is not None:
+                self.release()
+            release_memory()
+        return unloaded
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            **self.stats,
+            "idle_s": self.idle_s,
+            "models": {
+                model.model_name: {"loaded": model.loaded, "idle_s": round(monotonic() - model.last_used, 1), **model.stats}
+                for model in self.models()
+            },
+        }
+
+
+def _bench() -> None:
+    """Unload, answer from the fallback, reload: RSS at each step and the latencies."""
+    import json
+    from time import perf_counter
+
+    import main
+
+    models = transformer_models()
+    if not models:
+        raise SystemExit(f"{main.EMBEDDER.name} has no transformer to unload; set EMBEDDER_MODEL.")
+    text = "central chest pain radiating to the left arm, sweaty"
+
+    def timed_query(label: str) -> None:
+        meta: Dict[str, object] = {}
+        start = perf_counter()
+        main._score_candidates(f"{text} ({label})", meta)  # Distinct text: no cached scores.
+        report[f"{label}_query_ms"] = round((perf_counter() - start) * 1000, 1)
+        report[f"{label}_tier"] = meta["tier"]
+
+    report: Dict[str, object] = {"model": main.EMBEDDER.name, "drop_matrices": MODEL_IDLE_DROP_MATRICES}
+    timed_query("warm")
+    report["rss_loaded"] = process_memory()
+    start = perf_counter()
+    IdleUnloader(idle_s=1e-9, release=main.release_idle).check()
+    report["unload_ms"] = round((perf_counter() - start) * 1000, 1)
+    report["rss_unloaded"] = process_memory()
+    timed_query("fallback")
+    for model in models:
+        reload = model.reload()
+        if reload is not None:
+            reload.join()
+    report["cold_reload_ms"] = max(model.stats["last_reload_ms"] or 0.0 for model in models)
+    timed_query("first_after_reload")
+    report["rss_reloaded"] = process_memory()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Idle model unloading.")
+    parser.add_argument("--bench", action="store_true", help="Measure RSS reclaimed and cold-reload latency.")
+    if parser.parse_args().bench:
+        _bench()
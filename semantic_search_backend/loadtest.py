@@ -0,0 +1,375 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+from dataclasses import dataclass
+import io
+import json
+import math
+import os
+from pathlib import Path
+import random
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+import uuid
+import wave
+
+import httpx
+
+from stub_upstreams import StubProfile, start_stub
+
+"""
+Open-loop load generator for main.py and proxy_server.py.
+
+Drives each route with Poisson arrivals at its own rate (or replays a recorded request
+log, or one written by request_log.py, with its original timing), then reports
+throughput, latency percentiles and error rates per route. With --spawn the target is
+started against local upstream stand-ins (stub_upstreams.py), so /claude and /transcribe
+never reach the paid APIs.
+
+    python loadtest.py --spawn main --rate suggest=50 --rate pathways=20 --rate claude=5 --duration 30
+    python loadtest.py --spawn proxy --rate claude=10 --rate transcribe=2 --record run.jsonl
+    python loadtest.py --target-url http://127.0.0.1:8000 --replay run.jsonl --speed 2
+    python loadtest.py --target-url http://127.0.0.1:8000 --replay requests.jsonl   # REQUEST_LOG_PATH output
+"""
+
+BASE_DIR = Path(__file__).resolve().parent
+ROUTES = {"suggest": "/suggest", "pathways": "/pathways/suggest", "claude": "/claude", "transcribe": "/transcribe"}
+DEFAULT_PORTS = {"main": 8000, "proxy": 8080}
+
+
+@dataclass
+class Sample:
+    route: str
+    status: int  # 0 when the request failed without a response
+    latency_ms: float
+    error: Optional[str] = None
+
+
+def _wav(seconds: float = 1.0, rate: int = 16000) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(b"\x00\x00" * int(seconds * rate))
+    return buf.getvalue()
+
+
+def _multipart(fields: Dict[str, str], filename: str, data: bytes, content_type: str) -> tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    ]
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n".encode() + data + b"\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class Payloads:
+    """Request specs ({path, headers, json | body_b64}) in the recorded-log format."""
+
+    def __init__(self, texts: Sequence[str], stream_fraction: float = 0.0, seed: int = 0) -> None:
+        self.texts = list(texts)
+        self.stream_fraction = stream_fraction
+        self.rng = random.Random(seed)
+        self.wav = _wav()
+
+    def build(self, route: str) -> Dict[str, object]:
+        text = self.rng.choice(self.texts)
+        if route == "suggest":
+            return {"path": ROUTES[route], "json": {"text": text, "max_results": 20, "min_results": 3}}
+        if route == "pathways":
+            return {"path": ROUTES[route], "json": {"text": text, "min_score": 0.35}}
+        if route == "claude":
+            body = {
+                "model": "stub",
+                "max_tokens": 256,
+                "messages": [{"role": "user", "content": f"Summarise for handover: {text}"}],
+            }
+            if self.rng.random() < self.stream_fraction:
+                body["stream"] = True
+            return {
+                "path": ROUTES[route],
+                "headers": {"x-api-key": "load-test", "anthropic-version": "2023-06-01"},
+                "json": body,
+            }
+        if route == "transcribe":
+            body, content_type = _multipart({"model_id": "scribe_v1"}, "clip.wav", self.wav, "audio/wav")
+            return {
+                "path": ROUTES[route],
+                "headers": {"xi-api-key": "load-test", "Content-Type": content_type},
+                "body_b64": base64.b64encode(body).decode(),
+            }
+        raise ValueError(f"Unknown route: {route}")
+
+    def stand_in(self, digest: str, length: int) -> str:
+        """Text of `length` characters for a logged query: equal digests get equal text."""
+        rng = random.Random(digest)
+        text = ""
+        while len(text) < length:
+            text = f"{text} {rng.choice(self.texts)}".strip()
+        return text[:length]
+
+    def materialize(self, entry: Dict[str, object]) -> Dict[str, object]:
+        """A request spec for a request_log.py record (text hashed, body not kept); others pass through."""
+        if "json" in entry or "body_b64" in entry or not ("text_sha256" in entry or "audio_s" in entry):
+            return entry
+        spec: Dict[str, object] = {"t": entry.get("t", 0.0), "path": entry["path"], "headers": dict(entry.get("headers") or {})}
+        params = dict(entry.get("params") or {})
+        text = self.stand_in(str(entry.get("text_sha256", "")), int(entry.get("text_len", 0)))
+        route = _route_of(str(entry["path"]))
+        if route == "claude":
+            spec["headers"] = {"x-api-key": "load-test", "anthropic-version": "2023-06-01", **spec["headers"]}
+            spec["json"] = {**params, "messages": [{"role": "user", "content": text}]}
+        elif route == "transcribe":
+            body, content_type = _multipart(
+                {"model_id": str(params.get("model_id", "scribe_v1"))},
+                "clip.wav",
+                _wav(float(entry.get("audio_s") or 1.0)),
+                "audio/wav",
+            )
+            spec["headers"] = {"xi-api-key": "load-test", **spec["headers"], "Content-Type": content_type}
+            spec["body_b64"] = base64.b64encode(body).decode()
+        else:
+            spec["json"] = {**params, "text": text}
+        return spec
+
+
+def _route_of(path: str) -> str:
+    return next((name for name, route in ROUTES.items() if route == path), path)
+
+
+async def _fire(client: httpx.AsyncClient, spec: Dict[str, object], samples: List[Sample], gate: asyncio.Semaphore) -> None:
+    route = _route_of(str(spec["path"]))
+    headers = dict(spec.get("headers") or {})
+    if "json" in spec:
+        content = json.dumps(spec["json"]).encode()
+        headers.setdefault("Content-Type", "application/json")
+    else:
+        content = base64.b64decode(str(spec.get("body_b64", "")))
+    async with gate:
+        start = time.perf_counter()
+        try:
+            resp = await client.post(str(spec["path"]), content=content, headers=headers)
+            await resp.aread()
+            error = None if resp.status_code < 400 else f"http_{resp.status_code}"
+            samples.append(Sample(route, resp.status_code, (time.perf_counter() - start) * 1000, error))
+        except httpx.HTTPError as exc:
+            samples.append(Sample(route, 0, (time.perf_counter() - start) * 1000, type(exc).__name__))
+
+
+async def run_rates(
+    client: httpx.AsyncClient,
+    payloads: Payloads,
+    rates: Dict[str, float],
+    duration: float,
+    max_in_flight: int,
+    record: Optional[List[Dict[str, object]]] = None,
+) -> List[Sample]:
+    samples: List[Sample] = []
+    gate = asyncio.Semaphore(max_in_flight)
+    tasks: List[asyncio.Task] = []
+    start = time.perf_counter()
+
+    async def arrivals(route: str, rate: float) -> None:
+        # Open loop: arrival times don't wait for responses, so queueing shows up as latency.
+        next_at = payloads.rng.expovariate(rate)
+        while next_at < duration:
+            await asyncio.sleep(max(0.0, next_at - (time.perf_counter() - start)))
+            spec = payloads.build(route)
+            if record is not None:
+                record.append({"t": round(next_at, 4), **spec})
+            tasks.append(asyncio.create_task(_fire(client, spec, samples, gate)))
+            next_at += payloads.rng.expovariate(rate)
+
+    await asyncio.gather(*(arrivals(route, rate) for route, rate in rates.items() if rate > 0))
+    await asyncio.gather(*tasks)
+    return samples
+
+
+async def run_replay(
+    client: httpx.AsyncClient, entries: Sequence[Dict[str, object]], speed: float, max_in_flight: int
+) -> List[Sample]:
+    samples: List[Sample] = []
+    gate = asyncio.Semaphore(max_in_flight)
+    tasks: List[asyncio.Task] = []
+    start = time.perf_counter()
+    entries = sorted(entries, key=lambda e: float(e.get("t", 0.0)))
+    origin = float(entries[0].get("t", 0.0)) if entries else 0.0  # Request logs carry wall-clock times.
+    for entry in entries:
+        await asyncio.sleep(max(0.0, (float(entry.get("t", 0.0)) - origin) / speed - (time.perf_counter() - start)))
+        tasks.append(asyncio.create_task(_fire(client, entry, samples, gate)))
+    await asyncio.gather(*tasks)
+    return samples
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return round(ordered[rank], 1)
+
+
+def summarize(samples: Sequence[Sample], wall_s: float) -> Dict[str, Dict[str, object]]:
+    by_route: Dict[str, List[Sample]] = {}
+    for sample in samples:
+        by_route.setdefault(sample.route, []).append(sample)
+    by_route["all"] = list(samples)
+    summary: Dict[str, Dict[str, object]] = {}
+    for route, rows in by_route.items():
+        latencies = [s.latency_ms for s in rows]
+        errors = [s for s in rows if s.error]
+        statuses: Dict[str, int] = {}
+        for s in rows:
+            key = str(s.status) if s.status else (s.error or "error")
+            statuses[key] = statuses.get(key, 0) + 1
+        summary[route] = {
+            "requests": len(rows),
+            "throughput_rps": round((len(rows) - len(errors)) / wall_s, 2) if wall_s else 0.0,
+            "error_rate": round(len(errors) / len(rows), 4) if rows else 0.0,
+            "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95),
+            "p99_ms": _percentile(latencies, 99),
+            "max_ms": round(max(latencies, default=0.0), 1),
+            "statuses": dict(sorted(statuses.items())),
+        }
+    return summary
+
+
+def _spawn_target(target: str, port: int, stub_url: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "CLAUDE_URL": f"{stub_url}/v1/messages",
+        "ELEVENLABS_URL": f"{stub_url}/v1/speech-to-text",
+        "PROXY_PORT": str(port),
+    }
+    if target == "main":
+        cmd = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"]
+        return subprocess.Popen(cmd, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return subprocess.Popen(
+        [sys.executable, str(BASE_DIR.parent / "proxy_server.py")],
+        cwd=BASE_DIR.parent,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def _wait_ready(base_url: str, proc: Optional[subprocess.Popen], timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if proc is not None and proc.poll() is not None:
+                raise SystemExit(f"Spawned target exited with code {proc.returncode}")
+            try:
+                if (await client.get("/metrics")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise SystemExit(f"{base_url} did not become ready within {timeout:.0f}s")
+
+
+def _parse_rates(items: Sequence[str]) -> Dict[str, float]:
+    rates: Dict[str, float] = {}
+    for item in items:
+        route, _, rate = item.partition("=")
+        if route not in ROUTES or not rate:
+            raise SystemExit(f"--rate expects ROUTE=RPS with ROUTE in {sorted(ROUTES)}, got {item!r}")
+        rates[route] = float(rate)
+    return rates
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, object]:
+    target = args.spawn or args.target
+    base_url = args.target_url or f"http://127.0.0.1:{DEFAULT_PORTS[target]}"
+    proc = stub = profile = None
+    if args.spawn:
+        profile = StubProfile(args.stub_latency_ms, args.stub_sigma, args.stub_error_rate, seed=args.seed)
+        stub = start_stub(0, profile)
+        proc = _spawn_target(args.spawn, int(base_url.rsplit(":", 1)[1]), f"http://127.0.0.1:{stub.server_address[1]}")
+    try:
+        await _wait_ready(base_url, proc)
+        limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            started = time.perf_counter()
+            rows = args.texts.read_text(encoding="utf-8").splitlines()
+            payloads = Payloads([json.loads(r)["text"] for r in rows if r.strip()], args.stream_fraction, args.seed)
+            if args.replay:
+                lines = args.replay.read_text(encoding="utf-8").splitlines()
+                entries = [payloads.materialize(json.loads(line)) for line in lines if line.strip()]
+                samples = await run_replay(client, entries, args.speed, args.max_in_flight)
+            else:
+                record: Optional[List[Dict[str, object]]] = [] if args.record else None
+                samples = await run_rates(client, payloads, _parse_rates(args.rate), args.duration, args.max_in_flight, record)
+                if args.record:
+                    args.record.write_text("".join(json.dumps(e) + "\n" for e in record or []), encoding="utf-8")
+            wall = time.perf_counter() - started
+            try:
+                server_metrics = (await client.get("/metrics")).json()
+            except (httpx.HTTPError, ValueError):
+                server_metrics = None
+        return {
+            "target": base_url,
+            "wall_s": round(wall, 2),
+            "routes": summarize(samples, wall),
+            "server_metrics": server_metrics,
+            "stub": dict(profile.stats) if profile else None,
+        }
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+        if stub is not None:
+            stub.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test main.py or proxy_server.py.")
+    parser.add_argument("--target", choices=sorted(DEFAULT_PORTS), default="main")
+    parser.add_argument("--target-url", help="Defaults to the target's usual localhost port.")
+    parser.add_argument("--spawn", choices=sorted(DEFAULT_PORTS), help="Start the target against stub upstreams.")
+    parser.add_argument("--rate", action="append", default=[], metavar="ROUTE=RPS", help=f"Routes: {', '.join(ROUTES)}")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--texts", type=Path, default=BASE_DIR / "labelled_queries.jsonl")
+    parser.add_argument("--stream-fraction", type=float, default=0.0, help="Share of /claude bodies with stream: true.")
+    parser.add_argument("--record", type=Path, help="Write the generated requests as a replayable JSONL log.")
+    parser.add_argument("--replay", type=Path, help="Replay a JSONL request log instead of generating traffic.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay time compression factor.")
+    parser.add_argument("--stub-latency-ms", type=float, default=600.0)
+    parser.add_argument("--stub-sigma", type=float, default=0.5)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    if not args.rate and not args.replay:
+        args.rate = ["suggest=20", "pathways=10", "claude=2"] if (args.spawn or args.target) == "main" else ["claude=5", "transcribe=2"]
+
+    result = asyncio.run(_main(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"target {result['target']}  wall {result['wall_s']}s")
+    print(f"{'route':<11}{'reqs':>7}{'ok rps':>9}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  statuses")
+    for route, row in result["routes"].items():
+        print(
+            f"{route:<11}{row['requests']:>7}{row['throughput_rps']:>9}{row['error_rate'] * 100:>6.1f}%"
+            f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}  {row['statuses']}"
+        )
+    if result["server_metrics"]:
+        print("server /metrics:", json.dumps(result["server_metrics"]))
+
+
+if __name__ == "__main__":
+    main()
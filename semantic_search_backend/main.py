@@ -1,29 +1,57 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
+from functools import cached_property, lru_cache
+import hashlib
 import json
 import logging
+import mmap
+import os
 from pathlib import Path
-from time import perf_counter
-from typing import Dict, List, Optional, Tuple
+import re
+from time import monotonic, perf_counter, thread_time, time
+from typing import Dict, List, Literal, Optional, Tuple
 
 try:
-    from fastapi import FastAPI, Request
+    from fastapi import BackgroundTasks, FastAPI, HTTPException, Request
     from pydantic import BaseModel, Field
 except ModuleNotFoundError:  # Allow importing scoring logic without API deps installed.
     FastAPI = None  # type: ignore[assignment]
     BaseModel = object  # type: ignore[assignment]
     Field = lambda *args, **kwargs: None  # type: ignore[assignment]
 
-from embedder import create_embedder, similarity_scores
+import numpy as np
+from scipy import sparse
+
+from admission import PRIORITIES, DeadlineExceeded, EncodeExecutor, Overloaded, limit_torch_threads
+from catalog_cache import CatalogCache
+from catalog_store import CatalogStore, load_store
+from coarse_index import CoarseIndex, build_index
+from embedder import FALLBACK_TIER, HashingEmbedder, TfidfEmbedder, create_embedder
+from idle import MODEL_IDLE_DROP_MATRICES, IdleUnloader
+from memory import INDEX_CACHE_DIR, process_memory
+from request_log import RequestLog, claude_fields, queue_logging, text_fields
+from rules import MAX_RULE_BOOST, RuleEngine, RuleHit, default_rules
+from selection import Candidate, build_candidates, dedupe_preserve, select_categories
+from shadow import Observation, ShadowEvaluator
+from vitals import VITALS_TIER, Vitals, VitalsExtractor
 
 
 DISCLAIMER = "Navigation aid only; not clinical decision support."
-LOW_CONF_THRESHOLD = 0.65
 PATHWAY_MIN_SCORE = 0.35
+# Weight of the pathway x category affinity prior added to final_score when pathway_id is given.
+PATHWAY_PRIOR_WEIGHT = float(os.getenv("PATHWAY_PRIOR_WEIGHT", "0.15"))
+PATHWAY_RESTRICT_MIN_AFFINITY = float(os.getenv("PATHWAY_RESTRICT_MIN_AFFINITY", "0.5"))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+# Per-trust catalogs live in CATALOG_DIR/<name>/categories.json (+ optional pathways.json).
+CATALOG_DIR = Path(os.getenv("CATALOG_DIR", Path(__file__).resolve().parent / "catalogs"))
+CATALOG_CACHE_MB = float(os.getenv("CATALOG_CACHE_MB", "512"))
+CATALOG_NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
 
 logger = logging.getLogger("semantic_search")
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+# Written by a background thread, so a slow stderr never stalls a request.
+queue_logging(logging.INFO)
 
 
 @dataclass
@@ -44,74 +72,312 @@ class Pathway:
     synonyms: List[str]
 
 
-def _load_categories(path: Path) -> List[Category]:
-    raw = json.loads(path.read_text(encoding="utf-8"))
-    seen = set()
-    categories: List[Category] = []
-    for item in raw:
-        if item["id"] in seen:
-            raise ValueError(f"Duplicate category id: {item['id']}")
-        seen.add(item["id"])
-        categories.append(
-            Category(
-                id=item["id"],
-                title=item["title"],
-                description=item["description"],
-                examples=list(item.get("examples", [])),
-                synonyms=list(item.get("synonyms", [])),
-            )
+def _load_categories(path: Path) -> CatalogStore[Category]:
+    return load_store(path, Category, "category")
+
+
+def _load_pathways(path: Path) -> CatalogStore[Pathway]:
+    return load_store(path, Pathway, "pathway")
+
+
+class Catalog:
+    """One catalog's categories and pathways with their index, rules and pathway prior.
+
+    The embedding model is shared between catalogs (create_embedder caches transformer and
+    static models); only the per-catalog vectors and TF-IDF vocabularies are held here.
+    Categories and pathways are columnar stores (catalog_store.py); lists of dataclasses
+    are converted. `backend` overrides EMBEDDER_MODE/EMBEDDER_MODEL (see backend_settings).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        categories: CatalogStore[Category] | List[Category],
+        pathways: CatalogStore[Pathway] | List[Pathway],
+        backend: Optional[str] = None,
+    ) -> None:
+        if not isinstance(categories, CatalogStore):
+            categories = CatalogStore.from_items(categories, Category, "category")
+        if not isinstance(pathways, CatalogStore):
+            pathways = CatalogStore.from_items(pathways, Pathway, "pathway")
+        self.name = name
+        self.backend = backend
+        self.categories = categories
+        self.category_docs = categories.docs  # Built on access; only the embedders keep anything.
+        self.embedder, self.category_matrix = create_embedder(
+            self.category_docs, groups=[cid.split(".", 1)[0] for cid in categories.ids], keys=categories.ids, backend=backend
         )
-    return categories
-
-
-def _load_pathways(path: Path) -> List[Pathway]:
-    raw = json.loads(path.read_text(encoding="utf-8"))
-    seen = set()
-    pathways: List[Pathway] = []
-    for item in raw:
-        if item["id"] in seen:
-            raise ValueError(f"Duplicate pathway id: {item['id']}")
-        seen.add(item["id"])
-        pathways.append(
-            Pathway(
-                id=item["id"],
-                title=item["title"],
-                description=item["description"],
-                examples=list(item.get("examples", [])),
-                synonyms=list(item.get("synonyms", [])),
-            )
+        self.category_index = build_index(self.category_matrix, categories.ids)
+
+        self.pathways = pathways
+        self.pathway_docs = pathways.docs
+        if self.embedder.name.startswith(("sentence-transformers:", "static:")):
+            self.pathway_embedder = self.embedder
+            self.pathway_matrix = self.embedder.embed_texts(self.pathway_docs)
+        else:
+            self.pathway_embedder, self.pathway_matrix = create_embedder(self.pathway_docs, keys=pathways.ids, backend=backend)
+
+        self.rule_engine = RuleEngine(
+            default_rules(categories.ids, list(zip(pathways.ids, pathways.titles))),
+            categories.ids + pathways.ids,
+        )
+        self.vitals = VitalsExtractor(categories.ids)
+        self.pathway_index = {pid: idx for idx, pid in enumerate(pathways.ids)}
+        self.pathway_affinity = self._pathway_affinity()
+        # Per catalog, so evicting a catalog drops its cached queries too.
+        self.category_scores = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._category_scores)
+        self._shadow: Optional[Catalog] = None
+        self._fallback: Optional[Tuple[TfidfEmbedder, TfidfEmbedder]] = None
+
+    @classmethod
+    def load(cls, name: str, directory: Path, default_pathways: Path) -> "Catalog":
+        pathways_path = directory / "pathways.json"
+        return cls(
+            name,
+            _load_categories(directory / "categories.json"),
+            _load_pathways(pathways_path if pathways_path.exists() else default_pathways),
         )
-    return pathways
-
-
-def _build_doc(item: Category | Pathway) -> str:
-    examples = "; ".join(item.examples)
-    synonyms = ", ".join(item.synonyms)
-    return f"{item.title}. {item.description}. Examples: {examples}. Synonyms: {synonyms}."
-
 
-def _dedupe_preserve(items: List[str]) -> List[str]:
-    seen = set()
-    deduped: List[str] = []
-    for item in items:
-        if item not in seen:
-            deduped.append(item)
-            seen.add(item)
-    return deduped
+    def _pathway_affinity(self) -> np.ndarray:
+        """Pathway x category prior in [0, 1], computed once at load.
+
+        Combines pathway/category document similarity in the category embedding space (min-max
+        scaled per pathway) with explicit links from the pathway's trigger phrases via the rules.
+        """
+        if self.pathway_embedder is self.embedder:
+            pathway_vecs = self.pathway_matrix
+        else:
+            pathway_vecs = self.embedder.embed_texts(self.pathway_docs)
+        sims = pathway_vecs @ self.category_matrix.T
+        sims = np.asarray(sims.toarray() if sparse.issparse(sims) else sims, dtype=np.float32)
+        low = sims.min(axis=1, keepdims=True)
+        span = sims.max(axis=1, keepdims=True) - low
+        affinity = (sims - low) / np.where(span == 0, 1.0, span)
+
+        category_index = {cid: idx for idx, cid in enumerate(self.categories.ids)}
+        for row in range(len(self.pathways)):
+            triggers = self.pathways.synonyms(row) + self.pathways.examples(row)
+            for cid, hit in self.rule_engine.apply("; ".join(triggers)).items():
+                col = category_index.get(cid)
+                if col is not None:
+                    affinity[row, col] = max(affinity[row, col], hit.boost / MAX_RULE_BOOST)
+        return affinity
+
+    def _category_scores(self, text: str) -> Tuple[np.ndarray, str]:
+        # Keyed on the query text alone, so the same text under different pathways is encoded once.
+        index = self.category_index if self.category_index is not None else self.category_matrix
+        scores, tier = self.embedder.score(text, index)
+        scores.setflags(write=False)
+        return scores, tier
+
+    def semantic_scores(self, text: str) -> Tuple[np.ndarray, str]:
+        """Cached category scores, or uncached lexical fallback scores while an idle-unloaded model reloads."""
+        if self.embedder.acquire():
+            self._fallback = None
+            return self.category_scores(text)
+        return self.lexical_fallback()[0].sparse_scores(text), FALLBACK_TIER
+
+    def semantic_scores_batch(self, texts: List[str]) -> List[Tuple[np.ndarray, str]]:
+        """semantic_scores for many texts, encoded together and bypassing the query cache (bulk_score.py)."""
+        if len(texts) < 2 or not self.embedder.acquire():
+            return [self.semantic_scores(text) for text in texts]
+        index = self.category_index if self.category_index is not None else self.category_matrix
+        unique = list(dict.fromkeys(texts))  # Archives repeat stock phrases; encode each once.
+        scored = dict(zip(unique, self.embedder.score_batch(unique, index)))
+        return [scored[text] for text in texts]
+
+    def pathway_scores(self, text: str) -> Tuple[np.ndarray, str]:
+        if self.pathway_embedder.acquire():
+            return self.pathway_embedder.score(text, self.pathway_matrix)
+        return self.lexical_fallback()[1].sparse_scores(text), FALLBACK_TIER
+
+    def lexical_fallback(self) -> Tuple[TfidfEmbedder, TfidfEmbedder]:
+        """TF-IDF indexes of the category and pathway docs; built when the model is unloaded, dropped once it is back."""
+        fallback = self._fallback
+        if fallback is None:
+            lexical = getattr(self.embedder, "lexical", None)  # A cascade already has one for categories.
+            fallback = self._fallback = (
+                lexical if isinstance(lexical, TfidfEmbedder) else TfidfEmbedder(self.category_docs),
+                TfidfEmbedder(self.pathway_docs),
+            )
+        return fallback
+
+    def release(self, cache_dir: Optional[Path] = None) -> None:
+        """After the model was unloaded for idleness: build the fallback and clear cached scores.
+
+        With `cache_dir`, the matrices are also moved to memory-mapped files there (if not already)
+        and their resident pages dropped; they fault back in from the page cache or disk on use.
+        """
+        if self.embedder.loaded and self.pathway_embedder.loaded:
+            return
+        self.lexical_fallback()
+        self.category_scores.cache_clear()
+        if cache_dir is None:
+            return
+        if not isinstance(self.category_matrix, np.memmap):
+            self.share(cache_dir)
+        for matrix in (self.category_matrix, self.pathway_matrix):
+            mapped = getattr(matrix, "_mmap", None)
+            if mapped is not None and hasattr(mapped, "madvise"):
+                mapped.madvise(mmap.MADV_DONTNEED)
+
+    def share(self, cache_dir: Path) -> None:
+        """Back the matrices with read-only memory-mapped files (see share_index)."""
+        if sparse.issparse(self.category_matrix):
+            return  # Hashed indexes are sparse, so each process keeps its own.
+        prefix = "" if self.name == DEFAULT_CATALOG_NAME else f"{self.name}-"
+        self.category_matrix = _mmap_matrix(cache_dir, f"{prefix}categories", self.category_matrix, self.embedder.name)
+        self.category_index = build_index(self.category_matrix, self.categories.ids)
+        self.category_scores.cache_clear()
+        self.pathway_matrix = _mmap_matrix(cache_dir, f"{prefix}pathways", self.pathway_matrix, self.embedder.name)
+
+    def shadow(self, backend: str) -> "Catalog":
+        """This catalog indexed by another backend, for shadow evaluation; built on first use and kept."""
+        shadow = self._shadow
+        if shadow is None or shadow.backend != backend:
+            start = perf_counter()
+            shadow = self._shadow = Catalog(self.name, self.categories, self.pathways, backend)
+            logger.info(
+                "shadow catalog built name=%s model=%s build_ms=%d",
+                self.name, shadow.embedder.name, (perf_counter() - start) * 1000,
+            )
+        return shadow
+
+    @cached_property
+    def version(self) -> str:
+        """Content hash of the ids and titles: the /catalog ETag, echoed in lean /suggest responses."""
+        digest = hashlib.sha256()
+        for store in (self.categories, self.pathways):
+            for item_id, title in zip(store.ids, store.titles):
+                digest.update(f"{item_id}\0{title}\0".encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    @cached_property
+    def listing(self) -> bytes:
+        """Serialized once; clients cache it and resolve ids to titles locally."""
+        return json.dumps(
+            {
+                "catalog": self.name,
+                "version": self.version,
+                "categories": [{"id": cid, "title": title} for cid, title in zip(self.categories.ids, self.categories.titles)],
+                "pathways": [{"id": pid, "title": title} for pid, title in zip(self.pathways.ids, self.pathways.titles)],
+            },
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate resident size: catalog columns, vectors, indexes and TF-IDF vocabularies (not shared models)."""
+        total = self.categories.nbytes + self.pathways.nbytes
+        for part in (self.category_matrix, self.pathway_matrix, self.pathway_affinity, self.category_index):
+            if isinstance(part, CoarseIndex):
+                total += part.centroids.nbytes + (0 if part.matrix is self.category_matrix else part.matrix.nbytes)
+            elif isinstance(part, np.ndarray) and not isinstance(part, np.memmap):
+                total += part.nbytes  # Memory-mapped matrices live in the shared page cache.
+            elif sparse.issparse(part):
+                total += part.data.nbytes + part.indices.nbytes + part.indptr.nbytes
+        for embedder in {id(e): e for e in (self.embedder, self.pathway_embedder)}.values():
+            if isinstance(embedder, TfidfEmbedder):
+                fitted = embedder._matrix
+                total += fitted.data.nbytes + fitted.indices.nbytes + fitted.indptr.nbytes
+                total += sum(len(term) + 80 for term in embedder.vectorizer.vocabulary_)
+            elif isinstance(embedder, HashingEmbedder):
+                total += embedder.nbytes
+        return total
 
 
 BASE_DIR = Path(__file__).resolve().parent
-CATEGORIES = _load_categories(BASE_DIR / "categories.json")
-CATEGORY_DOCS = [_build_doc(cat) for cat in CATEGORIES]
-EMBEDDER, CATEGORY_MATRIX = create_embedder(CATEGORY_DOCS)
-
-PATHWAYS = _load_pathways(BASE_DIR / "pathways.json")
-PATHWAY_DOCS = [_build_doc(pathway) for pathway in PATHWAYS]
-if EMBEDDER.name.startswith("sentence-transformers:"):
-    PATHWAY_EMBEDDER = EMBEDDER
-    PATHWAY_MATRIX = EMBEDDER.embed_texts(PATHWAY_DOCS)
-else:
-    PATHWAY_EMBEDDER, PATHWAY_MATRIX = create_embedder(PATHWAY_DOCS)
+DEFAULT_CATALOG_NAME = "default"
+DEFAULT_CATALOG = Catalog(
+    DEFAULT_CATALOG_NAME,
+    _load_categories(BASE_DIR / "categories.json"),
+    _load_pathways(BASE_DIR / "pathways.json"),
+)
+# The default catalog's state, as module globals for the scripts and tests that import it.
+CATEGORIES = DEFAULT_CATALOG.categories
+CATEGORY_DOCS = DEFAULT_CATALOG.category_docs
+EMBEDDER = DEFAULT_CATALOG.embedder
+CATEGORY_MATRIX = DEFAULT_CATALOG.category_matrix
+CATEGORY_INDEX = DEFAULT_CATALOG.category_index
+PATHWAYS = DEFAULT_CATALOG.pathways
+PATHWAY_DOCS = DEFAULT_CATALOG.pathway_docs
+PATHWAY_EMBEDDER = DEFAULT_CATALOG.pathway_embedder
+PATHWAY_MATRIX = DEFAULT_CATALOG.pathway_matrix
+RULE_ENGINE = DEFAULT_CATALOG.rule_engine
+PATHWAY_INDEX = DEFAULT_CATALOG.pathway_index
+PATHWAY_AFFINITY = DEFAULT_CATALOG.pathway_affinity
+_category_scores = DEFAULT_CATALOG.category_scores
+_SHARED_INDEX_DIR: Optional[Path] = None
+
+
+def _load_named_catalog(name: str) -> Catalog:
+    start = perf_counter()
+    catalog = Catalog.load(name, CATALOG_DIR / name, BASE_DIR / "pathways.json")
+    if _SHARED_INDEX_DIR is not None:
+        catalog.share(_SHARED_INDEX_DIR)
+    logger.info(
+        "catalog loaded name=%s categories=%d load_ms=%d size_mb=%.1f",
+        name, len(catalog.categories), (perf_counter() - start) * 1000, catalog.nbytes / 2**20,
+    )
+    return catalog
+
+
+CATALOGS: CatalogCache[Catalog] = CatalogCache(
+    _load_named_catalog,
+    lambda catalog: catalog.nbytes,
+    int(CATALOG_CACHE_MB * 2**20),
+    pinned={DEFAULT_CATALOG_NAME: DEFAULT_CATALOG},
+)
+
+
+def get_catalog(name: Optional[str]) -> Catalog:
+    """The named catalog (loaded on first use), or the default one; KeyError if unknown."""
+    name = name or DEFAULT_CATALOG_NAME
+    # Checked before the cache so arbitrary names never reach the loader (or the filesystem).
+    if name != DEFAULT_CATALOG_NAME and (
+        not CATALOG_NAME_RE.match(name) or not (CATALOG_DIR / name / "categories.json").is_file()
+    ):
+        raise KeyError(name)
+    return CATALOGS.get(name)
+
+
+def _mmap_matrix(cache_dir: Path, name: str, matrix: np.ndarray, model: str) -> np.ndarray:
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    digest = hashlib.sha256(f"{name}:{model}:{matrix.shape}".encode("utf-8") + matrix.tobytes()).hexdigest()
+    path = cache_dir / f"{name}-{digest[:16]}.npy"
+    if not path.exists():
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with tmp_path.open("wb") as fh:
+            np.save(fh, matrix)
+        tmp_path.replace(path)
+    return np.load(path, mmap_mode="r")
+
+
+def share_index(cache_dir: Path) -> None:
+    """Back the catalog matrices with read-only memory-mapped files.
+
+    Every worker process then maps the same page-cache pages instead of holding a private
+    copy, whether it was forked from a preloading parent or started independently.
+    """
+    global CATEGORY_MATRIX, CATEGORY_INDEX, PATHWAY_MATRIX, _SHARED_INDEX_DIR
+    _SHARED_INDEX_DIR = cache_dir  # Catalogs loaded later are shared as they load.
+    DEFAULT_CATALOG.share(cache_dir)
+    CATEGORY_MATRIX = DEFAULT_CATALOG.category_matrix
+    CATEGORY_INDEX = DEFAULT_CATALOG.category_index
+    PATHWAY_MATRIX = DEFAULT_CATALOG.pathway_matrix
+
+
+def release_idle(drop_matrices: bool = MODEL_IDLE_DROP_MATRICES) -> None:
+    """Run after an idle model unload (see idle.py): every loaded catalog prepares its fallback."""
+    cache_dir = None
+    if drop_matrices:
+        if _SHARED_INDEX_DIR is None:
+            share_index(INDEX_CACHE_DIR)  # Also repoints the module globals, so the arrays are freed.
+        cache_dir = _SHARED_INDEX_DIR
+    for catalog in CATALOGS.values():
+        catalog.release(cache_dir)
+
 
 app = FastAPI(title="Paramedic Handover Semantic Suggestions", version="1.0.0") if FastAPI else None
 
@@ -132,7 +398,13 @@ class SuggestRequest(BaseModel):
     min_score: Optional[float] = Field(None, ge=0.0)
     max_results: int = Field(8, ge=1, le=50)
     min_results: int = Field(3, ge=1, le=20)
+    pathway_id: Optional[str] = None
+    pathway_restrict: bool = False
+    catalog: Optional[str] = None
+    group_by_parent: bool = False
     session_id: Optional[str] = None
+    # ids: [{"id"}]; scores: [{"id", "final_score", "forced"}]; full: everything below plus meta.
+    view: Literal["ids", "scores", "full"] = "full"
 
 
 class Suggestion(BaseModel):
@@ -142,6 +414,7 @@ class Suggestion(BaseModel):
     semantic_score: float
     rule_boost: float
     why: List[str]
+    pathway_boost: float = 0.0
 
 
 class SuggestResponse(BaseModel):
@@ -152,6 +425,7 @@ class SuggestResponse(BaseModel):
 class PathwaySuggestRequest(BaseModel):
     text: str = Field(..., max_length=2000)
     min_score: Optional[float] = Field(None, ge=0.0, le=1.0)
+    catalog: Optional[str] = None
     session_id: Optional[str] = None
 
 
@@ -167,86 +441,17 @@ class PathwaySuggestResponse(BaseModel):
     meta: Dict[str, object]
 
 
-@dataclass
-class Candidate:
-    id: str
-    title: str
-    final_score: float
-    semantic_score: float
-    rule_boost: float
-    why: List[str]
-    forced: bool
-
-
 @dataclass
 class PathwayCandidate:
     id: str
     title: str
     semantic_score: float
     why: List[str]
+    rule_boost: float = 0.0
 
-
-def select_categories(
-    candidates: List[Candidate],
-    delta: float,
-    min_score: Optional[float],
-    min_results: int,
-    max_results: int,
-) -> Tuple[List[Candidate], Dict[str, object]]:
-    s_max = max((c.semantic_score for c in candidates), default=0.0)
-    low_confidence_mode = s_max < LOW_CONF_THRESHOLD
-    floor_score = min_score if min_score is not None else LOW_CONF_THRESHOLD
-    relative_threshold = s_max - delta
-    threshold_score = max(relative_threshold, floor_score)
-
-    if min_score is not None and threshold_score == min_score:
-        strategy_used = "combined"
-    elif threshold_score == floor_score and floor_score > relative_threshold:
-        strategy_used = "floor"
-    else:
-        strategy_used = "relative"
-
-    candidate_ids = {c.id for c in candidates if c.semantic_score >= threshold_score}
-    selected_ids: set[str] = set(candidate_ids)
-    floor_added_ids: List[str] = []
-    topk_added_ids: List[str] = []
-
-    if len(selected_ids) < min_results:
-        for candidate in sorted(candidates, key=lambda c: c.semantic_score, reverse=True):
-            if candidate.id in selected_ids:
-                continue
-            selected_ids.add(candidate.id)
-            if candidate.semantic_score >= floor_score:
-                floor_added_ids.append(candidate.id)
-            else:
-                topk_added_ids.append(candidate.id)
-            if len(selected_ids) >= min_results:
-                break
-
-    if len(selected_ids) > max_results:
-        limited = sorted(
-            (c for c in candidates if c.id in selected_ids),
-            key=lambda c: c.semantic_score,
-            reverse=True,
-        )
-        selected_ids = {c.id for c in limited[:max_results]}
-
-    selected = [c for c in candidates if c.id in selected_ids]
-    selected.sort(key=lambda c: c.semantic_score, reverse=True)
-
-    return selected, {
-        "strategy_used": strategy_used,
-        "s_max": s_max,
-        "forced_ids": [],
-        "baseline_added_ids": [],
-        "max_exceeded_due_to_forced": False,
-        "low_confidence_mode": low_confidence_mode,
-        "low_conf_threshold": LOW_CONF_THRESHOLD,
-        "threshold_score": threshold_score,
-        "floor_score": floor_score,
-        "floor_added_ids": floor_added_ids,
-        "topk_added_ids": topk_added_ids,
-    }
+    @property
+    def final_score(self) -> float:
+        return min(1.0, self.semantic_score + self.rule_boost)
 
 
 def select_pathway(
@@ -260,83 +465,321 @@ def select_pathway(
             "top_score": 0.0,
         }
 
-    top = max(candidates, key=lambda c: c.semantic_score)
+    top = max(candidates, key=lambda c: c.final_score)
     threshold = min_score if min_score is not None else PATHWAY_MIN_SCORE
-    selected = top if top.semantic_score >= threshold else None
+    selected = top if top.final_score >= threshold else None
     return selected, {
         "min_score": min_score,
         "threshold_score": threshold,
-        "top_score": top.semantic_score,
+        "top_score": top.final_score,
     }
 
 
-def _score_candidates(text: str) -> List[Candidate]:
-    if text.strip():
-        query_vec = EMBEDDER.embed_text(text)
-        sem_scores = similarity_scores(EMBEDDER, query_vec, CATEGORY_MATRIX)
-    else:
-        sem_scores = [0.0] * len(CATEGORIES)
-
-    candidates: List[Candidate] = []
-
-    for idx, cat in enumerate(CATEGORIES):
+def _candidates_from_scores(
+    sem_scores: np.ndarray,
+    rule_hits: Optional[Dict[str, RuleHit]] = None,
+    catalog: Optional[Catalog] = None,
+    explain: bool = True,
+) -> List[Candidate]:
+    return build_candidates((catalog or DEFAULT_CATALOG).categories.entries, sem_scores, rule_hits, explain)
+
+
+def _apply_pathway_prior(
+    candidates: List[Candidate], pathway_id: str, restrict: bool, catalog: Optional[Catalog] = None
+) -> List[Candidate]:
+    """Re-weight (and optionally restrict) candidates by their affinity to a pathway."""
+    catalog = catalog or DEFAULT_CATALOG
+    affinity = catalog.pathway_affinity[catalog.pathway_index[pathway_id]]
+    weighted: List[Candidate] = []
+    for idx, candidate in enumerate(candidates):
+        if restrict and affinity[idx] < PATHWAY_RESTRICT_MIN_AFFINITY and not candidate.forced:
+            continue
+        candidate.pathway_boost = PATHWAY_PRIOR_WEIGHT * float(affinity[idx])
+        candidate.final_score = min(1.0, candidate.final_score + candidate.pathway_boost)
+        if candidate.why:
+            candidate.why.insert(len(candidate.why) - 1, f"pathway_prior: {affinity[idx]:.2f}")
+        weighted.append(candidate)
+    return weighted
+
+
+def _score_candidates(
+    text: str,
+    meta: Optional[Dict[str, object]] = None,
+    catalog: Optional[Catalog] = None,
+    explain: bool = True,
+) -> List[Candidate]:
+    """Score every category; scoring details (the answering tier, extracted vitals) go into `meta` if given.
+
+    A query that is only vitals shorthand is not embedded (tier "vitals"; see vitals.py).
+    """
+    return _score_candidates_batch([text], None if meta is None else [meta], catalog, explain)[0]
+
+
+def _score_candidates_batch(
+    texts: List[str],
+    metas: Optional[List[Dict[str, object]]] = None,
+    catalog: Optional[Catalog] = None,
+    explain: bool = True,
+) -> List[List[Candidate]]:
+    """_score_candidates for each text, with the texts that need the embedder encoded as one batch."""
+    catalog = catalog or DEFAULT_CATALOG
+    vitals = [catalog.vitals.extract(text) if text.strip() else Vitals() for text in texts]
+    embed = [i for i, text in enumerate(texts) if text.strip() and not vitals[i].only]
+    semantic = dict(zip(embed, catalog.semantic_scores_batch([texts[i] for i in embed])))
+    zeros = np.zeros(len(catalog.categories), dtype=np.float32)
+    scored: List[List[Candidate]] = []
+    for i, text in enumerate(texts):
+        rule_hits: Dict[str, RuleHit] = {}
+        tier = None
+        sem_scores = zeros
+        if text.strip():
+            sem_scores, tier = semantic.get(i, (zeros, VITALS_TIER))
+            rule_hits = vitals[i].merge(catalog.rule_engine.apply(text))
+        if metas is not None:
+            metas[i]["tier"] = tier
+            metas[i]["vitals"] = vitals[i].to_meta()
+        scored.append(_candidates_from_scores(sem_scores, rule_hits, catalog, explain))
+    return scored
+
+
+def _group_by_parent(candidates: List[Candidate]) -> List[Dict[str, object]]:
+    groups: Dict[str, List[str]] = {}
+    for candidate in candidates:
+        groups.setdefault(candidate.id.split(".", 1)[0], []).append(candidate.id)
+    return [{"parent": parent, "ids": ids} for parent, ids in groups.items()]
+
+
+def _pathway_candidates_from_scores(
+    sem_scores: np.ndarray,
+    rule_hits: Optional[Dict[str, RuleHit]] = None,
+    catalog: Optional[Catalog] = None,
+) -> List[PathwayCandidate]:
+    candidates: List[PathwayCandidate] = []
+    rule_hits = rule_hits or {}
+    for idx, pathway in enumerate((catalog or DEFAULT_CATALOG).pathways.entries):
         sem_score = float(sem_scores[idx])
-        why: List[str] = []
-        why.append(f"semantic: {sem_score:.2f}")
+        hit = rule_hits.get(pathway.id)
         candidates.append(
-            Candidate(
-                id=cat.id,
-                title=cat.title,
-                final_score=sem_score,
+            PathwayCandidate(
+                id=pathway.id,
+                title=pathway.title,
                 semantic_score=sem_score,
-                rule_boost=0.0,
-                why=_dedupe_preserve(why),
-                forced=False,
+                why=dedupe_preserve((list(hit.why) if hit else []) + [f"semantic: {sem_score:.2f}"]),
+                rule_boost=hit.boost if hit else 0.0,
             )
         )
-
     return candidates
 
 
-def _score_pathways(text: str) -> List[PathwayCandidate]:
+def _score_pathways(
+    text: str, meta: Optional[Dict[str, object]] = None, catalog: Optional[Catalog] = None
+) -> List[PathwayCandidate]:
+    catalog = catalog or DEFAULT_CATALOG
+    if meta is not None:
+        meta["tier"] = None
     if not text.strip():
         return []
 
-    query_vec = PATHWAY_EMBEDDER.embed_text(text)
-    sem_scores = similarity_scores(PATHWAY_EMBEDDER, query_vec, PATHWAY_MATRIX)
-
-    candidates: List[PathwayCandidate] = []
-    for idx, pathway in enumerate(PATHWAYS):
-        sem_score = float(sem_scores[idx])
-        candidates.append(
-            PathwayCandidate(
-                id=pathway.id,
-                title=pathway.title,
-                semantic_score=sem_score,
-                why=[f"semantic: {sem_score:.2f}"],
-            )
-        )
-    return candidates
+    if catalog.vitals.extract(text).only:
+        sem_scores, tier = np.zeros(len(catalog.pathways), dtype=np.float32), VITALS_TIER
+    else:
+        sem_scores, tier = catalog.pathway_scores(text)
+    if meta is not None:
+        meta["tier"] = tier
+    return _pathway_candidates_from_scores(sem_scores, catalog.rule_engine.apply(text), catalog)
 
 
 if app is not None:
+    ENCODE_POOL = EncodeExecutor()
+    limit_torch_threads(ENCODE_POOL.workers)
+    DISCONNECT_POLL_S = 0.05
+    # Work abandoned before it finished, keyed "<route>.<reason>":
+    # expired (dropped before encoding), deadline (gave up mid-flight), disconnected.
+    DROPPED: Dict[str, int] = {}
+    SHADOW = ShadowEvaluator(yield_to=ENCODE_POOL)
+    IDLE = IdleUnloader(release=release_idle)
+    REQUEST_LOG = RequestLog()
+    # Replayed with the request; anything else (API keys included) stays out of the log.
+    LOGGED_HEADERS = ("x-priority", "x-deadline-ms")
+    # (stage, trace key of the timestamp that ends it)
+    STAGE_MARKS = [("queue", "started"), ("score", "scored"), ("select", "selected"), ("build", "finished"), ("send", "sent")]
+
+    def _request_deadline(http_request: Request) -> Optional[float]:
+        """X-Deadline-Ms is the client's remaining budget in ms; relative, so clock skew doesn't matter."""
+        raw = http_request.headers.get("x-deadline-ms")
+        if raw is None:
+            return None
+        try:
+            budget_ms = float(raw)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="X-Deadline-Ms must be a number of milliseconds")
+        return monotonic() + max(0.0, budget_ms) / 1000
+
+    def _dropped(route: str, reason: str) -> None:
+        key = f"{route}.{reason}"
+        DROPPED[key] = DROPPED.get(key, 0) + 1
+
+    async def _until_disconnected(http_request: Request) -> None:
+        while not await http_request.is_disconnected():
+            await asyncio.sleep(DISCONNECT_POLL_S)
+
+    async def _guarded(http_request: Request, route: str, work, deadline: Optional[float]):
+        """Await `work`, cancelling it if the client disconnects or its deadline passes."""
+        task = asyncio.ensure_future(work)
+        watcher = asyncio.ensure_future(_until_disconnected(http_request))
+        timeout = None if deadline is None else max(0.0, deadline - monotonic())
+        try:
+            done, _ = await asyncio.wait({task, watcher}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            watcher.cancel()
+        if task in done:
+            return task.result()
+        task.cancel()
+        if watcher in done:
+            _dropped(route, "disconnected")
+            # Nobody is listening; 499 (client closed request) only shows up in access logs.
+            return Response(status_code=499)
+        _dropped(route, "deadline")
+        return JSONResponse({"error": "Deadline exceeded"}, status_code=504)
+
+    async def _admit(http_request: Request, route: str, fn):
+        """Run CPU-bound scoring on the bounded encode pool; shed with 503 when it is saturated."""
+        priority = http_request.headers.get("x-priority", "interactive").lower()
+        if priority not in PRIORITIES:
+            raise HTTPException(status_code=400, detail=f"X-Priority must be one of {sorted(PRIORITIES)}")
+        deadline = _request_deadline(http_request)
+        IDLE.ensure_started()
+        try:
+            return await _guarded(http_request, route, ENCODE_POOL.run(fn, priority, deadline), deadline)
+        except Overloaded as exc:
+            return JSONResponse(
+                {"error": "Service overloaded, retry later", "reason": exc.reason},
+                status_code=503,
+                headers={"Retry-After": str(int(exc.retry_after_s))},
+            )
+        except DeadlineExceeded:
+            _dropped(route, "expired")
+            return JSONResponse({"error": "Deadline exceeded"}, status_code=504)
+
+    async def _serve(route: str, request, http_request: Request, background: BackgroundTasks, handler, shadow):
+        """Admit `handler(request, trace)`; shadow-compare and log the request once the response is out.
+
+        `trace` (only built when the request is sampled for either) collects the catalog, an
+        Observation of the result and stage timestamps.
+        """
+        arrived, arrived_wall = perf_counter(), time()
+        shadowed, logged = SHADOW.sample(), REQUEST_LOG.sample()
+        trace: Optional[Dict[str, object]] = {} if shadowed or logged else None
+
+        def run():
+            if trace is not None:
+                trace["started"] = perf_counter()
+            result = handler(request, trace)
+            if trace is not None:
+                trace["finished"] = perf_counter()
+            return result
+
+        try:
+            response = await _admit(http_request, route, run)
+        except HTTPException as exc:
+            _log_request(http_request, request, trace, exc.status_code, arrived, arrived_wall)
+            raise
+        status = response.status_code if isinstance(response, Response) else 200
+        # Background tasks run once the response has been sent.
+        if shadowed and "primary" in trace:
+            background.add_task(SHADOW.submit, route, trace["primary"], lambda: shadow(request, trace["catalog"]))
+        if logged or status >= 400:  # Errors are logged whether sampled or not.
+            background.add_task(_log_request, http_request, request, trace, status, arrived, arrived_wall)
+        return response
+
+    def _log_request(
+        http_request: Request, request, trace: Optional[Dict[str, object]], status: int, arrived: float, arrived_wall: float
+    ) -> None:
+        """Queue the request's log record; it is built and serialised on the log writer thread."""
+        ended = perf_counter()
+        trace = dict(trace or {})  # A handler cut off by a deadline may still be writing to it.
+
+        def record() -> Dict[str, object]:
+            # Each stage ends at its mark: queue wait, scoring, selection, building the response,
+            # then serialising and sending it. A missing mark (the request failed) folds into the next.
+            marks = {**trace, "sent": ended}
+            stages: Dict[str, float] = {}
+            previous = arrived
+            for stage, mark in STAGE_MARKS:
+                at = marks.get(mark)
+                if at is not None:
+                    stages[stage], previous = round((at - previous) * 1000, 2), at
+            primary: Optional[Observation] = trace.get("primary")
+            catalog: Optional[Catalog] = trace.get("catalog")
+            return {
+                "t": round(arrived_wall, 3),
+                "path": http_request.url.path,
+                "status": status,
+                "latency_ms": round((ended - arrived) * 1000, 2),
+                "stages_ms": stages,
+                "model": primary.model if primary else None,
+                "tier": trace.get("tier"),
+                "catalog": catalog.name if catalog else None,
+                "selected": primary.selected_ids if primary else None,
+                "params": request.model_dump(exclude={"text"}, exclude_defaults=True),
+                **text_fields(request.text),
+                "headers": {name: http_request.headers[name] for name in LOGGED_HEADERS if name in http_request.headers},
+                "pid": os.getpid(),
+            }
+
+        REQUEST_LOG.emit(record)
+
     @app.post("/suggest", response_model=SuggestResponse)
-    def suggest(request: SuggestRequest) -> SuggestResponse:
+    async def suggest(request: SuggestRequest, http_request: Request, background: BackgroundTasks):
+        return await _serve("suggest", request, http_request, background, _suggest, _shadow_suggest)
+
+    @app.post("/pathways/suggest", response_model=PathwaySuggestResponse)
+    async def suggest_pathway(request: PathwaySuggestRequest, http_request: Request, background: BackgroundTasks):
+        return await _serve("pathways", request, http_request, background, _suggest_pathway, _shadow_pathway)
+
+    def _request_catalog(name: Optional[str]) -> Catalog:
+        # Runs on the encode pool, so a first-use load never blocks the event loop. A load takes
+        # far longer than scoring, so it is kept out of the service time that admission predicts from.
+        try:
+            with ENCODE_POOL.untimed():
+                return get_catalog(name)
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"Unknown catalog: {name}")
+
+    def _suggest(request: SuggestRequest, trace: Optional[Dict[str, object]] = None) -> SuggestResponse:
+        """`trace`, if given, receives the catalog, an Observation of the result and stage timestamps."""
         start = perf_counter()
-        scored = _score_candidates(request.text)
+        catalog = _request_catalog(request.catalog)
+        if request.pathway_id is not None and request.pathway_id not in catalog.pathway_index:
+            raise HTTPException(status_code=400, detail=f"Unknown pathway_id: {request.pathway_id}")
+        score_meta: Dict[str, object] = {}
+        scored = _score_candidates(request.text, score_meta, catalog, explain=request.view == "full")
+        if request.pathway_id is not None:
+            scored = _apply_pathway_prior(scored, request.pathway_id, request.pathway_restrict, catalog)
+        scored_at = perf_counter()
         candidates, selection_meta = select_categories(
             scored,
             request.delta,
             request.min_score,
-            request.min_results,
+            _min_results(request, score_meta["tier"]),
             request.max_results,
         )
-        latency_ms = int((perf_counter() - start) * 1000)
+        elapsed_ms = (perf_counter() - start) * 1000
+        latency_ms = int(elapsed_ms)
+        if trace is not None:
+            primary = Observation(scored, candidates, elapsed_ms, catalog.embedder.name)
+            trace.update(catalog=catalog, primary=primary, tier=score_meta["tier"], scored=scored_at, selected=perf_counter())
 
-        logger.info("suggest latency_ms=%d model=%s", latency_ms, EMBEDDER.name)
+        if request.view != "full":
+            return _lean_suggest_response(candidates, request.view, catalog, latency_ms, score_meta["vitals"])
 
-        floor_added_ids = set(selection_meta.get("floor_added_ids", []))
-        topk_added_ids = set(selection_meta.get("topk_added_ids", []))
+        # Why each candidate made the cut; the rest cleared the threshold.
+        reasons = {cid: "selected_by_topk" for cid in selection_meta.get("topk_added_ids", [])}
+        reasons.update({cid: "selected_by_floor" for cid in selection_meta.get("floor_added_ids", [])})
+        reasons.update({cid: "selected_by_force" for cid in selection_meta.get("forced_added_ids", [])})
 
         suggestions = [
             Suggestion(
@@ -345,85 +788,217 @@ if app is not None:
                 final_score=round(c.final_score, 4),
                 semantic_score=round(c.semantic_score, 4),
                 rule_boost=round(c.rule_boost, 4),
-                why=_dedupe_preserve(
-                    c.why
-                    + (
-                        ["selected_by_floor"]
-                        if c.id in floor_added_ids
-                        else (
-                            ["selected_by_topk"]
-                            if c.id in topk_added_ids
-                            else ["selected_by_threshold"]
-                        )
-                    )
-                ),
+                pathway_boost=round(c.pathway_boost, 4),
+                why=dedupe_preserve(c.why + [reasons.get(c.id, "selected_by_threshold")]),
             )
             for c in candidates
         ]
         return SuggestResponse(
             suggestions=suggestions,
             meta={
-                "model": EMBEDDER.name,
+                "model": catalog.embedder.name,
+                "catalog": catalog.name,
                 "latency_ms": latency_ms,
                 "disclaimer": DISCLAIMER,
                 "delta": request.delta,
                 "min_score": request.min_score,
                 "max_results": request.max_results,
                 "min_results": request.min_results,
+                "pathway_id": request.pathway_id,
+                **score_meta,
                 **selection_meta,
+                **({"groups": _group_by_parent(candidates)} if request.group_by_parent else {}),
             },
         )
 
-    @app.post("/pathways/suggest", response_model=PathwaySuggestResponse)
-    def suggest_pathway(request: PathwaySuggestRequest) -> PathwaySuggestResponse:
+    def _min_results(request: SuggestRequest, tier: Optional[str]) -> int:
+        # Vitals-only queries select the fields their readings fill, without topping up with unrelated ones.
+        return 1 if tier == VITALS_TIER else request.min_results
+
+    def _lean_suggest_response(
+        candidates: List[Candidate], view: str, catalog: Catalog, latency_ms: int, vitals: List[Dict[str, object]]
+    ) -> Response:
+        # Serialized directly: no Suggestion models, why lists or selection meta to build.
+        if view == "ids":
+            rows = [{"id": c.id} for c in candidates]
+        else:
+            rows = [{"id": c.id, "final_score": round(c.final_score, 4), "forced": c.forced} for c in candidates]
+        meta = {"catalog": catalog.name, "catalog_version": catalog.version, "latency_ms": latency_ms}
+        if vitals:
+            meta["vitals"] = vitals
+        return Response(
+            content=json.dumps({"suggestions": rows, "meta": meta}, separators=(",", ":")),
+            media_type="application/json",
+        )
+
+    def _suggest_pathway(
+        request: PathwaySuggestRequest, trace: Optional[Dict[str, object]] = None
+    ) -> PathwaySuggestResponse:
         start = perf_counter()
-        candidates = _score_pathways(request.text)
+        catalog = _request_catalog(request.catalog)
+        score_meta: Dict[str, object] = {}
+        candidates = _score_pathways(request.text, score_meta, catalog)
+        scored_at = perf_counter()
         selected, selection_meta = select_pathway(candidates, request.min_score)
-        latency_ms = int((perf_counter() - start) * 1000)
-
-        logger.info("pathway_suggest latency_ms=%d model=%s", latency_ms, PATHWAY_EMBEDDER.name)
+        elapsed_ms = (perf_counter() - start) * 1000
+        latency_ms = int(elapsed_ms)
+        if trace is not None:
+            primary = Observation(candidates, [selected] if selected else [], elapsed_ms, catalog.pathway_embedder.name)
+            trace.update(catalog=catalog, primary=primary, tier=score_meta["tier"], scored=scored_at, selected=perf_counter())
 
         suggestion = None
         if selected:
             suggestion = PathwaySuggestion(
                 id=selected.id,
                 title=selected.title,
-                score=round(selected.semantic_score, 4),
-                why=_dedupe_preserve(selected.why + ["selected_by_threshold"]),
+                score=round(selected.final_score, 4),
+                why=dedupe_preserve(selected.why + ["selected_by_threshold"]),
             )
 
         return PathwaySuggestResponse(
             suggestion=suggestion,
             meta={
-                "model": PATHWAY_EMBEDDER.name,
+                "model": catalog.pathway_embedder.name,
+                "catalog": catalog.name,
                 "latency_ms": latency_ms,
                 "disclaimer": DISCLAIMER,
+                **score_meta,
                 **selection_meta,
             },
         )
 
+    def _shadow_suggest(request: SuggestRequest, catalog: Catalog) -> Observation:
+        """The /suggest selection as the shadow backend would make it (same rules, prior and thresholds)."""
+        shadow = catalog.shadow(SHADOW.backend)  # Built outside the timed section.
+        start, cpu_start = perf_counter(), thread_time()
+        score_meta: Dict[str, object] = {}
+        scored = _score_candidates(request.text, score_meta, shadow, explain=False)
+        if request.pathway_id is not None:
+            scored = _apply_pathway_prior(scored, request.pathway_id, request.pathway_restrict, shadow)
+        candidates, _ = select_categories(
+            scored, request.delta, request.min_score, _min_results(request, score_meta["tier"]), request.max_results
+        )
+        elapsed_ms, cpu_ms = (perf_counter() - start) * 1000, (thread_time() - cpu_start) * 1000
+        return Observation(scored, candidates, elapsed_ms, shadow.embedder.name, cpu_ms, score_meta["tier"])
+
+    def _shadow_pathway(request: PathwaySuggestRequest, catalog: Catalog) -> Observation:
+        shadow = catalog.shadow(SHADOW.backend)
+        start, cpu_start = perf_counter(), thread_time()
+        score_meta: Dict[str, object] = {}
+        candidates = _score_pathways(request.text, score_meta, shadow)
+        selected, _ = select_pathway(candidates, request.min_score)
+        elapsed_ms, cpu_ms = (perf_counter() - start) * 1000, (thread_time() - cpu_start) * 1000
+        return Observation(
+            candidates, [selected] if selected else [], elapsed_ms, shadow.pathway_embedder.name, cpu_ms, score_meta["tier"]
+        )
+
     import httpx
+    from fastapi.responses import JSONResponse, Response
+
+    from singleflight import SingleFlight, request_key
+
+    CLAUDE_URL = os.getenv("CLAUDE_URL", "https://api.anthropic.com/v1/messages")
+    CLAUDE_TIMEOUT_S = 60.0
+    COALESCE_FOLLOWER_TIMEOUT_S = 65.0
+    CLAUDE_FLIGHTS = SingleFlight()
+
+    async def _forward_claude(body: bytes, headers: Dict[str, str]) -> Tuple[int, str, bytes]:
+        async with httpx.AsyncClient() as client:
+            resp = await client.post(
+                CLAUDE_URL,
+                content=body,
+                headers=headers,
+                timeout=CLAUDE_TIMEOUT_S,
+            )
+        return resp.status_code, resp.headers.get("content-type", "application/json"), resp.content
+
+    def _log_claude(body: bytes, status: int, coalesced: Optional[str], arrived: float, arrived_wall: float, answered: float) -> None:
+        ended = perf_counter()
+
+        def record() -> Dict[str, object]:
+            return {
+                "t": round(arrived_wall, 3),
+                "path": "/claude",
+                "status": status,
+                "latency_ms": round((ended - arrived) * 1000, 2),
+                "stages_ms": {"upstream": round((answered - arrived) * 1000, 2), "send": round((ended - answered) * 1000, 2)},
+                "coalesced": coalesced,
+                "bytes_in": len(body),
+                **claude_fields(body),
+                "pid": os.getpid(),
+            }
+
+        REQUEST_LOG.emit(record)
 
     @app.post("/claude")
-    async def proxy_claude(request: Request):
+    async def proxy_claude(request: Request, background: BackgroundTasks):
+        arrived, arrived_wall = perf_counter(), time()
         body = await request.body()
         headers = {
             "Content-Type": "application/json",
             "x-api-key": request.headers.get("x-api-key", ""),
             "anthropic-version": request.headers.get("anthropic-version", "2023-06-01"),
         }
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                "https://api.anthropic.com/v1/messages",
-                content=body,
-                headers=headers,
-                timeout=60.0,
-            )
-        from fastapi.responses import Response
-        return Response(content=resp.content, status_code=resp.status_code, media_type=resp.headers.get("content-type", "application/json"))
+        key = request_key("/claude", headers["x-api-key"], headers["anthropic-version"], body)
+        deadline = _request_deadline(request)  # Before the coroutine exists: a bad header must not leave it unawaited.
+        # Cancelling a leader aborts its upstream call; a waiting follower takes over.
+        flight = CLAUDE_FLIGHTS.do(key, lambda: _forward_claude(body, headers), COALESCE_FOLLOWER_TIMEOUT_S)
+        try:
+            result = await _guarded(request, "claude", flight, deadline)
+        except asyncio.TimeoutError:
+            result = JSONResponse({"error": "Timed out waiting for identical in-flight request"}, status_code=504)
+        if isinstance(result, Response):
+            response, coalesced = result, None
+        else:
+            (status, media_type, content), shared = result
+            coalesced = "follower" if shared else "leader"
+            response = Response(content=content, status_code=status, media_type=media_type, headers={"X-Coalesced": coalesced})
+        if REQUEST_LOG.sample() or response.status_code >= 400:
+            background.add_task(_log_claude, body, response.status_code, coalesced, arrived, arrived_wall, perf_counter())
+        return response
+
+    @app.get("/catalog")
+    async def catalog_listing(request: Request, catalog: Optional[str] = None) -> Response:
+        """id -> title for a catalog's categories and pathways, versioned by ETag.
+
+        A catalog that is not resident is loaded on the encode pool, admitted like /suggest.
+        """
+
+        def resolve() -> Catalog:
+            try:
+                with ENCODE_POOL.untimed():
+                    resolved = get_catalog(catalog)
+            except KeyError:
+                raise HTTPException(status_code=404, detail=f"Unknown catalog: {catalog}")
+            resolved.listing  # Serialised once per catalog, off the event loop too.
+            return resolved
+
+        resolved = await _admit(request, "catalog", resolve)
+        if isinstance(resolved, Response):
+            return resolved  # Shed, expired or disconnected.
+        etag = f'"{resolved.version}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers=headers)
+        return Response(content=resolved.listing, media_type="application/json", headers=headers)
+
+    @app.get("/metrics")
+    def metrics() -> Dict[str, object]:
+        return {
+            "pid": os.getpid(),
+            "memory": process_memory(),
+            "claude_singleflight": CLAUDE_FLIGHTS.snapshot(),
+            "encode_pool": ENCODE_POOL.snapshot(),
+            "dropped": dict(DROPPED),
+            "category_index": dict(CATEGORY_INDEX.stats) if CATEGORY_INDEX is not None else None,
+            "catalogs": CATALOGS.snapshot(),
+            "shadow": SHADOW.snapshot() if SHADOW.enabled else None,
+            "idle": IDLE.snapshot() if IDLE.enabled else None,
+            "request_log": REQUEST_LOG.snapshot() if REQUEST_LOG.enabled else None,
+        }
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=False)
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=False, access_log=not REQUEST_LOG.enabled)
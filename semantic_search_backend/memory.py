@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Dict
+
+"""
+Process memory accounting and where the memory-mapped catalog matrices live, shared by the
+pre-forking launcher (serve.py), idle unloading (main.release_idle, idle.py) and /metrics.
+"""
+
+BASE_DIR = Path(__file__).resolve().parent
+INDEX_CACHE_DIR = Path(os.getenv("INDEX_CACHE_DIR", BASE_DIR / ".index_cache"))
+
+
+def process_memory(pid: int | str = "self") -> Dict[str, float]:
+    """RSS, PSS and shared memory in MB from /proc/<pid>/smaps_rollup (empty if unavailable)."""
+    try:
+        text = Path(f"/proc/{pid}/smaps_rollup").read_text()
+    except OSError:
+        return {}
+    kb: Dict[str, int] = {}
+    for line in text.splitlines()[1:]:
+        key, _, rest = line.partition(":")
+        parts = rest.split()
+        if len(parts) == 2 and parts[1] == "kB":
+            kb[key] = int(parts[0])
+    return {
+        "rss_mb": round(kb.get("Rss", 0) / 1024, 1),
+        "pss_mb": round(kb.get("Pss", 0) / 1024, 1),
+        "shared_mb": round((kb.get("Shared_Clean", 0) + kb.get("Shared_Dirty", 0)) / 1024, 1),
+    }
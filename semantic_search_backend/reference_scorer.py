@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import argparse
+from array import array
+import base64
+import gzip
+import json
+import math
+from pathlib import Path
+import re
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from rules import Rule, RuleEngine
+from selection import Candidate, CatalogEntry, build_candidates, select_categories
+from vitals import VITALS_TIER, VitalsExtractor
+
+"""
+Pure-Python reference scorer for exported TF-IDF bundles (see export_bundle.py).
+
+Reproduces the server's `_score_candidates` and `select_categories` in TF-IDF mode
+from the bundle alone (no numpy/sklearn), as the specification on-device ports are
+checked against:
+
+    python reference_scorer.py suggest_bundle.json.gz "chest pain radiating to left arm"
+
+Bundle layout (gzipped JSON, `format`/`version` below):
+  tokenizer     lowercase, token_pattern, ngram_range, stop_words (sklearn-compatible analyzer)
+  vocabulary    terms joined by "\n", in column order
+  idf           float32 per column
+  matrix        L2-normalised category rows as CSR: indptr (u4), indices (u2/u4), data (u2 x scale, or f4)
+  categories    [{"id", "title"}] in row order
+  rules, rule_ids   rules.Rule fields and the ids RuleEngine resolves their targets against
+Vitals shorthand is handled by vitals.py against the category ids, as on the server:
+vitals-only queries are not scored, and select without topping up to min_results.
+Arrays are base64 little-endian {"dtype", "data"}. Scores match the server to float32
+rounding for f4 data and within 1e-4 for u2. The server's coarse index (catalogs of
+COARSE_INDEX_MIN_FIELDS or more) may zero fields the exact scan here still scores.
+"""
+
+BUNDLE_FORMAT = "semantic-search-tfidf"
+BUNDLE_VERSION = 1
+_TYPECODES = {"u2": "H", "u4": "I", "f4": "f"}
+
+
+def encode_array(values: Sequence[float], dtype: str) -> Dict[str, str]:
+    packed = array(_TYPECODES[dtype], values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return {"dtype": dtype, "data": base64.b64encode(packed.tobytes()).decode("ascii")}
+
+
+def decode_array(encoded: Dict[str, str]) -> array:
+    packed = array(_TYPECODES[encoded["dtype"]])
+    packed.frombytes(base64.b64decode(encoded["data"]))
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed
+
+
+def load_bundle(path: Path) -> Dict[str, object]:
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+class ReferenceScorer:
+    def __init__(self, bundle: Dict[str, object]) -> None:
+        if bundle.get("format") != BUNDLE_FORMAT or bundle.get("version") != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported bundle: {bundle.get('format')} v{bundle.get('version')}")
+        tokenizer = bundle["tokenizer"]
+        self.lowercase = bool(tokenizer["lowercase"])
+        self.token_re = re.compile(tokenizer["token_pattern"])
+        self.ngram_range: Tuple[int, int] = tuple(tokenizer["ngram_range"])
+        self.stop_words = frozenset(tokenizer["stop_words"])
+        self.vocabulary = {term: col for col, term in enumerate(bundle["vocabulary"].split("\n"))}
+        self.idf = decode_array(bundle["idf"])
+        self.categories = [CatalogEntry(c["id"], c["title"]) for c in bundle["categories"]]
+        self.catalog_version = bundle.get("catalog_version")
+
+        # Inverted index (column -> [(row, weight)]): a query only touches rows sharing a term.
+        matrix = bundle["matrix"]
+        indptr, indices, data = (decode_array(matrix[key]) for key in ("indptr", "indices", "data"))
+        scale = float(matrix["scale"])
+        self._postings: Dict[int, List[Tuple[int, float]]] = {}
+        for row in range(len(self.categories)):
+            for pos in range(indptr[row], indptr[row + 1]):
+                self._postings.setdefault(indices[pos], []).append((row, data[pos] * scale))
+
+        rules = [
+            Rule(r["name"], tuple(r["triggers"]), tuple(r["targets"]), r["boost"], r["force"]) for r in bundle["rules"]
+        ]
+        self.rule_engine = RuleEngine(rules, bundle["rule_ids"])
+        self.vitals = VitalsExtractor([c.id for c in self.categories])
+
+    def analyze(self, text: str) -> List[str]:
+        """sklearn's word analyzer: tokenise, drop stop words, then emit n-grams."""
+        tokens = [t for t in self.token_re.findall(text.lower() if self.lowercase else text) if t not in self.stop_words]
+        low, high = self.ngram_range
+        return [" ".join(tokens[i : i + n]) for n in range(low, high + 1) for i in range(len(tokens) - n + 1)]
+
+    def category_scores(self, text: str) -> List[float]:
+        weights: Dict[int, float] = {}
+        for term in self.analyze(text):
+            col = self.vocabulary.get(term)
+            if col is not None:
+                weights[col] = weights.get(col, 0.0) + self.idf[col]
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        scores = [0.0] * len(self.categories)
+        if norm == 0:
+            return scores
+        for col, weight in weights.items():
+            for row, value in self._postings.get(col, ()):
+                scores[row] += weight / norm * value
+        return [min(1.0, max(0.0, score)) for score in scores]
+
+    def score_candidates(self, text: str, explain: bool = True, meta: Optional[Dict[str, object]] = None) -> List[Candidate]:
+        if meta is not None:
+            meta["tier"] = None
+        if not text.strip():
+            return build_candidates(self.categories, [0.0] * len(self.categories), None, explain)
+        vitals = self.vitals.extract(text)
+        if meta is not None:
+            meta["tier"] = VITALS_TIER if vitals.only else "tfidf"
+        scores = [0.0] * len(self.categories) if vitals.only else self.category_scores(text)
+        return build_candidates(self.categories, scores, vitals.merge(self.rule_engine.apply(text)), explain)
+
+    def suggest(
+        self,
+        text: str,
+        delta: float = 0.12,
+        min_score: Optional[float] = None,
+        min_results: int = 3,
+        max_results: int = 8,
+    ) -> Tuple[List[Candidate], Dict[str, object]]:
+        meta: Dict[str, object] = {}
+        candidates = self.score_candidates(text, meta=meta)
+        if meta["tier"] == VITALS_TIER:
+            min_results = 1
+        return select_categories(candidates, delta, min_score, min_results, max_results)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Score a query against an exported bundle, without the server.")
+    parser.add_argument("bundle", type=Path)
+    parser.add_argument("text")
+    parser.add_argument("--max-results", type=int, default=8)
+    args = parser.parse_args()
+
+    selected, meta = ReferenceScorer(load_bundle(args.bundle)).suggest(args.text, max_results=args.max_results)
+    for candidate in selected:
+        print(f"{candidate.final_score:.4f}  {candidate.id}  ({', '.join(candidate.why)})")
+    print(f"strategy={meta['strategy_used']} s_max={meta['s_max']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
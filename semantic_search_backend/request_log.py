@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import atexit
+import hashlib
+import hmac
+import io
+import json
+import logging
+import os
+import queue
+import random
+import secrets
+import sys
+import threading
+from time import monotonic
+from typing import Callable, Dict, List, Optional, TextIO, Union
+import wave
+
+"""
+Structured request logging that never blocks the request path.
+
+Requests hand a record (or a callable that builds one) to a bounded queue; a writer
+thread builds, serialises and writes them as JSON lines in batches. When the queue is
+full the record is dropped and counted. Records are sampled (REQUEST_LOG_SAMPLE_RATE;
+errors always qualify) and rate-limited (REQUEST_LOG_MAX_PER_S, a token bucket).
+
+Query text is never logged: records carry a keyed hash (REQUEST_LOG_SALT) and the length.
+Each line has the replay fields of loadtest.py (`t`, `path`, `params`, `headers`), which
+substitutes stand-in text of the same length, the same for equal hashes (so only within
+records written under one salt):
+
+    python loadtest.py --target-url http://127.0.0.1:8000 --replay requests.jsonl
+
+Also used by main.py's operational logger (see queue_logging) and by proxy_server.py.
+Standard library only, so the proxy can use it without numpy.
+"""
+
+# "-" writes to stdout; empty disables request logging.
+REQUEST_LOG_PATH = os.getenv("REQUEST_LOG_PATH", "-")
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "1.0"))
+REQUEST_LOG_MAX_PER_S = float(os.getenv("REQUEST_LOG_MAX_PER_S", "500"))
+REQUEST_LOG_QUEUE = int(os.getenv("REQUEST_LOG_QUEUE", "10000"))
+# Keys the text hash; set it per deployment so hashes of common phrases can't be looked up.
+# Unset, each process draws a random one (warned about when the first record hashes text),
+# so hashes only match within it.
+REQUEST_LOG_SALT = os.getenv("REQUEST_LOG_SALT") or secrets.token_hex(16)
+_salt_unwarned = not os.getenv("REQUEST_LOG_SALT")
+LOG_BATCH = 512
+LOG_FLUSH_S = 0.2
+
+logger = logging.getLogger("semantic_search")
+
+Item = Union[str, Dict[str, object], Callable[[], Optional[Dict[str, object]]]]
+
+
+def text_digest(text: str, salt: str = REQUEST_LOG_SALT) -> str:
+    return hmac.new(salt.encode("utf-8"), text.encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+
+def text_fields(text: str) -> Dict[str, object]:
+    global _salt_unwarned
+    if _salt_unwarned:
+        _salt_unwarned = False
+        logger.warning(
+            "REQUEST_LOG_SALT is not set; text hashes use a random per-process salt and "
+            "cannot be compared across processes or restarts"
+        )
+    return {"text_sha256": text_digest(text), "text_len": len(text)}
+
+
+def claude_fields(body: bytes) -> Dict[str, object]:
+    """The model, replayable parameters and hashed message text of a /claude request body."""
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return {}
+    if not isinstance(payload, dict):
+        return {}
+    parts = []
+    for message in payload.get("messages") or []:
+        content = message.get("content") if isinstance(message, dict) else None
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(str(block.get("text", "")) for block in content if isinstance(block, dict))
+    params = {name: payload[name] for name in ("model", "max_tokens", "stream") if name in payload}
+    return {"model": payload.get("model"), "params": params, **text_fields("\n".join(parts))}
+
+
+def wav_seconds(body: bytes) -> Optional[float]:
+    """Duration of the first WAV in a (multipart) body, from its header alone."""
+    start = body.find(b"RIFF")
+    if start < 0:
+        return None
+    try:
+        with wave.open(io.BytesIO(body[start:])) as fh:
+            return round(fh.getnframes() / fh.getframerate(), 3)
+    except (wave.Error, EOFError, ZeroDivisionError):
+        return None
+
+
+class LineWriter:
+    """Bounded queue in front of a thread that writes lines to `sink` in batches.
+
+    Items are strings, dicts (serialised as JSON) or callables returning a dict (built on
+    the writer thread; None skips). `put` never blocks. The thread starts lazily and is
+    restarted after fork, like the encode pool.
+    """
+
+    def __init__(
+        self,
+        sink: Union[str, TextIO],
+        max_queue: int = REQUEST_LOG_QUEUE,
+        batch: int = LOG_BATCH,
+        flush_s: float = LOG_FLUSH_S,
+    ) -> None:
+        self.sink = sink
+        self.max_queue = max_queue
+        self.batch = batch
+        self.flush_s = flush_s
+        self._queue: "queue.Queue[Item]" = queue.Queue(max_queue)
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self.stats: Dict[str, int] = {"written": 0, "dropped": 0, "failed": 0, "batches": 0}
+
+    def _ensure_started(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:  # Forked: the parent's writer thread and queue are gone.
+                self._queue = queue.Queue(self.max_queue)
+                self._idle = threading.Condition(self._lock)
+                self._pending = 0
+            else:
+                atexit.register(self.drain, 1.0)  # Write what is queued on a clean exit.
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="log-writer", daemon=True).start()
+
+    def put(self, item: Item) -> bool:
+        """Queue `item`; False (and counted) if the queue is full."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+        with self._lock:
+            self._pending += 1
+        return True
+
+    def _open(self) -> TextIO:
+        if not isinstance(self.sink, str):
+            return self.sink
+        if self.sink == "-":
+            return sys.stdout
+        return open(self.sink, "a", encoding="utf-8")
+
+    def _render(self, item: Item) -> Optional[str]:
+        if callable(item):
+            item = item()
+            if item is None:
+                return None
+        if isinstance(item, str):
+            return item
+        return json.dumps(item, separators=(",", ":"), default=str)
+
+    def _run(self) -> None:
+        out = self._open()
+        while True:
+            items: List[Item] = [self._queue.get()]
+            deadline = monotonic() + self.flush_s
+            while len(items) < self.batch:
+                try:
+                    items.append(self._queue.get(timeout=max(0.0, deadline - monotonic())))
+                except queue.Empty:
+                    break
+            lines = []
+            for item in items:
+                try:
+                    line = self._render(item)
+                except Exception:
+                    self.stats["failed"] += 1
+                    continue
+                if line is not None:
+                    lines.append(line + "\n")
+            try:
+                out.write("".join(lines))
+                out.flush()
+                self.stats["written"] += len(lines)
+                self.stats["batches"] += 1
+            except (OSError, ValueError):
+                self.stats["failed"] += len(lines)
+            with self._lock:
+                self._pending -= len(items)
+                self._idle.notify_all()
+
+    def drain(self, timeout: float = 5.0) -> bool:
+        """Wait until everything queued so far is written (tests and shutdown)."""
+        deadline = monotonic() + timeout
+        with self._lock:
+            while self._pending:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def snapshot(self) -> Dict[str, object]:
+        return {**self.stats, "queued": self._queue.qsize()}
+
+
+class RequestLog:
+    """Sampling and rate limiting in front of a LineWriter of request records."""
+
+    def __init__(
+        self,
+        path: str = REQUEST_LOG_PATH,
+        sample_rate: float = REQUEST_LOG_SAMPLE_RATE,
+        max_per_s: float = REQUEST_LOG_MAX_PER_S,
+        max_queue: int = REQUEST_LOG_QUEUE,
+        writer: Optional[LineWriter] = None,
+    ) -> None:
+        self.enabled = bool(path) or writer is not None
+        self.sample_rate = sample_rate if self.enabled else 0.0
+        self.max_per_s = max_per_s
+        self.writer = writer or LineWriter(path or "-", max_queue)
+        self._tokens = max_per_s
+        self._refilled = monotonic()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"rate_limited": 0}
+
+    def sample(self) -> bool:
+        """Decided when a request arrives, so unsampled requests collect nothing."""
+        return self.sample_rate > 0 and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    def _take_token(self) -> bool:
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(self.max_per_s, self._tokens + (now - self._refilled) * self.max_per_s)
+            self._refilled = now
+            if self._tokens < 1:
+                self.stats["rate_limited"] += 1
+                return False
+            self._tokens -= 1
+            return True
+
+    def emit(self, record: Item) -> bool:
+        """Queue a record (or a builder for one) if the rate limit allows; never blocks."""
+        if not self.enabled or not self._take_token():
+            return False
+        return self.writer.put(record)
+
+    def snapshot(self) -> Dict[str, object]:
+        return {**self.stats, **self.writer.snapshot(), "sample_rate": self.sample_rate, "max_per_s": self.max_per_s}
+
+
+class _QueueHandler(logging.Handler):
+    def __init__(self, writer: LineWriter) -> None:
+        super().__init__()
+        self.writer = writer
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.writer.put(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+def queue_logging(level: int = logging.INFO, fmt: str = "%(asctime)s %(levelname)s %(message)s") -> LineWriter:
+    """Route the root logger through a LineWriter to stderr (what logging.basicConfig would write to)."""
+    writer = LineWriter(sys.stderr, max_queue=REQUEST_LOG_QUEUE)
+    handler = _QueueHandler(writer)
+    handler.setFormatter(logging.Formatter(fmt))
+    root = logging.getLogger()
+    if not any(isinstance(existing, _QueueHandler) for existing in root.handlers):
+        root.addHandler(handler)
+    root.setLevel(level)
+    return writer
@@ -1,8 +1,276 @@
-﻿from __future__ import annotations
+from __future__ import annotations
 
-from typing import Dict
+from dataclasses import dataclass, field
+import re
+from typing import Dict, Iterator, List, Sequence, Set, Tuple
 
+from generate_categories import ABBREVIATIONS
+from generate_pathways import NAME_EXPANSIONS
 
-def apply_rules(text: str) -> Dict[str, Dict[str, object]]:
-    """Rules intentionally disabled: semantic-only selection; JRCalc handled elsewhere."""
-    return {}
+
+DERIVED_BOOST = 0.1
+MAX_RULE_BOOST = 0.3
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric words; triggers and queries share this so matches respect word boundaries."""
+    return _NON_ALNUM_RE.sub(" ", text.lower()).split()
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    triggers: Tuple[str, ...]
+    # Exact ids or parent prefixes ("Blood Pressure" matches "Blood Pressure.systolicBP").
+    targets: Tuple[str, ...]
+    boost: float = DERIVED_BOOST
+    force: bool = False
+
+
+@dataclass
+class RuleHit:
+    boost: float = 0.0
+    forced: bool = False
+    why: List[str] = field(default_factory=list)
+
+
+# Safety-critical findings that must always surface their documentation fields.
+CURATED_RULES: Tuple[Rule, ...] = (
+    Rule(
+        name="cardiac arrest trigger",
+        triggers=("cardiac arrest", "arrested", "cpr", "rosc", "asystole", "pulseless", "vf arrest"),
+        targets=(
+            "Cardiopulmonary Resuscitation.CPRInProgress",
+            "Cardiopulmonary Resuscitation.CPRStart",
+            "Cardiopulmonary Resuscitation.returnSpontaneousCirculation",
+            "Defibrillation.defibrillationAttempted",
+        ),
+        boost=0.3,
+        force=True,
+    ),
+    Rule(
+        name="airway compromise trigger",
+        triggers=("airway obstructed", "obstructed airway", "gurgling", "snoring", "stridor", "choking"),
+        targets=("Airway Assessment.airwayStatus", "Airway Assessment.obstruction_severity"),
+        boost=0.3,
+        force=True,
+    ),
+    Rule(
+        name="active seizure trigger",
+        triggers=("seizing", "fitting", "status epilepticus", "tonic clonic"),
+        targets=("Convulsions.currentlySeizing", "Convulsions.duration"),
+        boost=0.25,
+        force=True,
+    ),
+    Rule(
+        name="stroke signs trigger",
+        triggers=("facial droop", "slurred speech", "arm weakness", "fast positive"),
+        targets=("FAST Assessment",),
+        boost=0.25,
+        force=True,
+    ),
+    Rule(
+        name="safeguarding trigger",
+        triggers=("safeguarding", "non accidental", "nai"),
+        targets=("Safeguarding.concerns_raised", "Safeguarding.concern_type"),
+        boost=0.2,
+        force=True,
+    ),
+    Rule(
+        name="hypoglycaemia trigger",
+        triggers=("hypo", "hypoglycaemic", "hypoglycemic", "low sugar", "bgl low", "bm low"),
+        targets=("Blood Glucose.bloodGlucose", "Blood Glucose.value"),
+        boost=0.2,
+    ),
+)
+
+
+# Words that qualify a pathway's condition without naming a different one ("Acute Asthma",
+# "Convulsions (Adult)"); any other extra word does ("Heat Stroke" is not "Stroke").
+_TITLE_QUALIFIERS = frozenset({"acute", "adult", "paediatric", "febrile", "exacerbation"})
+_PARENTHETICAL_RE = re.compile(r"\(.*?\)")
+
+
+def _norm(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+def _condition(text: str) -> str:
+    words = [word for word in tokenize(text) if word not in _TITLE_QUALIFIERS]
+    return " ".join(word[:-1] if word.endswith("s") else word for word in words)
+
+
+def _title_conditions(title: str) -> Set[str]:
+    """The conditions a pathway title names: one per "/"-separated part, qualifiers and plurals dropped."""
+    return {_condition(part) for part in _PARENTHETICAL_RE.sub(" ", title).split("/")} - {""}
+
+
+def default_rules(category_ids: Sequence[str], pathway_ids_titles: Sequence[Tuple[str, str]]) -> List[Rule]:
+    """Curated rules plus boost-only rules derived from the generators' jargon tables.
+
+    ABBREVIATIONS keys target categories whose parent name contains the key; NAME_EXPANSIONS
+    keys target pathways whose title names the key as one of its conditions.
+    """
+    rules = list(CURATED_RULES)
+    parents = sorted({cid.split(".", 1)[0] for cid in category_ids})
+    for key, abbreviations in ABBREVIATIONS.items():
+        targets = tuple(p for p in parents if key in _norm(p))
+        if targets:
+            rules.append(Rule(name=f"{key} abbreviation", triggers=(key, *abbreviations), targets=targets))
+    for key, expansions in NAME_EXPANSIONS.items():
+        targets = tuple(pid for pid, title in pathway_ids_titles if _condition(key) in _title_conditions(title))
+        if targets:
+            rules.append(Rule(name=f"{key} pathway phrasing", triggers=(key, *expansions), targets=targets))
+    return rules
+
+
+class _Automaton:
+    """Aho-Corasick over word tokens: one pass over the query finds every phrase occurrence."""
+
+    def __init__(self, phrases: Sequence[Tuple[str, ...]]) -> None:
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[int]] = [[]]
+        for pid, words in enumerate(phrases):
+            state = 0
+            for word in words:
+                nxt = self.goto[state].get(word)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][word] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                state = nxt
+            self.out[state].append(pid)
+
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for word, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(word, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def scan(self, words: Sequence[str]) -> Iterator[int]:
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for word in words:
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            yield from out[state]
+
+
+class RuleEngine:
+    """All rule triggers compiled into one automaton, with targets resolved to catalog ids."""
+
+    def __init__(self, rules: Sequence[Rule], ids: Sequence[str]) -> None:
+        self.rules = list(rules)
+        phrase_index: Dict[Tuple[str, ...], int] = {}
+        self._phrase_rules: List[List[int]] = []
+        for rule_idx, rule in enumerate(self.rules):
+            for trigger in rule.triggers:
+                words = tuple(tokenize(trigger))
+                if not words:
+                    continue
+                pid = phrase_index.setdefault(words, len(phrase_index))
+                if pid == len(self._phrase_rules):
+                    self._phrase_rules.append([])
+                self._phrase_rules[pid].append(rule_idx)
+        self._phrases = [" ".join(words) for words in phrase_index]
+        self._automaton = _Automaton(list(phrase_index))
+
+        by_parent: Dict[str, List[str]] = {}
+        for cid in ids:
+            by_parent.setdefault(cid.split(".", 1)[0], []).append(cid)
+        known = set(ids)
+        self._targets: List[List[str]] = []
+        for rule in self.rules:
+            resolved: List[str] = []
+            for target in rule.targets:
+                resolved.extend([target] if target in known else by_parent.get(target, []))
+            self._targets.append(resolved)
+
+    def apply(self, text: str) -> Dict[str, RuleHit]:
+        matched: Dict[int, List[str]] = {}
+        for pid in self._automaton.scan(tokenize(text)):
+            for rule_idx in self._phrase_rules[pid]:
+                phrases = matched.setdefault(rule_idx, [])
+                if self._phrases[pid] not in phrases:
+                    phrases.append(self._phrases[pid])
+
+        hits: Dict[str, RuleHit] = {}
+        for rule_idx, phrases in matched.items():
+            rule = self.rules[rule_idx]
+            for target in self._targets[rule_idx]:
+                hit = hits.setdefault(target, RuleHit())
+                hit.boost = min(MAX_RULE_BOOST, hit.boost + rule.boost)
+                hit.why.append(f"rule: {rule.name}")
+                hit.why.extend(f"matched: {phrase}" for phrase in phrases)
+                if rule.force:
+                    hit.forced = True
+                    hit.why.append(f"forced_by_rule:{rule.name}")
+        return hits
+
+
+def _benchmark(rule_count: int, queries: int = 2000) -> None:
+    import json
+    import random
+    from time import perf_counter
+
+    rng = random.Random(0)
+    vocab = [f"w{i}" for i in range(max(50, rule_count // 2))] + tokenize(" ".join(ABBREVIATIONS))
+    rules = [
+        Rule(
+            name=f"r{i}",
+            triggers=tuple(" ".join(rng.choices(vocab, k=rng.randint(1, 3))) for _ in range(3)),
+            targets=(f"C{i % 100}",),
+        )
+        for i in range(rule_count)
+    ]
+    ids = [f"C{i}" for i in range(100)]
+    start = perf_counter()
+    engine = RuleEngine(rules, ids)
+    compile_ms = (perf_counter() - start) * 1000
+    texts = [" ".join(rng.choices(vocab, k=40)) for _ in range(queries)]
+
+    start = perf_counter()
+    for text in texts:
+        engine.apply(text)
+    automaton_us = (perf_counter() - start) / queries * 1e6
+
+    # Baseline: one word-bounded regex search per trigger phrase.
+    patterns = [re.compile(rf"\b{re.escape(t)}\b") for rule in rules for t in rule.triggers]
+    sample = texts[: max(1, queries // 20)]
+    start = perf_counter()
+    for text in sample:
+        normalized = _norm(text)
+        [p.search(normalized) for p in patterns]
+    naive_us = (perf_counter() - start) / len(sample) * 1e6
+
+    print(
+        json.dumps(
+            {
+                "rules": rule_count,
+                "phrases": len(engine._phrases),
+                "states": len(engine._automaton.goto),
+                "compile_ms": round(compile_ms, 1),
+                "automaton_us_per_query": round(automaton_us, 1),
+                "per_phrase_regex_us_per_query": round(naive_us, 1),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the compiled rules engine.")
+    parser.add_argument("--bench", type=int, default=5000, metavar="RULES")
+    _benchmark(parser.parse_args().bench)
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, NamedTuple, Optional, Protocol, Sequence, Tuple
+
+from rules import RuleHit
+
+"""
+Candidate construction and category selection, shared by the API and the numpy-free
+reference scorer (reference_scorer.py), so both select from the same scores identically.
+"""
+
+LOW_CONF_THRESHOLD = 0.65
+
+
+class _Item(Protocol):
+    id: str
+    title: str
+
+
+class CatalogEntry(NamedTuple):
+    id: str
+    title: str
+
+
+def dedupe_preserve(items: List[str]) -> List[str]:
+    seen = set()
+    deduped: List[str] = []
+    for item in items:
+        if item not in seen:
+            deduped.append(item)
+            seen.add(item)
+    return deduped
+
+
+@dataclass
+class Candidate:
+    id: str
+    title: str
+    final_score: float
+    semantic_score: float
+    rule_boost: float
+    why: List[str]
+    forced: bool
+    pathway_boost: float = 0.0
+
+
+def select_categories(
+    candidates: List[Candidate],
+    delta: float,
+    min_score: Optional[float],
+    min_results: int,
+    max_results: int,
+) -> Tuple[List[Candidate], Dict[str, object]]:
+    s_max = max((c.semantic_score for c in candidates), default=0.0)
+    low_confidence_mode = s_max < LOW_CONF_THRESHOLD
+    floor_score = min_score if min_score is not None else LOW_CONF_THRESHOLD
+    relative_threshold = s_max - delta
+    threshold_score = max(relative_threshold, floor_score)
+
+    if min_score is not None and threshold_score == min_score:
+        strategy_used = "combined"
+    elif threshold_score == floor_score and floor_score > relative_threshold:
+        strategy_used = "floor"
+    else:
+        strategy_used = "relative"
+
+    # Forced (safety-critical) candidates go in first, so the max_results cap makes room for them.
+    forced_ids = [c.id for c in sorted(candidates, key=lambda c: c.final_score, reverse=True) if c.forced]
+    candidate_ids = {c.id for c in candidates if c.final_score >= threshold_score}
+    selected_ids: set[str] = candidate_ids | set(forced_ids)
+    forced_added_ids = [cid for cid in forced_ids if cid not in candidate_ids]
+    floor_added_ids: List[str] = []
+    topk_added_ids: List[str] = []
+
+    if len(selected_ids) < min_results:
+        for candidate in sorted(candidates, key=lambda c: c.final_score, reverse=True):
+            if candidate.id in selected_ids:
+                continue
+            selected_ids.add(candidate.id)
+            if candidate.final_score >= floor_score:
+                floor_added_ids.append(candidate.id)
+            else:
+                topk_added_ids.append(candidate.id)
+            if len(selected_ids) >= min_results:
+                break
+
+    if len(selected_ids) > max_results:
+        limited = sorted(
+            (c for c in candidates if c.id in selected_ids and not c.forced),
+            key=lambda c: c.final_score,
+            reverse=True,
+        )
+        selected_ids = set(forced_ids) | {c.id for c in limited[: max(0, max_results - len(forced_ids))]}
+        floor_added_ids = [cid for cid in floor_added_ids if cid in selected_ids]
+        topk_added_ids = [cid for cid in topk_added_ids if cid in selected_ids]
+
+    selected = [c for c in candidates if c.id in selected_ids]
+    selected.sort(key=lambda c: (c.forced, c.final_score), reverse=True)
+
+    return selected, {
+        "strategy_used": strategy_used,
+        "s_max": s_max,
+        "forced_ids": forced_ids,
+        "baseline_added_ids": [],
+        "max_exceeded_due_to_forced": len(selected) > max_results,
+        "low_confidence_mode": low_confidence_mode,
+        "low_conf_threshold": LOW_CONF_THRESHOLD,
+        "threshold_score": threshold_score,
+        "floor_score": floor_score,
+        "forced_added_ids": forced_added_ids,
+        "floor_added_ids": floor_added_ids,
+        "topk_added_ids": topk_added_ids,
+    }
+
+
+def build_candidates(
+    items: Sequence[_Item],
+    sem_scores: Sequence[float],
+    rule_hits: Optional[Dict[str, RuleHit]] = None,
+    explain: bool = True,
+) -> List[Candidate]:
+    """`explain=False` leaves `why` empty, skipping the per-category string formatting."""
+    candidates: List[Candidate] = []
+    rule_hits = rule_hits or {}
+
+    for idx, item in enumerate(items):
+        sem_score = float(sem_scores[idx])
+        hit = rule_hits.get(item.id)
+        why: List[str] = []
+        if explain:
+            why = (list(hit.why) if hit else []) + [f"semantic: {sem_score:.2f}"]
+        boost = hit.boost if hit else 0.0
+        candidates.append(
+            Candidate(
+                id=item.id,
+                title=item.title,
+                final_score=min(1.0, sem_score + boost),
+                semantic_score=sem_score,
+                rule_boost=boost,
+                why=dedupe_preserve(why),
+                forced=bool(hit and hit.forced),
+            )
+        )
+
+    return candidates
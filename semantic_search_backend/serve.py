@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import signal
+import socket
+import sys
+import time
+from typing import List
+
+from memory import INDEX_CACHE_DIR, process_memory
+
+"""
+Pre-forking launcher for multi-worker deployments (Unix only).
+
+`uvicorn main:app --workers N` spawns fresh interpreters, so every worker loads its own copy
+of the embedding model and catalog matrices. In preload mode this launcher imports `main`
+once in the parent, moves the matrices into read-only memory-mapped files, freezes the GC
+so refcount/GC bookkeeping does not dirty the shared pages, and then forks workers that
+share everything copy-on-write.
+
+    python serve.py --workers 4 --port 8000 --report
+"""
+
+
+def _run_worker(sock: socket.socket, workers: int, log_level: str) -> None:
+    import uvicorn
+
+    from admission import limit_torch_threads
+    from embedder import transformer_models
+    import main as service  # Already imported (and shared) in preload mode.
+
+    limit_torch_threads(workers * service.ENCODE_POOL.workers)
+    if service.IDLE.enabled:  # The parent dropped its copy (see _drop_parent_models); load ours before serving.
+        for model in transformer_models():
+            reload = model.reload()
+            if reload is not None:
+                reload.join()
+    # The request log already has a record per request; uvicorn's access log would write a second, synchronously.
+    server = uvicorn.Server(uvicorn.Config(service.app, log_level=log_level, access_log=not service.REQUEST_LOG.enabled))
+    server.run(sockets=[sock])
+
+
+def _drop_parent_models() -> None:
+    """With idle unloading (MODEL_IDLE_S), workers each load their own transformer.
+
+    A worker's unload only drops its reference: a model inherited from the parent stays
+    resident, and the worker's reload then adds a private copy. So the parent unloads
+    before forking; the catalog matrices are still shared through INDEX_CACHE_DIR.
+    """
+    from embedder import transformer_models
+
+    for model in transformer_models():
+        model.unload()
+
+
+def _spawn(sock: socket.socket, workers: int, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            _run_worker(sock, workers, log_level)
+        except BaseException:  # pragma: no cover - worker crash is reported by the parent
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def _report(label: str, pids: List[int]) -> None:
+    rows = {str(pid): process_memory(pid) for pid in pids}
+    totals = {key: round(sum(row.get(key, 0.0) for row in rows.values()), 1) for key in ("rss_mb", "pss_mb")}
+    print(json.dumps({"report": label, "parent": process_memory(), "workers": rows, "total": totals}, indent=2))
+    sys.stdout.flush()
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve main:app with pre-forked workers sharing one index.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--no-preload", dest="preload", action="store_false", help="Load the index in each worker.")
+    parser.add_argument("--report", action="store_true", help="Print per-worker RSS/PSS once workers are up.")
+    parser.add_argument("--report-delay", type=float, default=10.0)
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args()
+
+
+def main() -> None:
+    if not hasattr(os, "fork"):
+        raise SystemExit("serve.py needs os.fork(); use `uvicorn main:app --workers N` on this platform.")
+    args = _parse_args()
+    # Each worker process gets its own encode pool; split the cores between them.
+    os.environ.setdefault("ENCODE_WORKERS", str(max(1, (os.cpu_count() or 1) // args.workers)))
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    if args.preload:
+        import main as service
+
+        service.share_index(INDEX_CACHE_DIR)
+        if service.IDLE.enabled:
+            _drop_parent_models()
+        gc.collect()
+        gc.freeze()  # Keep the GC from touching (and so un-sharing) pre-fork objects.
+
+    workers = {_spawn(sock, args.workers, args.log_level) for _ in range(args.workers)}
+    stopping = False
+
+    def stop(signum: int, _frame: object) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    if args.report:
+        time.sleep(args.report_delay)
+        _report("preload" if args.preload else "no-preload", sorted(workers))
+
+    while workers:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        if not stopping:
+            time.sleep(1.0)  # Avoid a hot respawn loop if workers crash on start-up.
+            workers.add(_spawn(sock, args.workers, args.log_level))
+
+
+if __name__ == "__main__":
+    main()
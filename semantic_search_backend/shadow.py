@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+import heapq
+import logging
+import os
+import random
+import threading
+from typing import Callable, Deque, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from admission import EncodeExecutor, Overloaded
+from embedder import FALLBACK_TIER, backend_settings
+
+"""
+Shadow evaluation of a candidate embedder on live traffic.
+
+A sampled fraction of /suggest and /pathways/suggest requests is scored a second time by
+another backend (SHADOW_EMBEDDER, a sweep_embedders.py spec such as `st:all-mpnet-base-v2`)
+once the response has gone out. Both results are compared: agreement on the selected ids,
+top-1, overlap and rank-biased overlap of the top SHADOW_TOP_K, plus both latencies.
+
+Shadow work runs on its own small pool at a lower OS scheduling priority, behind a bounded
+queue: when the queue is full the sample is dropped (counted as shed), never waited for.
+Each job also waits (up to SHADOW_MAX_DEFER_S) for the primary encode pool to go idle, so
+that on a busy worker it doesn't compete with live requests for the GIL.
+"""
+
+SHADOW_EMBEDDER = os.getenv("SHADOW_EMBEDDER", "").strip()
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0.05"))
+SHADOW_MAX_QUEUE = int(os.getenv("SHADOW_MAX_QUEUE", "32"))
+SHADOW_WORKERS = int(os.getenv("SHADOW_WORKERS", "1"))
+# Added to the shadow threads' nice value (Linux schedules threads individually).
+SHADOW_NICE = int(os.getenv("SHADOW_NICE", "10"))
+# A shadow job waits up to this long for the primary encode pool to go idle before running anyway.
+SHADOW_MAX_DEFER_S = float(os.getenv("SHADOW_MAX_DEFER_S", "1.0"))
+SHADOW_TOP_K = 10
+# Rank-biased overlap persistence: weight of rank d is RBO_P ** (d - 1).
+RBO_P = 0.9
+LATENCY_WINDOW = 1024
+
+logger = logging.getLogger("semantic_search")
+
+
+@dataclass
+class Observation:
+    """One scoring of a request: every candidate (anything with .id and .final_score) and the selection."""
+
+    scored: Sequence[object]
+    selected: Sequence[object]
+    latency_ms: float
+    model: Optional[str] = None
+    cpu_ms: Optional[float] = None  # Thread CPU time: the shadow's own cost, whatever its scheduling delay.
+    tier: Optional[str] = None  # meta.tier of the scoring.
+
+    def ranking(self, k: int = SHADOW_TOP_K) -> List[str]:
+        return [c.id for c in heapq.nlargest(k, self.scored, key=lambda c: c.final_score)]
+
+    @property
+    def selected_ids(self) -> List[str]:
+        return [c.id for c in self.selected]
+
+
+def jaccard(a: Sequence[str], b: Sequence[str]) -> float:
+    union = set(a) | set(b)
+    return len(set(a) & set(b)) / len(union) if union else 1.0
+
+
+def overlap_at_k(a: Sequence[str], b: Sequence[str], k: int = SHADOW_TOP_K) -> float:
+    k = min(k, max(len(a), len(b)))  # Catalogs with fewer than k pathways.
+    return len(set(a[:k]) & set(b[:k])) / k if k else 1.0
+
+
+def rank_biased_overlap(a: Sequence[str], b: Sequence[str], p: float = RBO_P, depth: int = SHADOW_TOP_K) -> float:
+    """Top-weighted agreement of two rankings in [0, 1], normalised so identical prefixes score 1."""
+    depth = min(depth, max(len(a), len(b)))
+    if depth == 0:
+        return 1.0
+    seen_a, seen_b, common, total = set(), set(), 0, 0.0
+    for d in range(depth):
+        if d < len(a):
+            common += a[d] in seen_b
+            seen_a.add(a[d])
+        if d < len(b):
+            common += b[d] in seen_a
+            seen_b.add(b[d])
+        total += p**d * common / (d + 1)
+    return total * (1 - p) / (1 - p**depth)
+
+
+def _percentiles(values: Sequence[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0}
+    p50, p95 = np.percentile(np.asarray(values), [50, 95])
+    return {"p50": round(float(p50), 2), "p95": round(float(p95), 2)}
+
+
+class _RouteStats:
+    METRICS = ("selected_jaccard", "top1_agreement", "overlap_at_k", "rbo_at_k")
+
+    def __init__(self) -> None:
+        self.counts = {"sampled": 0, "shed": 0, "failed": 0, "compared": 0, "deferred": 0}
+        self.sums = dict.fromkeys(self.METRICS, 0.0)
+        self.primary_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.shadow_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.shadow_cpu_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def snapshot(self) -> Dict[str, object]:
+        compared = self.counts["compared"]
+        return {
+            **self.counts,
+            **{name: round(total / compared, 4) if compared else None for name, total in self.sums.items()},
+            "primary_latency_ms": _percentiles(self.primary_ms),
+            "shadow_latency_ms": _percentiles(self.shadow_ms),
+            "shadow_cpu_ms": _percentiles(self.shadow_cpu_ms),
+        }
+
+
+class ShadowEvaluator:
+    """Samples requests, re-scores them off the request path and accumulates agreement metrics.
+
+    Disabled (sample() is always False) when `backend` is empty. `submit` only enqueues, so
+    calling it from a response's background task adds nothing to the response.
+    """
+
+    def __init__(
+        self,
+        backend: str = SHADOW_EMBEDDER,
+        sample_rate: float = SHADOW_SAMPLE_RATE,
+        max_queue: int = SHADOW_MAX_QUEUE,
+        workers: int = SHADOW_WORKERS,
+        nice: int = SHADOW_NICE,
+        yield_to: Optional[EncodeExecutor] = None,
+        max_defer_s: float = SHADOW_MAX_DEFER_S,
+    ) -> None:
+        if backend:
+            backend_settings(backend)  # Fail on a typo at start-up, not on the first sample.
+        self.backend = backend
+        self.sample_rate = sample_rate if backend else 0.0
+        self.nice = nice
+        self.yield_to = yield_to
+        self.max_defer_s = max_defer_s
+        # Only a full queue sheds: shadow work has no deadline to predict against.
+        self.pool = EncodeExecutor(workers=workers, max_queue=max_queue, max_wait_s=float("inf"))
+        self.model: Optional[str] = None
+        self._lock = threading.Lock()
+        self._routes: Dict[str, _RouteStats] = {}
+        self._niced = threading.local()
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _stats(self, route: str) -> _RouteStats:
+        stats = self._routes.get(route)
+        if stats is None:
+            stats = self._routes[route] = _RouteStats()
+        return stats
+
+    def submit(self, route: str, primary: Observation, shadow: Callable[[], Observation]) -> Optional["Future[None]"]:
+        """Queue `shadow()` for comparison with `primary`; None if the queue is full."""
+        with self._lock:
+            self._stats(route).counts["sampled"] += 1
+        try:
+            return self.pool.submit(lambda: self._compare(route, primary, shadow))
+        except Overloaded:
+            with self._lock:
+                self._stats(route).counts["shed"] += 1
+            return None
+
+    def _lower_priority(self) -> None:
+        if getattr(self._niced, "done", False):
+            return
+        self._niced.done = True
+        try:
+            tid = threading.get_native_id()
+            os.setpriority(os.PRIO_PROCESS, tid, os.getpriority(os.PRIO_PROCESS, tid) + self.nice)
+        except (AttributeError, OSError):
+            pass  # Not Linux, or not permitted: run at normal priority.
+
+    def _wait_for_idle(self) -> bool:
+        """Whether the job had to wait for live requests to finish."""
+        if self.yield_to is None or self.yield_to.idle:
+            return False
+        self.yield_to.wait_idle(self.max_defer_s)
+        return True
+
+    def _compare(self, route: str, primary: Observation, shadow: Callable[[], Observation]) -> None:
+        self._lower_priority()
+        if self._wait_for_idle():
+            with self._lock:
+                self._stats(route).counts["deferred"] += 1
+        try:
+            result = shadow()
+        except Exception:
+            logger.exception("shadow scoring failed route=%s backend=%s", route, self.backend)
+            with self._lock:
+                self._stats(route).counts["failed"] += 1
+            return
+        if result.tier == FALLBACK_TIER:
+            # The shadow's model was unloaded while idle: these are TF-IDF answers, not the backend's.
+            with self._lock:
+                self._stats(route).counts["failed"] += 1
+            return
+        ours, theirs = primary.ranking(), result.ranking()
+        values = {
+            "selected_jaccard": jaccard(primary.selected_ids, result.selected_ids),
+            "top1_agreement": float(ours[:1] == theirs[:1]),
+            "overlap_at_k": overlap_at_k(ours, theirs),
+            "rbo_at_k": rank_biased_overlap(ours, theirs),
+        }
+        with self._lock:
+            self.model = result.model or self.model
+            stats = self._stats(route)
+            stats.counts["compared"] += 1
+            for name, value in values.items():
+                stats.sums[name] += value
+            stats.primary_ms.append(primary.latency_ms)
+            stats.shadow_ms.append(result.latency_ms)
+            if result.cpu_ms is not None:
+                stats.shadow_cpu_ms.append(result.cpu_ms)
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            routes = {route: stats.snapshot() for route, stats in self._routes.items()}
+        pool = self.pool.snapshot()
+        return {
+            "backend": self.backend,
+            "model": self.model,
+            "sample_rate": self.sample_rate,
+            "top_k": SHADOW_TOP_K,
+            "queue_depth": sum(pool["queue_depth"].values()),
+            "busy": pool["busy"],
+            "routes": routes,
+        }
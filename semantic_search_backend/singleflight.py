@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Dict, Tuple, TypeVar
+
+
+T = TypeVar("T")
+
+
+def request_key(*parts: bytes | str) -> str:
+    """Hash request parts (route, credentials, body) into a coalescing key."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode("utf-8") if isinstance(part, str) else part
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    """Coalesce identical in-flight async calls onto one leader.
+
+    The first caller for a key runs the upstream call; callers arriving while it is
+    in flight wait (each with its own timeout) and receive the same result. If the
+    leader is cancelled, a waiting follower takes over as the new leader.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats: Dict[str, int] = {
+            "upstream_calls": 0,
+            "coalesced": 0,
+            "follower_timeouts": 0,
+        }
+
+    def snapshot(self) -> Dict[str, int]:
+        return {**self.stats, "in_flight": len(self._inflight)}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]], timeout: float) -> Tuple[T, bool]:
+        """Return ``(result, shared)``; raises ``asyncio.TimeoutError`` for a follower timeout."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            fut = self._inflight.get(key)
+            if fut is None:
+                return await self._lead(key, fn), False
+            try:
+                result = await asyncio.wait_for(asyncio.shield(fut), max(deadline - loop.time(), 0.0))
+            except asyncio.TimeoutError:
+                self.stats["follower_timeouts"] += 1
+                raise
+            except asyncio.CancelledError:
+                if not fut.cancelled():
+                    raise
+                continue  # Leader went away before finishing; retry, possibly as leader.
+            self.stats["coalesced"] += 1
+            return result, True
+
+    async def _lead(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        self.stats["upstream_calls"] += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as exc:
+            fut.set_exception(exc)
+            fut.exception()  # Mark retrieved so unobserved failures are not logged twice.
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+
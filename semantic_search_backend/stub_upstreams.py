@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+import wave
+
+"""
+Local stand-ins for the paid upstreams, for load testing without real API calls.
+
+Serves POST /v1/messages (Anthropic-shaped, including SSE when the body has
+"stream": true) and POST /v1/speech-to-text (ElevenLabs-shaped), with log-normal
+latency, a configurable error mix and optional streaming chunk delays. With
+--stt-realtime, transcription also takes that many seconds per second of uploaded
+WAV audio, like a real transcriber, and the reply has one word spanning the clip. Point the
+services at it with CLAUDE_URL / ELEVENLABS_URL:
+
+    python stub_upstreams.py --port 9100 --latency-ms 800 --error-rate 0.02
+    CLAUDE_URL=http://127.0.0.1:9100/v1/messages uvicorn main:app
+"""
+
+
+class StubProfile:
+    def __init__(
+        self,
+        latency_ms: float = 600.0,
+        sigma: float = 0.5,
+        error_rate: float = 0.0,
+        error_statuses: Tuple[int, ...] = (429, 500, 529),
+        stream_chunks: int = 20,
+        seed: int | None = None,
+        stt_realtime: float = 0.0,
+    ) -> None:
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.stream_chunks = stream_chunks
+        self.stt_realtime = stt_realtime
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"requests": 0, "errors": 0, "streams": 0}
+
+    def sample(self) -> Tuple[float, int | None]:
+        """(delay seconds, error status or None) for one request."""
+        with self._lock:
+            self.stats["requests"] += 1
+            delay = self.latency_ms / 1000 * self._rng.lognormvariate(0.0, self.sigma)
+            if self._rng.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return delay, self._rng.choice(self.error_statuses)
+        return delay, None
+
+
+def _handler(profile: StubProfile) -> type:
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            if self.path == "/stats":
+                self._json(200, profile.stats)
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            delay, error = profile.sample()
+            if self.path == "/v1/messages":
+                request = json.loads(body or b"{}")
+                if error is None and request.get("stream"):
+                    self._stream(delay)
+                    return
+                time.sleep(delay)
+                if error is not None:
+                    self._json(error, {"type": "error", "error": {"type": "stub_error", "message": "injected"}})
+                else:
+                    self._json(200, _message("Stub reply."))
+            elif self.path == "/v1/speech-to-text":
+                seconds = _wav_seconds(body)
+                time.sleep(delay + (seconds or 0.0) * profile.stt_realtime)
+                if error is not None:
+                    self._json(error, {"detail": {"status": "stub_error", "message": "injected"}})
+                else:
+                    reply: Dict[str, object] = {"language_code": "en", "text": f"stub transcript of {len(body)} bytes"}
+                    if seconds is not None:
+                        reply["words"] = [{"text": "stub", "type": "word", "start": 0.0, "end": round(seconds, 3)}]
+                    self._json(200, reply)
+            else:
+                self._json(404, {"error": "not found"})
+
+        def _stream(self, delay: float) -> None:
+            with profile._lock:
+                profile.stats["streams"] += 1
+            chunks = max(1, profile.stream_chunks)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            # Time-to-first-token is half the sampled latency; the rest is spread over the deltas.
+            time.sleep(delay / 2)
+            events = [("message_start", {"type": "message_start", "message": _message("")})]
+            events += [
+                ("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": f"tok{i} "}})
+                for i in range(chunks)
+            ]
+            events.append(("message_stop", {"type": "message_stop"}))
+            for idx, (name, data) in enumerate(events):
+                if 0 < idx <= chunks:
+                    time.sleep(delay / 2 / chunks)
+                payload = f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(payload), payload))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _json(self, status: int, payload: object) -> None:
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    return StubHandler
+
+
+def _message(text: str) -> Dict[str, object]:
+    return {
+        "id": "msg_stub",
+        "type": "message",
+        "role": "assistant",
+        "model": "stub",
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "usage": {"input_tokens": 1, "output_tokens": 1},
+    }
+
+
+def _wav_seconds(body: bytes) -> Optional[float]:
+    """Duration of the first WAV file in a (multipart) body, if there is one."""
+    start = body.find(b"RIFF")
+    if start < 0:
+        return None
+    try:
+        with wave.open(io.BytesIO(body[start:])) as fh:
+            return fh.getnframes() / fh.getframerate()
+    except (wave.Error, EOFError):
+        return None
+
+
+def start_stub(port: int = 0, profile: StubProfile | None = None) -> ThreadingHTTPServer:
+    """Serve in a daemon thread; the bound port is `server.server_address[1]`."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(profile or StubProfile()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve stand-ins for the Anthropic and ElevenLabs APIs.")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=600.0, help="Median upstream latency.")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Log-normal spread of the latency.")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stream-chunks", type=int, default=20)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--stt-realtime", type=float, default=0.0, help="Transcription seconds per audio second.")
+    args = parser.parse_args()
+
+    profile = StubProfile(
+        args.latency_ms,
+        args.sigma,
+        args.error_rate,
+        stream_chunks=args.stream_chunks,
+        seed=args.seed,
+        stt_realtime=args.stt_realtime,
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), _handler(profile))
+    print(f"Stub upstreams on http://127.0.0.1:{args.port} (/v1/messages, /v1/speech-to-text, GET /stats)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
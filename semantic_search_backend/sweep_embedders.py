@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from pathlib import Path
+import subprocess
+import sys
+from time import perf_counter
+from typing import Dict, List, Optional
+
+from embedder import backend_settings
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported.
+    resource = None  # type: ignore[assignment]
+
+"""
+Accuracy-versus-latency sweep over embedder configurations.
+
+Each backend runs in its own subprocess (so memory is measured per backend) over a
+labelled JSONL of {"text", "categories": [id or parent prefixes], "pathway": id | null}
+and reports recall@k, selection precision through select_categories/select_pathway,
+p50/p95 latency and memory. Rows marked * are Pareto-optimal on (p95 latency, recall@k).
+A backend's subprocess reports its result, or {"error": ...}, as the last line of stdout.
+
+    python sweep_embedders.py --backends tfidf static st:all-MiniLM-L6-v2 cascade:all-MiniLM-L6-v2
+
+Backends: tfidf | hashing | static[:table.npz] | st:<model> | cascade:<model>
+"""
+
+BASE_DIR = Path(__file__).resolve().parent
+# Embedder.name prefix each backend kind must load as (create_embedder falls back silently).
+EXPECTED_NAMES = {"tfidf": "tfidf", "hashing": "hashing", "static": "static:", "st": "sentence-transformers:", "cascade": "cascade:"}
+
+
+def _backend_env(spec: str) -> Dict[str, str]:
+    """The environment that makes main load `spec` (ValueError for an unknown spec)."""
+    mode, model_name, static_path = backend_settings(spec)
+    return {"EMBEDDER_MODE": mode, "EMBEDDER_MODEL": model_name, "STATIC_EMBEDDER_PATH": str(static_path)}
+
+
+def _matches(cid: str, prefixes: List[str]) -> bool:
+    return any(cid == p or cid.startswith(p + ".") for p in prefixes)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    import numpy as np
+
+    return round(float(np.percentile(values, q)), 3) if values else 0.0
+
+
+def _evaluate(spec: str, labelled: Path, k: int) -> Dict[str, object]:
+    """Runs inside the backend's subprocess (main is imported with the backend's env)."""
+    from memory import process_memory
+
+    start = perf_counter()
+    import main
+
+    load_s = perf_counter() - start
+    if not main.EMBEDDER.name.startswith(EXPECTED_NAMES[spec.partition(":")[0]]):
+        raise RuntimeError(f"{spec} unavailable here (loaded {main.EMBEDDER.name})")
+    rows = [json.loads(line) for line in labelled.read_text(encoding="utf-8").splitlines() if line.strip()]
+    # Warm-up so one-off lazy initialisation isn't counted as query latency.
+    main._score_candidates(rows[0]["text"])
+
+    recall: List[float] = []
+    precision: List[float] = []
+    pathway_hits: List[bool] = []
+    pathway_precision: List[bool] = []
+    category_ms: List[float] = []
+    pathway_ms: List[float] = []
+    for row in rows:
+        main._category_scores.cache_clear()
+        expected = list(row.get("categories") or [])
+        start = perf_counter()
+        scored = main._score_candidates(row["text"])
+        selected, _ = main.select_categories(scored, 0.12, None, 3, 8)
+        category_ms.append((perf_counter() - start) * 1000)
+        if expected:
+            top_k = [c.id for c in sorted(scored, key=lambda c: c.final_score, reverse=True)[:k]]
+            recall.append(sum(any(_matches(cid, [p]) for cid in top_k) for p in expected) / len(expected))
+            precision.append(sum(_matches(c.id, expected) for c in selected) / max(1, len(selected)))
+
+        start = perf_counter()
+        pathway, _ = main.select_pathway(main._score_pathways(row["text"]), None)
+        pathway_ms.append((perf_counter() - start) * 1000)
+        if row.get("pathway"):
+            pathway_hits.append(pathway is not None and pathway.id == row["pathway"])
+        if pathway is not None and "pathway" in row:
+            pathway_precision.append(pathway.id == row["pathway"])
+
+    def mean(values: List[float]) -> Optional[float]:
+        return round(sum(values) / len(values), 3) if values else None
+
+    return {
+        "model": main.EMBEDDER.name,
+        "queries": len(rows),
+        f"recall@{k}": mean(recall),
+        "selection_precision": mean(precision),
+        "pathway_recall": mean([float(h) for h in pathway_hits]),
+        "pathway_precision": mean([float(h) for h in pathway_precision]),
+        "p50_ms": _percentile(category_ms, 50),
+        "p95_ms": _percentile(category_ms, 95),
+        "pathway_p95_ms": _percentile(pathway_ms, 95),
+        "load_s": round(load_s, 2),
+        "rss_mb": process_memory().get("rss_mb"),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource else None,
+    }
+
+
+def _run_backend(spec: str, labelled: Path, k: int) -> Dict[str, object]:
+    env = {**os.environ, **_backend_env(spec)}
+    proc = subprocess.run(
+        [sys.executable, __file__, "--child", spec, "--labelled", str(labelled), "--k", str(k)],
+        cwd=BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    try:
+        result = json.loads((proc.stdout.strip().splitlines() or ["{}"])[-1])
+    except ValueError:
+        result = {}
+    if proc.returncode != 0 or "error" in result:
+        return {"backend": spec, "error": result.get("error") or f"exited with status {proc.returncode}"}
+    return {"backend": spec, **result}
+
+
+def _pareto(results: List[Dict[str, object]], recall_key: str) -> None:
+    scored = [r for r in results if "error" not in r and r.get(recall_key) is not None]
+    for r in scored:
+        r["pareto"] = not any(
+            o is not r
+            and o["p95_ms"] <= r["p95_ms"]
+            and o[recall_key] >= r[recall_key]
+            and (o["p95_ms"] < r["p95_ms"] or o[recall_key] > r[recall_key])
+            for o in scored
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare embedder backends on accuracy, latency and memory.")
+    parser.add_argument("--backends", nargs="+", default=["tfidf", "static", "st:all-MiniLM-L6-v2"])
+    parser.add_argument("--labelled", type=Path, default=BASE_DIR / "labelled_queries.jsonl")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Print raw results as JSON.")
+    parser.add_argument("--child", metavar="BACKEND", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        try:
+            result = _evaluate(args.child, args.labelled.resolve(), args.k)
+        except Exception as exc:
+            print(json.dumps({"error": f"{type(exc).__name__}: {exc}"}))
+            raise SystemExit(1)
+        print(json.dumps(result))
+        return
+
+    for spec in args.backends:
+        try:
+            _backend_env(spec)  # Fail on a typo before spending minutes on the other backends.
+        except ValueError as exc:
+            raise SystemExit(str(exc))
+    recall_key = f"recall@{args.k}"
+    results = [_run_backend(spec, args.labelled.resolve(), args.k) for spec in args.backends]
+    _pareto(results, recall_key)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    columns = [
+        ("backend", 26), (recall_key, 9), ("selection_precision", 9), ("pathway_recall", 8),
+        ("pathway_precision", 8), ("p50_ms", 8), ("p95_ms", 8), ("rss_mb", 8), ("peak_rss_mb", 9),
+    ]
+    headers = ["backend", recall_key, "sel_prec", "pw_rec", "pw_prec", "p50_ms", "p95_ms", "rss_mb", "peak_mb"]
+    print("  " + " ".join(h.rjust(w) if i else h.ljust(w) for i, (h, (_, w)) in enumerate(zip(headers, columns))))
+    for r in results:
+        if "error" in r:
+            print(f"  {r['backend']:<26} error: {r['error']}")
+            continue
+        cells = ["-" if r.get(key) is None else str(r[key]) for key, _ in columns]
+        line = " ".join(c.rjust(w) if i else c.ljust(w) for i, (c, (_, w)) in enumerate(zip(cells, columns)))
+        print(("* " if r.get("pareto") else "  ") + line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import threading
+from time import monotonic, sleep
+import unittest
+from unittest import mock
+
+from admission import DeadlineExceeded, EncodeExecutor, Overloaded
+
+
+class EncodeExecutorTest(unittest.TestCase):
+    def _blocked_pool(self, **kwargs: object) -> tuple[EncodeExecutor, threading.Event]:
+        """One worker held busy until the returned event is set."""
+        pool = EncodeExecutor(workers=1, **kwargs)
+        release = threading.Event()
+        started = threading.Event()
+
+        def block() -> None:
+            started.set()
+            release.wait(5)
+
+        pool.submit(block)
+        self.assertTrue(started.wait(5))
+        return pool, release
+
+    def test_interactive_work_jumps_queued_batch_work(self) -> None:
+        pool, release = self._blocked_pool(max_queue=16, max_wait_s=60)
+        order: list[str] = []
+        futures = [
+            pool.submit(lambda: order.append("offline"), "offline"),
+            pool.submit(lambda: order.append("batch"), "batch"),
+            pool.submit(lambda: order.append("interactive"), "interactive"),
+        ]
+        release.set()
+        for future in futures:
+            future.result(5)
+        self.assertEqual(order, ["interactive", "batch", "offline"])
+
+    def test_sheds_when_class_share_of_queue_is_full(self) -> None:
+        pool, release = self._blocked_pool(max_queue=4, max_wait_s=60)
+        try:
+            pool.submit(lambda: None, "offline")  # offline may use a quarter of the queue
+            with self.assertRaises(Overloaded) as ctx:
+                pool.submit(lambda: None, "offline")
+            self.assertEqual(ctx.exception.reason, "queue_full")
+            self.assertGreaterEqual(ctx.exception.retry_after_s, 1)
+            pool.submit(lambda: None, "interactive")  # interactive still has room
+        finally:
+            release.set()
+        self.assertEqual(pool.snapshot()["shed"], {"interactive": 0, "batch": 0, "offline": 1})
+
+    def test_sheds_on_predicted_wait(self) -> None:
+        pool, release = self._blocked_pool(max_queue=64, max_wait_s=0.5)
+        pool._service_s = 1.0
+        try:
+            with self.assertRaises(Overloaded) as ctx:
+                pool.submit(lambda: None)
+            self.assertEqual(ctx.exception.reason, "predicted_wait")
+        finally:
+            release.set()
+
+    def test_untimed_work_stays_out_of_the_service_time(self) -> None:
+        pool = EncodeExecutor(workers=1)
+        stall = threading.Event()
+
+        def load_then_score() -> None:
+            with pool.untimed():
+                stall.wait(0.3)  # A first-use catalog load.
+
+        for _ in range(3):
+            pool.submit(load_then_score).result(5)
+        self.assertLess(pool.snapshot()["mean_service_ms"], 50)
+
+    def test_cancelled_queued_work_never_runs(self) -> None:
+        pool, release = self._blocked_pool(max_queue=16, max_wait_s=60)
+        ran = threading.Event()
+        future = pool.submit(ran.set)
+        self.assertTrue(future.cancel())
+        release.set()
+        pool.submit(lambda: None).result(5)
+        self.assertFalse(ran.is_set())
+        self.assertEqual(pool.snapshot()["cancelled"], 1)
+
+    def test_work_that_cannot_meet_its_deadline_is_refused(self) -> None:
+        pool, release = self._blocked_pool(max_queue=16, max_wait_s=60)
+        pool._service_s = 1.0
+        try:
+            with self.assertRaises(DeadlineExceeded):
+                pool.submit(lambda: None, deadline=monotonic() + 0.1)
+        finally:
+            release.set()
+        self.assertEqual(pool.snapshot()["expired"], 1)
+
+    def test_work_expiring_in_the_queue_is_dropped_unrun(self) -> None:
+        pool, release = self._blocked_pool(max_queue=16, max_wait_s=60)
+        pool._service_s = 0.0
+        ran = threading.Event()
+        future = pool.submit(ran.set, deadline=monotonic() + 0.05)
+        threading.Timer(0.1, release.set).start()
+        with self.assertRaises(DeadlineExceeded):
+            future.result(5)
+        self.assertFalse(ran.is_set())
+        self.assertEqual(pool.snapshot()["expired"], 1)
+
+    def test_idle_event_follows_queued_and_running_work(self) -> None:
+        pool = EncodeExecutor(workers=1)
+        self.assertTrue(pool.idle)
+        pool, release = self._blocked_pool(max_queue=16, max_wait_s=60)
+        queued = pool.submit(lambda: None)
+        self.assertFalse(pool.idle)
+        self.assertFalse(pool.wait_idle(0.05))
+        threading.Timer(0.05, release.set).start()
+        self.assertTrue(pool.wait_idle(5))
+        self.assertTrue(queued.done())
+        self.assertTrue(pool.idle)
+
+    def test_concurrent_first_submits_start_one_set_of_workers(self) -> None:
+        pool = EncodeExecutor(workers=3, max_queue=64, max_wait_s=60)
+        gate = threading.Barrier(16)
+        futures = []
+
+        def first_submit() -> None:
+            gate.wait(5)
+            futures.append(pool.submit(lambda: None))
+
+        real_condition = threading.Condition
+
+        def slow_condition(*args: object) -> threading.Condition:
+            sleep(0.02)  # Widen the window between the pid check and the start.
+            return real_condition(*args)
+
+        submitters = [threading.Thread(target=first_submit) for _ in range(16)]
+        with mock.patch("admission.threading.Thread", wraps=threading.Thread) as thread, mock.patch(
+            "admission.threading.Condition", side_effect=slow_condition
+        ):
+            for submitter in submitters:
+                submitter.start()
+            for submitter in submitters:
+                submitter.join(5)
+        for future in futures:
+            future.result(5)
+        self.assertEqual(len(futures), 16)
+        self.assertEqual(thread.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
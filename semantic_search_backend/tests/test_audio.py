@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import io
+import json
+from pathlib import Path
+import sys
+import unittest
+from unittest import mock
+import wave
+
+try:
+    import numpy as np
+except ModuleNotFoundError as exc:  # pragma: no cover - dependency gate
+    raise unittest.SkipTest(f"Audio tests require numpy. Missing: {exc}")
+
+import audio
+from stub_upstreams import StubProfile, start_stub
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+import proxy_server  # noqa: E402
+
+
+def _wav(samples: np.ndarray, rate: int) -> bytes:
+    out = io.BytesIO()
+    with wave.open(out, "wb") as fh:
+        fh.setnchannels(samples.shape[1])
+        fh.setsampwidth(2)
+        fh.setframerate(rate)
+        fh.writeframes((samples * 32767).astype("<i2").tobytes())
+    return out.getvalue()
+
+
+def _tones(rate: int, seconds: float, freqs: list[int]) -> np.ndarray:
+    t = np.arange(int(rate * seconds)) / rate
+    return sum(0.3 * np.sin(2 * np.pi * f * t) for f in freqs)
+
+
+def _amplitude(mono: np.ndarray, rate: int, freq: float) -> float:
+    spectrum = np.abs(np.fft.rfft(mono)) * 2 / len(mono)
+    return float(spectrum[int(round(freq * len(mono) / rate))])
+
+
+class NormalizeWavTest(unittest.TestCase):
+    def test_stereo_48k_becomes_16k_mono_without_aliasing(self) -> None:
+        left = _tones(48000, 2.0, [1000, 12000])  # 12 kHz is above the 8 kHz output Nyquist.
+        source = _wav(np.stack([left, left], axis=1), 48000)
+
+        out, seconds = audio.normalize_wav(source)
+        pcm = audio.decode_wav(out)
+
+        self.assertEqual((pcm.rate, pcm.samples.shape[1]), (16000, 1))
+        self.assertAlmostEqual(seconds, 2.0)
+        self.assertAlmostEqual(pcm.seconds, 2.0)
+        self.assertLess(len(out), len(source) / 5.9)
+        mono = pcm.samples[:, 0]
+        self.assertAlmostEqual(_amplitude(mono, 16000, 1000), 0.3, delta=0.005)
+        self.assertLess(_amplitude(mono, 16000, 4000), 1e-3)  # Where 12 kHz would fold to.
+
+    def test_never_upsamples(self) -> None:
+        out, _ = audio.normalize_wav(_wav(_tones(8000, 0.5, [440])[:, None], 8000))
+        self.assertEqual(audio.decode_wav(out).rate, 8000)
+
+    def test_rejects_non_wav(self) -> None:
+        with self.assertRaises(ValueError):
+            audio.normalize_wav(b"OggS" + bytes(64))
+
+
+def _speech(rate: int, pattern: list[tuple[float, bool]]) -> np.ndarray:
+    """Alternating voiced (modulated tone) and near-silent segments of the given lengths."""
+    rng = np.random.default_rng(0)
+    parts = []
+    for seconds, voiced in pattern:
+        n = int(rate * seconds)
+        level = 0.3 * np.sin(2 * np.pi * 220 * np.arange(n) / rate) if voiced else 0.0
+        parts.append(level + (0.05 if voiced else 0.002) * rng.standard_normal(n))
+    return np.concatenate(parts).astype(np.float32)
+
+
+def _body(boundary: bytes, wav: bytes) -> bytes:
+    return (
+        b"--" + boundary + b"\r\n"
+        b'Content-Disposition: form-data; name="model_id"\r\n\r\nscribe_v1\r\n'
+        b"--" + boundary + b"\r\n"
+        b'Content-Disposition: form-data; name="file"; filename="a.wav"\r\nContent-Type: audio/wav\r\n\r\n'
+        + wav + b"\r\n--" + boundary + b"--\r\n"
+    )
+
+
+class SplitOnSilenceTest(unittest.TestCase):
+    def test_cuts_fall_in_pauses_and_spans_tile_the_recording(self) -> None:
+        pattern = [(4.0, True), (0.6, False)] * 6
+        mono = _speech(16000, pattern)
+        pauses, t = [], 0.0
+        for seconds, voiced in pattern:
+            if not voiced:
+                pauses.append((t, t + seconds))
+            t += seconds
+
+        spans = audio.split_on_silence(mono, 16000, max_s=10.0)
+
+        self.assertEqual(spans[0][0], 0)
+        self.assertEqual(spans[-1][1], mono.size)
+        self.assertEqual([a for a, _ in spans[1:]], [b for _, b in spans[:-1]])
+        self.assertTrue(all((b - a) / 16000 <= 10.0 for a, b in spans))
+        for cut, _ in spans[1:]:
+            self.assertTrue(any(lo < cut / 16000 < hi for lo, hi in pauses), cut / 16000)
+
+    def test_continuous_audio_is_still_bounded(self) -> None:
+        spans = audio.split_on_silence(_speech(8000, [(25.0, True)]), 8000, max_s=10.0)
+        self.assertGreaterEqual(len(spans), 3)
+        self.assertTrue(all((b - a) / 8000 <= 10.0 for a, b in spans))
+
+
+class ChunkedTranscriptionTest(unittest.TestCase):
+    def test_long_upload_is_split_retried_and_stitched_in_order(self) -> None:
+        profile = StubProfile(latency_ms=5, sigma=0.0, error_rate=0.3, error_statuses=(500,), seed=1)
+        stub = start_stub(0, profile)
+        self.addCleanup(stub.shutdown)
+        url = f"http://127.0.0.1:{stub.server_address[1]}/v1/speech-to-text"
+        mono = _speech(16000, [(3.0, True), (0.5, False)] * 8)
+        body = _body(b"abc123", _wav(mono[:, None], 16000))
+        headers = {"Content-Type": "multipart/form-data; boundary=abc123", "xi-api-key": "k"}
+
+        with mock.patch.multiple(
+            proxy_server, TRANSCRIBE_CHUNK_S=8.0, TRANSCRIBE_RETRIES=6, TRANSCRIBE_RETRY_BACKOFF_S=0.0
+        ):
+            status, _, raw = proxy_server._forward_transcribe(url, headers, body)
+
+        self.assertEqual(status, 200)
+        result = json.loads(raw)
+        chunks = result["chunks"]
+        self.assertGreaterEqual(len(chunks), 4)
+        self.assertGreater(profile.stats["errors"], 0)  # Failed chunks were retried on their own.
+        self.assertEqual([c["index"] for c in chunks], list(range(len(chunks))))
+        self.assertEqual(result["text"], " ".join(c["text"] for c in chunks))
+        # The stub returns one word spanning each chunk: shifted by offsets, they tile the recording.
+        words = result["words"]
+        self.assertEqual([(w["start"], w["end"]) for w in words], [(c["start"], c["end"]) for c in chunks])
+        self.assertAlmostEqual(words[-1]["end"], mono.size / 16000, places=2)
+
+    def test_short_upload_is_forwarded_whole(self) -> None:
+        stub = start_stub(0, StubProfile(latency_ms=1, sigma=0.0))
+        self.addCleanup(stub.shutdown)
+        url = f"http://127.0.0.1:{stub.server_address[1]}/v1/speech-to-text"
+        body = _body(b"abc123", _wav(_speech(16000, [(2.0, True)])[:, None], 16000))
+        status, _, raw = proxy_server._forward_transcribe(url, {"Content-Type": "multipart/form-data; boundary=abc123"}, body)
+        self.assertEqual(status, 200)
+        self.assertNotIn("chunks", json.loads(raw))
+
+
+class MultipartRewriteTest(unittest.TestCase):
+    def test_only_wav_content_is_replaced(self) -> None:
+        boundary = audio.multipart_boundary('multipart/form-data; boundary="abc123"')
+        self.assertEqual(boundary, b"abc123")
+        wav = _wav(_tones(44100, 0.2, [440])[:, None], 44100)
+
+        rewritten = audio.rewrite_wav_parts(_body(boundary, wav), boundary, lambda _: b"RIFF....WAVEnew")
+        self.assertEqual(rewritten, _body(boundary, b"RIFF....WAVEnew"))
+
+    def test_non_wav_uploads_pass_through(self) -> None:
+        body = _body(b"abc123", b"\x1aE\xdf\xa3webm bytes")
+        self.assertEqual(audio.rewrite_wav_parts(body, b"abc123", lambda _: b"changed"), body)
+        self.assertIsNone(audio.multipart_boundary("application/json"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import io
+import json
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+
+import bulk_score
+from bulk_score import read_batches, read_columns
+
+try:
+    import main
+except ModuleNotFoundError:  # pragma: no cover - dependency gate
+    main = None
+
+TEXTS = [
+    "crushing central chest pain radiating to the jaw",
+    "BP 90/60, sats 88% ra",
+    "fall at home, hip pain, unable to weight bear",
+    "wheeze and shortness of breath, known asthmatic",
+    "",
+    "hypo, bgl 2.9",
+    "crushing central chest pain radiating to the jaw",
+]
+
+
+def _rows(batches) -> list:
+    return [row for rows, _ in batches for row in rows]
+
+
+class ReadBatchesTest(unittest.TestCase):
+    def test_jsonl_rows_ids_and_resume_offsets(self) -> None:
+        lines = [json.dumps({"id": f"h{n}", "text": text}) for n, text in enumerate(TEXTS[:3])]
+        fh = io.StringIO("\n".join([lines[0], "", "not json", json.dumps({"text": 5}), *lines[1:]]) + "\n")
+        batches = list(read_batches(fh, "jsonl", "text", "id", batch=2))
+
+        self.assertEqual(
+            _rows(batches),
+            [(1, "h0", TEXTS[0]), (2, 2, None), (3, 3, None), (4, "h1", TEXTS[1]), (5, "h2", TEXTS[2])],
+        )
+        self.assertEqual([len(rows) for rows, _ in batches], [2, 2, 1])
+        fh.seek(0)
+        rows, offset = batches[0]
+        self.assertEqual(_rows(read_batches(fh, "jsonl", "text", "id", 2, offset, rows[-1][0])), _rows(batches[1:]))
+
+    def test_csv_header_quoted_newlines_and_resume(self) -> None:
+        fh = io.StringIO('incident,handover\r\nA1,"line one,\n""quoted"" two"\r\nA2,fall at home\r\nA3,\r\n')
+        batches = list(read_batches(fh, "csv", "handover", "incident", batch=1))
+        self.assertEqual(
+            _rows(batches), [(1, "A1", 'line one,\n"quoted" two'), (2, "A2", "fall at home"), (3, "A3", None)]
+        )
+        fh.seek(0)
+        self.assertEqual(_rows(read_batches(fh, "csv", "handover", "incident", 1, batches[0][1], 1)), _rows(batches[1:]))
+
+
+@unittest.skipIf(main is None, "Bulk scoring tests require the scoring dependencies.")
+class BulkScoreTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dir = Path(tempfile.mkdtemp())
+        self.input = self.dir / "archive.jsonl"
+        with open(self.input, "w", encoding="utf-8") as fh:
+            for n in range(40):
+                fh.write(json.dumps({"id": f"h{n}", "text": TEXTS[n % len(TEXTS)]}) + "\n")
+
+    def _run(self, output: str, *extra: str) -> dict:
+        args = bulk_score._parse_args(
+            [str(self.input), str(self.dir / output), "--workers", "1", "--batch", "8", "--commit-rows", "8", "--quiet", *extra]
+        )
+        return bulk_score.run(args)
+
+    def test_batch_scoring_matches_single_queries(self) -> None:
+        metas = [{} for _ in TEXTS]
+        batched = main._score_candidates_batch(TEXTS, metas, explain=False)
+        for text, candidates, meta in zip(TEXTS, batched, metas):
+            single_meta: dict = {}
+            single = main._score_candidates(text, single_meta, explain=False)
+            self.assertEqual(meta, single_meta)
+            self.assertEqual([c.id for c in candidates], [c.id for c in single])
+            for got, want in zip(candidates, single):
+                self.assertAlmostEqual(got.final_score, want.final_score, places=5)
+
+    def test_records_and_resume_after_interruption(self) -> None:
+        summary = self._run("full.jsonl")
+        full = (self.dir / "full.jsonl").read_text().splitlines()
+        self.assertEqual(summary["rows"], 40)
+        records = [json.loads(line) for line in full]
+        self.assertEqual([r["id"] for r in records], [f"h{n}" for n in range(40)])
+        self.assertEqual(records[1]["tier"], main.VITALS_TIER)
+        self.assertEqual(records[1]["vitals"][0]["kind"], "blood_pressure")
+        self.assertIn("error", records[4])
+        self.assertEqual(set(records[0]["meta"]), set(bulk_score.SELECTION_FIELDS))
+
+        calls = {"n": 0}
+        score_rows = bulk_score.score_rows
+
+        def flaky(rows):
+            calls["n"] += 1
+            if calls["n"] == 3:
+                raise KeyboardInterrupt
+            return score_rows(rows)
+
+        with mock.patch.object(bulk_score, "score_rows", flaky), self.assertRaises(KeyboardInterrupt):
+            self._run("resumed.jsonl")
+        with open(self.dir / "resumed.jsonl", "a", encoding="utf-8") as fh:
+            fh.write('{"id": "torn')  # A write cut off after the last checkpoint.
+        summary = self._run("resumed.jsonl")
+        self.assertEqual((summary["resumed_at"], summary["scored"]), (8, 32))
+        self.assertEqual((self.dir / "resumed.jsonl").read_text().splitlines(), full)
+
+        with self.assertRaises(SystemExit):
+            self._run("resumed.jsonl", "--delta", "0.2")  # A checkpoint from other settings.
+
+    def test_npz_columns(self) -> None:
+        self._run("columns", "--format", "npz")
+        columns = read_columns(self.dir / "columns")
+        self.assertEqual(len(list((self.dir / "columns").glob("part-*.npz"))), 5)
+        self.assertEqual(columns["row"].tolist(), list(range(1, 41)))
+        offsets = columns["selected_offsets"]
+        self.assertEqual(len(offsets), 41)
+        self.assertEqual(offsets[-1], len(columns["selected"]))
+        self.assertEqual(len(columns["scores"]), len(columns["selected"]))
+        vitals = columns["selected"][offsets[1] : offsets[2]].tolist()
+        self.assertIn("Blood Pressure.systolicBP", vitals)
+        self.assertEqual(columns["error"][4], "no text in 'text'")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import unittest
+
+import numpy as np
+
+from embedder import CascadeEmbedder, Embedder, TfidfEmbedder
+from selection import CatalogEntry, build_candidates, select_categories
+
+DOCS = [
+    "Blood pressure. Systolic BP",
+    "Blood pressure. Diastolic BP",
+    "Pulse oximetry. Sats, SpO2",
+    "Blood glucose. BGL, sugar",
+    "Cardiac. Chest pain onset time",
+    "Airway. Airway status, obstructed",
+]
+QUERIES = ["systolic blood pressure", "chest pain onset", "sats spo2", "sugar", "airway obstructed", "fell over"]
+
+
+class _TfidfTeacher(Embedder):
+    """A cosine model whose cosines are the TF-IDF ones, so both tiers see the same similarities."""
+
+    def __init__(self, corpus) -> None:
+        self.tfidf = TfidfEmbedder(corpus)
+        super().__init__(name="tfidf-teacher", score_range="cosine-1-1")
+
+    def embed_texts(self, texts):
+        return self.tfidf.embed_texts(texts)
+
+
+def _selected(scores: np.ndarray) -> list:
+    items = [CatalogEntry(str(i), doc) for i, doc in enumerate(DOCS)]
+    selected, meta = select_categories(build_candidates(items, scores), 0.1, None, 1, 4)
+    return [c.id for c in selected], meta["low_confidence_mode"]
+
+
+class CascadeCalibrationTest(unittest.TestCase):
+    def setUp(self) -> None:
+        teacher = _TfidfTeacher(DOCS)
+        self.matrix = teacher.embed_texts(DOCS)
+        self.lexical = CascadeEmbedder(DOCS, teacher, min_score=0.0, min_margin=0.0)
+        self.semantic = CascadeEmbedder(DOCS, teacher, min_score=2.0)
+
+    def test_selection_is_the_same_whichever_tier_answers(self) -> None:
+        self.assertEqual(self.lexical.calibration, (0.5, 0.5))
+        for query in QUERIES:
+            with self.subTest(query=query):
+                lexical, tier = self.lexical.score(query, self.matrix)
+                semantic, escalated = self.semantic.score(query, self.matrix)
+                self.assertEqual((tier, escalated), ("lexical", "semantic"))
+                np.testing.assert_allclose(lexical, semantic, atol=1e-5)
+                self.assertEqual(_selected(lexical), _selected(semantic))
+
+    def test_gate_uses_raw_cosines_and_batches_agree(self) -> None:
+        cascade = CascadeEmbedder(DOCS, self.lexical.semantic, min_score=0.3, min_margin=0.0)
+        raw = cascade.lexical_scores("sats spo2")
+        self.assertTrue(cascade.accepts(raw))
+        scores, tier = cascade.score("sats spo2", self.matrix)
+        self.assertEqual(tier, "lexical")
+        np.testing.assert_allclose(scores, (raw + 1) / 2, atol=1e-6)
+        # An accepted answer clears the gate's raw 0.30, i.e. 0.65 calibrated: never low confidence.
+        self.assertGreaterEqual(float(scores.max()), 0.65)
+        self.assertFalse(_selected(scores)[1])
+
+        batch = cascade.score_batch(QUERIES, self.matrix)
+        for query, (scores, tier) in zip(QUERIES, batch):
+            single, single_tier = cascade.score(query, self.matrix)
+            self.assertEqual(tier, single_tier)
+            np.testing.assert_allclose(scores, single, atol=1e-5)
+        self.assertIn("semantic", [tier for _, tier in batch])
+
+    def test_explicit_calibration_overrides_the_default(self) -> None:
+        cascade = CascadeEmbedder(DOCS, self.lexical.semantic, min_score=0.0, min_margin=0.0, calibration=(0.4, 0.55))
+        raw = cascade.lexical_scores("sugar")
+        scores, _ = cascade.score("sugar", self.matrix)
+        np.testing.assert_allclose(scores, np.clip(raw * 0.4 + 0.55, 0, 1), atol=1e-6)
+        self.assertEqual(CascadeEmbedder(DOCS, TfidfEmbedder(DOCS)).calibration, (1.0, 0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import json
+import os
+from pathlib import Path
+import tempfile
+import unittest
+from typing import List
+
+try:
+    import numpy  # noqa: F401
+except ModuleNotFoundError as exc:  # pragma: no cover - dependency gate
+    raise unittest.SkipTest(f"Catalog store tests require numpy. Missing: {exc}")
+
+from catalog_store import CatalogStore, build_doc, load_store
+
+
+@dataclass
+class Entry:
+    id: str
+    title: str
+    description: str
+    examples: List[str]
+    synonyms: List[str]
+
+
+ITEMS = [
+    {"id": "Cardiac.chestPain", "title": "Chest pain", "description": "Central chest pain.", "examples": ["crushing chest pain", "pain to jaw"], "synonyms": ["CP"]},
+    {"id": "Cardiac.palpitations", "title": "Palpitations", "description": "Central chest pain.", "examples": ["racing heart"], "synonyms": []},
+    {"id": "Stroke.fast", "title": "FAST — facial droop", "description": "Face, arms, speech.", "examples": [], "synonyms": ["CVA", "CP"]},
+]
+
+
+class CatalogStoreTest(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "categories.json"
+        self.path.write_text(json.dumps(ITEMS), encoding="utf-8")
+
+    def test_round_trips_through_the_compiled_file(self) -> None:
+        built = load_store(self.path, Entry)
+        self.assertTrue(self.path.with_name("categories.json.store").exists())
+        loaded = load_store(self.path, Entry)
+
+        self.assertEqual(loaded, built)
+        self.assertEqual(loaded, [Entry(**item) for item in ITEMS])
+        self.assertEqual(loaded.ids, [item["id"] for item in ITEMS])
+        self.assertEqual(loaded.titles[2], "FAST — facial droop")
+        self.assertEqual(loaded.examples(1), ["racing heart"])
+        self.assertEqual(loaded.synonyms(2), ["CVA", "CP"])
+        self.assertEqual(list(loaded.docs), [build_doc(i["title"], i["description"], i["examples"], i["synonyms"]) for i in ITEMS])
+        self.assertEqual([tuple(e) for e in loaded.entries], [(i["id"], i["title"]) for i in ITEMS])
+
+    def test_repeated_strings_are_stored_once(self) -> None:
+        store = CatalogStore.from_items(ITEMS, Entry)
+        distinct = {text for item in ITEMS for key in ("id", "title", "description") for text in [item[key]]}
+        distinct |= {text for item in ITEMS for text in item["examples"] + item["synonyms"]}
+        self.assertEqual(len(store.strings), len(distinct))
+
+    def test_an_edited_catalog_is_recompiled(self) -> None:
+        load_store(self.path, Entry)
+        edited = ITEMS + [{"id": "Airway.status", "title": "Airway", "description": "Patent.", "examples": [], "synonyms": []}]
+        self.path.write_text(json.dumps(edited), encoding="utf-8")
+        stat = self.path.stat()
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        self.assertEqual(load_store(self.path, Entry).ids[-1], "Airway.status")
+
+    def test_a_corrupt_compiled_file_is_rebuilt(self) -> None:
+        self.path.with_name("categories.json.store").write_bytes(b"not a store")
+        self.assertEqual(len(load_store(self.path, Entry)), len(ITEMS))
+
+    def test_duplicate_ids_are_rejected(self) -> None:
+        with self.assertRaisesRegex(ValueError, "Duplicate pathway id"):
+            CatalogStore.from_items(ITEMS + ITEMS[:1], Entry, "pathway")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from admission import Overloaded
+from catalog_cache import CatalogCache
+
+
+class CatalogCacheTest(unittest.TestCase):
+    def _cache(self, max_bytes: int, sizes: dict[str, int]) -> tuple[CatalogCache, list[str]]:
+        loaded: list[str] = []
+
+        def loader(name: str) -> str:
+            loaded.append(name)
+            return f"index:{name}"
+
+        return CatalogCache(loader, lambda index: sizes[index.split(":", 1)[1]], max_bytes, {"default": "pinned"}), loaded
+
+    def test_loads_once_and_evicts_least_recently_used(self) -> None:
+        cache, loaded = self._cache(100, {"a": 40, "b": 40, "c": 40})
+        self.assertEqual(cache.get("a"), "index:a")
+        cache.get("b")
+        cache.get("a")  # b is now least recently used
+        cache.get("c")
+        self.assertEqual(loaded, ["a", "b", "c"])
+        snapshot = cache.snapshot()
+        self.assertEqual(list(snapshot["resident"]), ["a", "c"])
+        self.assertEqual((snapshot["loads"], snapshot["hits"], snapshot["evictions"]), (3, 1, 1))
+
+    def test_pinned_never_evicted_and_oversized_entry_stays(self) -> None:
+        cache, _ = self._cache(10, {"big": 50})
+        cache.get("big")
+        self.assertEqual(cache.get("default"), "pinned")
+        self.assertEqual(list(cache.snapshot()["resident"]), ["big"])
+
+    def test_concurrent_first_requests_share_one_load(self) -> None:
+        calls = []
+
+        def slow_loader(name: str) -> str:
+            calls.append(name)
+            time.sleep(0.05)
+            return name
+
+        cache = CatalogCache(slow_loader, lambda _: 1, 100)
+        threads = [threading.Thread(target=cache.get, args=("a",)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(calls, ["a"])
+        self.assertEqual(cache.stats["hits"], 4)
+
+
+try:
+    import numpy  # noqa: F401
+    import sklearn  # noqa: F401
+except ModuleNotFoundError:  # pragma: no cover - dependency gate
+    main = None
+else:
+    import main
+
+
+@unittest.skipIf(main is None, "Named catalog tests require numpy/sklearn.")
+class NamedCatalogTest(unittest.TestCase):
+    def test_named_catalog_scores_only_its_own_categories(self) -> None:
+        subset = [c for c in json.loads((main.BASE_DIR / "categories.json").read_text()) if c["id"].startswith("FAST")]
+        with tempfile.TemporaryDirectory() as tmp:
+            (Path(tmp) / "trust_a").mkdir()
+            (Path(tmp) / "trust_a" / "categories.json").write_text(json.dumps(subset))
+            original = main.CATALOG_DIR
+            main.CATALOG_DIR = Path(tmp)
+            try:
+                catalog = main.get_catalog("trust_a")
+                with self.assertRaises(KeyError):
+                    main.get_catalog("../trust_a")
+            finally:
+                main.CATALOG_DIR = original
+
+        scored = main._score_candidates("facial droop and arm weakness", catalog=catalog)
+        self.assertEqual({c.id for c in scored}, {c["id"] for c in subset})
+        self.assertEqual(catalog.pathways, main.PATHWAYS)  # No pathways.json: the shared list.
+        self.assertEqual(main.get_catalog(None), main.DEFAULT_CATALOG)
+
+    def test_catalog_listing_is_versioned_by_content(self) -> None:
+        listing = json.loads(main.DEFAULT_CATALOG.listing)
+        self.assertEqual(listing["version"], main.DEFAULT_CATALOG.version)
+        self.assertEqual(len(listing["categories"]), len(main.CATEGORIES))
+        base = main.Catalog("x", main.CATEGORIES[:1], main.PATHWAYS[:1])
+        retitled = main.Catalog("y", [main.Category(**{**vars(main.CATEGORIES[0]), "title": "Other"})], main.PATHWAYS[:1])
+        self.assertNotEqual(base.version, retitled.version)
+
+
+@unittest.skipIf(main is None or main.app is None, "Response view tests require the API dependencies.")
+class SuggestViewTest(unittest.TestCase):
+    def test_lean_views_carry_only_requested_fields(self) -> None:
+        text = "facial droop and arm weakness"
+        full = main._suggest(main.SuggestRequest(text=text))
+        ids = json.loads(main._suggest(main.SuggestRequest(text=text, view="ids")).body)
+        scores = json.loads(main._suggest(main.SuggestRequest(text=text, view="scores")).body)
+
+        self.assertEqual([row["id"] for row in ids["suggestions"]], [s.id for s in full.suggestions])
+        self.assertEqual({key for row in ids["suggestions"] for key in row}, {"id"})
+        self.assertEqual(
+            [row["final_score"] for row in scores["suggestions"]], [s.final_score for s in full.suggestions]
+        )
+        self.assertEqual(ids["meta"]["catalog_version"], main.DEFAULT_CATALOG.version)
+
+    def test_catalog_listing_is_admitted_like_suggest(self) -> None:
+        from fastapi.testclient import TestClient
+
+        with TestClient(main.app) as client:
+            ok = client.get("/catalog")
+            self.assertEqual(client.get("/catalog", headers={"If-None-Match": ok.headers["ETag"]}).status_code, 304)
+            self.assertEqual(client.get("/catalog", params={"catalog": "no-such-catalog"}).status_code, 404)
+            with mock.patch.object(main.ENCODE_POOL, "submit", side_effect=Overloaded(1.0, "queue_full")):
+                shed = client.get("/catalog")
+        self.assertEqual(json.loads(ok.content)["version"], main.DEFAULT_CATALOG.version)
+        self.assertEqual((shed.status_code, shed.headers["Retry-After"]), (503, "1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import unittest
+
+import numpy as np
+
+from coarse_index import CoarseIndex
+
+
+def _unit(rows: list[list[float]]) -> np.ndarray:
+    matrix = np.asarray(rows, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+class CoarseIndexTest(unittest.TestCase):
+    def setUp(self) -> None:
+        # Groups deliberately interleaved: the index must map scores back to input order.
+        self.matrix = _unit([[1, 0.1, 0], [0, 1, 0.1], [1, 0, 0.1], [0, 0.1, 1], [0.1, 1, 0], [0.1, 0, 1]])
+        self.groups = ["A", "B", "A", "C", "B", "C"]
+
+    def test_scores_only_the_best_parents(self) -> None:
+        index = CoarseIndex(self.matrix, self.groups, top_groups=1, min_margin=0.0)
+        query = _unit([[1, 0, 0]])[0]
+        scores = index @ query
+        np.testing.assert_allclose(scores[[0, 2]], self.matrix[[0, 2]] @ query, rtol=1e-6)
+        self.assertTrue(np.isneginf(scores[[1, 3, 4, 5]]).all())
+        self.assertEqual(index.stats["coarse"], 1)
+
+    def test_falls_back_to_exact_when_parents_are_close(self) -> None:
+        index = CoarseIndex(self.matrix, self.groups, top_groups=1, min_margin=1.0, max_groups=1)
+        query = _unit([[1, 1, 1]])[0]
+        np.testing.assert_allclose(index @ query, self.matrix @ query, rtol=1e-6)
+        self.assertEqual(index.stats["exact"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
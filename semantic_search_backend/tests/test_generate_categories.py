@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+
+import generate_categories
+
+
+ATTRIBUTES = {
+    "Blood Glucose": {
+        "value": {"description": "Blood glucose reading in mmol/L.", "values": []},
+        "time": {"description": "Time of the glucose reading."},
+    },
+    "Airway": {
+        "status": {"description": "Airway status.", "values": ["Patent", "Obstructed"]},
+        "hidden": {"description": "Not shown to crews.", "medic_visible": False},
+    },
+    "Patient Details": {"familyName": {"description": "Baseline field."}},
+}
+
+
+class IncrementalGenerationTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dir = Path(tempfile.mkdtemp())
+        self.attributes = json.loads(json.dumps(ATTRIBUTES))
+
+    def _generate(self, *extra: str, output: str = "categories.json") -> dict:
+        (self.dir / "merged.json").write_text(json.dumps({"attributes": self.attributes}), encoding="utf-8")
+        argv = ["generate_categories.py", "--input", str(self.dir / "merged.json"), "--output", str(self.dir / output)]
+        argv += ["--manifest", str(self.dir / "manifest.json"), "--changelog", str(self.dir / "changelog.json"), *extra]
+        out = io.StringIO()
+        with mock.patch("sys.argv", argv), contextlib.redirect_stdout(out):
+            generate_categories.main()
+        summary = json.loads(out.getvalue())
+        summary["changelog"] = json.loads((self.dir / "changelog.json").read_text(encoding="utf-8"))
+        summary["ids"] = [entry["id"] for entry in json.loads((self.dir / output).read_text(encoding="utf-8"))]
+        return summary
+
+    def test_first_run_builds_everything(self) -> None:
+        summary = self._generate()
+        self.assertEqual(summary["ids"], ["Blood Glucose.value", "Blood Glucose.time", "Airway.status"])
+        self.assertEqual(summary["changelog"]["added"], sorted(summary["ids"]))
+        self.assertEqual((summary["excluded_baseline"], summary["excluded_hidden"]), (["Patient Details.familyName"], ["Airway.hidden"]))
+
+    def test_unchanged_rerun_rebuilds_nothing(self) -> None:
+        self._generate()
+        before = (self.dir / "categories.json").stat().st_mtime_ns
+        summary = self._generate()
+        self.assertEqual((summary["rebuilt"], summary["reused"]), (0, 3))
+        self.assertEqual(summary["changelog"], {"added": [], "changed": [], "removed": []})
+        self.assertEqual((self.dir / "categories.json").stat().st_mtime_ns, before)
+
+    def test_edited_attribute_is_the_only_one_rebuilt(self) -> None:
+        self._generate()
+        self.attributes["Blood Glucose"]["time"]["description"] = "When the BM was taken."
+        summary = self._generate()
+        self.assertEqual(summary["rebuilt"], 1)
+        self.assertEqual(summary["changelog"], {"added": [], "changed": ["Blood Glucose.time"], "removed": []})
+
+    def test_added_and_removed_attributes(self) -> None:
+        self._generate()
+        del self.attributes["Airway"]["status"]
+        self.attributes["Airway"]["adjunct"] = {"description": "Airway adjunct used.", "values": ["OPA", "NPA"]}
+        summary = self._generate()
+        self.assertEqual(summary["rebuilt"], 1)
+        self.assertEqual(summary["changelog"], {"added": ["Airway.adjunct"], "changed": [], "removed": ["Airway.status"]})
+        self.assertEqual(summary["ids"], ["Blood Glucose.value", "Blood Glucose.time", "Airway.adjunct"])
+
+    def test_reordered_input_is_rewritten_in_the_new_order(self) -> None:
+        self._generate()
+        self.attributes = {name: self.attributes[name] for name in ["Airway", "Blood Glucose", "Patient Details"]}
+        summary = self._generate()
+        self.assertEqual((summary["rebuilt"], summary["changelog"]), (0, {"added": [], "changed": [], "removed": []}))
+        self.assertEqual(summary["ids"], ["Airway.status", "Blood Glucose.value", "Blood Glucose.time"])
+
+    def test_generator_change_rebuilds_everything(self) -> None:
+        self._generate()
+        with mock.patch.object(generate_categories, "_generator_hash", return_value="edited"):
+            summary = self._generate()
+        self.assertEqual((summary["rebuilt"], summary["reused"]), (3, 0))
+        self.assertEqual(summary["changelog"], {"added": [], "changed": [], "removed": []})  # Same rules, same output.
+
+    def test_process_pool_matches_serial_output(self) -> None:
+        self._generate("--workers", "1")
+        (self.dir / "manifest.json").unlink()
+        summary = self._generate("--workers", "2", output="parallel.json")
+        self.assertEqual(summary["rebuilt"], 3)
+        self.assertEqual(
+            (self.dir / "parallel.json").read_text(encoding="utf-8"), (self.dir / "categories.json").read_text(encoding="utf-8")
+        )
+        groups = [
+            ("Blood Glucose", list(self.attributes["Blood Glucose"].items())),
+            ("Airway", [("status", self.attributes["Airway"]["status"])]),
+        ]
+        self.assertEqual(generate_categories._build_groups(groups, 2), generate_categories._build_groups(groups, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import io
+import json
+import unittest
+
+from generate_pathways import _iter_pathways, _iter_protocols
+
+
+PROTOCOLS = {
+    "protocols": [
+        {
+            "condition_id": "jrc_asthma",
+            "name": "Acute Asthma",
+            "category": "Respiratory",
+            "triggers": ["wheeze", "tight chest"],
+            "steps": [{"step_order": 1, "name": "nested name is ignored", "value_options": ["A", "B"]}],
+        },
+        {
+            "condition_id": "jrc_stroke",
+            "name": "Stroke / TIA",
+            "category": "Neurological",
+            "triggers": ["facial droop", "slurred \"speech\""],
+        },
+    ]
+}
+
+EXPECTED = [
+    {
+        "condition_id": "jrc_asthma",
+        "name": "Acute Asthma",
+        "category": "Respiratory",
+        "triggers": ["wheeze", "tight chest"],
+    },
+    {
+        "condition_id": "jrc_stroke",
+        "name": "Stroke / TIA",
+        "category": "Neurological",
+        "triggers": ["facial droop", "slurred \"speech\""],
+    },
+]
+
+
+def _parse(data: bytes, chunk_size: int = 1 << 16) -> list[dict]:
+    return list(_iter_protocols(io.BytesIO(data), chunk_size))
+
+
+class StreamingProtocolParserTest(unittest.TestCase):
+    def test_pretty_and_minified_match(self) -> None:
+        pretty = json.dumps(PROTOCOLS, indent=2).encode()
+        minified = json.dumps(PROTOCOLS, separators=(",", ":")).encode()
+        self.assertEqual(_parse(pretty), EXPECTED)
+        self.assertEqual(_parse(minified), EXPECTED)
+
+    def test_chunk_boundaries_do_not_change_records(self) -> None:
+        data = json.dumps(PROTOCOLS).encode()
+        for chunk_size in (1, 2, 3, 7, 64):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(_parse(data, chunk_size), EXPECTED)
+
+    def test_tolerates_malformed_input(self) -> None:
+        data = b"""{"protocols": [ // comment
+          {"condition_id": "a1", "name": "Asthma" "category": "Resp", "triggers": ["wheeze", "sob",],},
+          {"condition_id": "a2", "name": "Bad \xff bytes", "note": "unterminated,
+            "triggers": ["x", 5, null, "y"]},
+          {"condition_id": "a3", "name": null},
+          {"name": "Truncated", "condition_id": "a4", "triggers": ["t1", """
+        self.assertEqual(
+            _parse(data, 5),
+            [
+                {"condition_id": "a1", "name": "Asthma", "category": "Resp", "triggers": ["wheeze", "sob"]},
+                {"condition_id": "a2", "name": "Bad  bytes", "triggers": ["x", "y"]},
+                {"name": "Truncated", "condition_id": "a4", "triggers": ["t1"]},
+            ],
+        )
+
+    def test_pipeline_is_lazy(self) -> None:
+        pathways = _iter_pathways(iter(EXPECTED))
+        first = next(pathways)
+        self.assertEqual(first["id"], "jrc_asthma")
+        self.assertIn("wheeze", first["synonyms"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import unittest
+
+try:
+    import numpy as np
+    import sklearn  # noqa: F401
+except ModuleNotFoundError as exc:  # pragma: no cover - dependency gate
+    raise unittest.SkipTest(f"Hashing embedder tests require numpy/sklearn. Missing: {exc}")
+
+from embedder import HashingEmbedder, TfidfEmbedder
+
+DOCS = {
+    "Cardiac.chestPain": "Chest pain. Central crushing chest pain radiating to the left arm or jaw.",
+    "Stroke.fast": "FAST assessment. Facial droop, arm weakness, slurred speech.",
+    "Airway.status": "Airway. Patent, obstructed, stridor, snoring, airway adjuncts.",
+    "Trauma.mechanism": "Mechanism of injury. Road traffic collision, fall from height, assault.",
+}
+QUERIES = ["crushing chest pain to the jaw", "slurred speech and facial droop", "fell from a ladder", "xyzzy"]
+
+
+class HashingEmbedderTest(unittest.TestCase):
+    def _assert_same_scores(self, left, right, tolerance: float = 1e-6) -> None:
+        for text in QUERIES:
+            with self.subTest(text=text):
+                np.testing.assert_allclose(left(text), right(text), atol=tolerance)
+
+    def test_matches_a_fitted_tfidf_embedder(self) -> None:
+        hashing = HashingEmbedder(list(DOCS.values()), list(DOCS))
+        tfidf = TfidfEmbedder(list(DOCS.values()))
+        self._assert_same_scores(hashing.sparse_scores, tfidf.sparse_scores)
+        np.testing.assert_allclose(
+            (hashing.document_matrix @ hashing.document_matrix.T).toarray(),
+            (tfidf._matrix @ tfidf._matrix.T).toarray(),
+            atol=1e-6,
+        )
+
+    def test_online_edits_equal_a_fresh_build(self) -> None:
+        hashing = HashingEmbedder(list(DOCS.values()), list(DOCS))
+        hashing.add("Burns.area", "Burns. Total body surface area, full thickness, partial thickness.")
+        hashing.add("Stroke.fast", "FAST assessment. Face, arms, speech, time of onset.")  # Replaced in place.
+        hashing.remove("Airway.status")
+
+        expected = {**DOCS, "Stroke.fast": "FAST assessment. Face, arms, speech, time of onset."}
+        del expected["Airway.status"]
+        expected["Burns.area"] = "Burns. Total body surface area, full thickness, partial thickness."
+        fresh = HashingEmbedder(list(expected.values()), list(expected))
+
+        self.assertEqual(hashing.keys, list(expected))
+        np.testing.assert_array_equal(hashing.df, fresh.df)
+        self._assert_same_scores(hashing.sparse_scores, fresh.sparse_scores)
+        self._assert_same_scores(hashing.sparse_scores, TfidfEmbedder(list(expected.values())).sparse_scores)
+
+    def test_score_reads_the_snapshot_until_it_is_rebuilt(self) -> None:
+        hashing = HashingEmbedder(list(DOCS.values()), list(DOCS))
+        snapshot = hashing.document_matrix
+        self._assert_same_scores(lambda text: hashing.score(text, snapshot)[0], hashing.sparse_scores, 1e-5)
+
+        hashing.add("Burns.area", "Burns. Total body surface area, full thickness, partial thickness.")
+        hashing.remove("Airway.status")
+        self.assertEqual(hashing.score("full thickness burns", snapshot)[0].tolist(), [0.0] * len(DOCS))
+
+        rebuilt = hashing.document_matrix
+        scores = hashing.score("full thickness burns", rebuilt)[0]
+        self.assertEqual((len(scores), int(scores.argmax())), (len(DOCS), hashing.keys.index("Burns.area")))
+        self._assert_same_scores(lambda text: hashing.score(text, rebuilt)[0], hashing.sparse_scores, 1e-5)
+
+    def test_repeated_edits_are_compacted_and_memory_is_fixed(self) -> None:
+        hashing = HashingEmbedder(list(DOCS.values()), list(DOCS), n_features=1 << 16)
+        df_bytes = hashing.df.nbytes
+        for round_ in range(50):
+            hashing.add("Trauma.mechanism", f"Mechanism of injury, revision {round_}: fall, collision, assault.")
+            hashing.sparse_scores(QUERIES[2])
+        live = sum(len(hashing.vectorizer.transform([doc]).indices) for doc in DOCS.values())
+        self.assertLess(hashing._nnz, 3 * live)
+        self.assertEqual(hashing.df.nbytes, df_bytes)
+        self.assertEqual(hashing.keys, list(DOCS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from typing import Dict, Sequence
+import unittest
+
+try:
+    import numpy as np
+    import sklearn  # noqa: F401
+except ModuleNotFoundError as exc:  # pragma: no cover - dependency gate
+    raise unittest.SkipTest(f"Idle unloading tests require numpy/sklearn. Missing: {exc}")
+
+from embedder import Embedder, TfidfEmbedder
+from idle import IdleUnloader
+import main
+
+
+class FakeModel:
+    def __init__(self, name: str, last_used: float) -> None:
+        self.model_name = name
+        self.last_used = last_used
+        self.loaded = True
+        self.stats: Dict[str, object] = {}
+
+    def unload(self) -> bool:
+        was_loaded, self.loaded = self.loaded, False
+        return was_loaded
+
+
+class Unloadable(Embedder):
+    """TF-IDF standing in for a transformer that can be unloaded."""
+
+    def __init__(self, corpus: Sequence[str]) -> None:
+        self.inner = TfidfEmbedder(corpus)
+        self.awake = True
+        self.reloads_requested = 0
+        super().__init__(name="unloadable", score_range="0-1")
+
+    def embed_texts(self, texts: Sequence[str]) -> np.ndarray:
+        return self.inner.embed_texts(texts)
+
+    def acquire(self) -> bool:
+        if not self.awake:
+            self.reloads_requested += 1
+        return self.awake
+
+    @property
+    def loaded(self) -> bool:
+        return self.awake
+
+
+class IdleUnloaderTest(unittest.TestCase):
+    def test_only_idle_models_are_unloaded_then_released(self) -> None:
+        idle, busy = FakeModel("idle", last_used=0.0), FakeModel("busy", last_used=95.0)
+        released = []
+        unloader = IdleUnloader(idle_s=30.0, models=lambda: [idle, busy], release=lambda: released.append(True))
+
+        self.assertEqual(unloader.check(now=100.0), 1)
+        self.assertEqual((idle.loaded, busy.loaded), (False, True))
+        self.assertEqual(released, [True])
+        self.assertEqual(unloader.check(now=101.0), 0)  # Already unloaded: no second release.
+        self.assertEqual(released, [True])
+
+    def test_disabled_by_default(self) -> None:
+        unloader = IdleUnloader(idle_s=0.0, models=lambda: [])
+        unloader.ensure_started()
+        self.assertFalse(unloader.enabled)
+        self.assertIsNone(unloader._pid)
+
+
+class CatalogFallbackTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.catalog = main.Catalog("idle", main.CATEGORIES[:40], main.PATHWAYS[:5])
+        self.model = Unloadable(list(self.catalog.category_docs))
+        self.catalog.embedder = self.catalog.pathway_embedder = self.model
+        self.catalog.category_matrix = self.catalog.category_index = self.model.inner.category_matrix
+        self.catalog.pathway_matrix = self.model.inner.embed_texts(list(self.catalog.pathway_docs))
+        self.catalog.category_scores.cache_clear()
+
+    def test_fallback_answers_uncached_while_the_model_reloads(self) -> None:
+        text = "chest pain radiating to the jaw"
+        self.catalog.semantic_scores(text)
+        self.model.awake = False
+        self.catalog.release()
+        self.assertEqual(self.catalog.category_scores.cache_info().currsize, 0)
+
+        scores, tier = self.catalog.semantic_scores(text)
+        self.assertEqual(tier, "fallback")
+        np.testing.assert_allclose(scores, TfidfEmbedder(list(self.catalog.category_docs)).sparse_scores(text), atol=1e-6)
+        self.assertEqual(self.catalog.pathway_scores(text)[1], "fallback")
+        self.assertEqual(self.catalog.category_scores.cache_info().currsize, 0)
+        self.assertEqual(self.model.reloads_requested, 2)
+
+        self.model.awake = True
+        self.assertEqual(self.catalog.semantic_scores(text)[1], "unloadable")
+        self.assertIsNone(self.catalog._fallback)
+
+    def test_loaded_catalogs_are_left_alone(self) -> None:
+        self.catalog.release()
+        self.assertIsNone(self.catalog._fallback)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import json
+import unittest
+
+import httpx
+
+from loadtest import Sample, summarize
+from stub_upstreams import StubProfile, start_stub
+
+
+class LoadTestHarnessTest(unittest.TestCase):
+    def test_summary_percentiles_and_error_rate(self) -> None:
+        samples = [Sample("suggest", 200, float(ms)) for ms in range(1, 101)]
+        samples.append(Sample("claude", 529, 5.0, "http_529"))
+        summary = summarize(samples, wall_s=2.0)
+        self.assertEqual(summary["suggest"]["p50_ms"], 50.0)
+        self.assertEqual(summary["suggest"]["p95_ms"], 95.0)
+        self.assertEqual(summary["claude"]["error_rate"], 1.0)
+        self.assertEqual(summary["all"]["throughput_rps"], 50.0)
+        self.assertEqual(summary["all"]["statuses"], {"200": 100, "529": 1})
+
+    def test_stub_streams_and_injects_errors(self) -> None:
+        stub = start_stub(0, StubProfile(latency_ms=1.0, stream_chunks=3, seed=1))
+        failing = start_stub(0, StubProfile(latency_ms=1.0, error_rate=1.0, error_statuses=(429,)))
+        try:
+            url = f"http://127.0.0.1:{stub.server_address[1]}/v1/messages"
+            resp = httpx.post(url, json={"stream": True, "messages": []})
+            events = [line[len("event: "):] for line in resp.text.splitlines() if line.startswith("event: ")]
+            self.assertEqual(events, ["message_start"] + ["content_block_delta"] * 3 + ["message_stop"])
+
+            resp = httpx.post(f"http://127.0.0.1:{failing.server_address[1]}/v1/messages", json={})
+            self.assertEqual(resp.status_code, 429)
+            self.assertEqual(json.loads(resp.text)["type"], "error")
+        finally:
+            stub.shutdown()
+            failing.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
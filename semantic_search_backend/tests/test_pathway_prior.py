@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import unittest
+
+
+try:
+    import numpy  # noqa: F401
+    import sklearn  # noqa: F401
+except ModuleNotFoundError as exc:  # pragma: no cover - dependency gate
+    raise unittest.SkipTest(f"Pathway prior tests require numpy/sklearn. Missing: {exc}")
+
+from main import (
+    CATEGORIES,
+    PATHWAY_AFFINITY,
+    PATHWAYS,
+    PATHWAY_RESTRICT_MIN_AFFINITY,
+    _apply_pathway_prior,
+    _score_candidates,
+)
+
+
+class PathwayPriorTest(unittest.TestCase):
+    def test_affinity_links_pathways_to_their_categories(self) -> None:
+        self.assertEqual(PATHWAY_AFFINITY.shape, (len(PATHWAYS), len(CATEGORIES)))
+        row = PATHWAY_AFFINITY[[p.id for p in PATHWAYS].index("jrc_stroke")]
+        top = [CATEGORIES[i].id for i in row.argsort()[-10:]]
+        self.assertTrue(any(cid.startswith("FAST Assessment.") for cid in top), top)
+
+    def test_prior_reweights_without_changing_semantic_scores(self) -> None:
+        text = "weakness on one side, started an hour ago"
+        base = {c.id: c for c in _score_candidates(text)}
+        weighted = _apply_pathway_prior(_score_candidates(text), "jrc_stroke", restrict=False)
+        fast = next(c for c in weighted if c.id == "FAST Assessment.face")
+        self.assertEqual(fast.semantic_score, base[fast.id].semantic_score)
+        self.assertGreater(fast.final_score, base[fast.id].final_score)
+
+    def test_restrict_keeps_high_affinity_and_forced(self) -> None:
+        restricted = _apply_pathway_prior(_score_candidates("patient fitting"), "jrc_stroke", restrict=True)
+        row = PATHWAY_AFFINITY[[p.id for p in PATHWAYS].index("jrc_stroke")]
+        index = {cat.id: i for i, cat in enumerate(CATEGORIES)}
+        self.assertLess(len(restricted), len(CATEGORIES))
+        for candidate in restricted:
+            self.assertTrue(candidate.forced or row[index[candidate.id]] >= PATHWAY_RESTRICT_MIN_AFFINITY)
+        self.assertIn("Convulsions.currentlySeizing", {c.id for c in restricted})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from pathlib import Path
+import tempfile
+import unittest
+
+
+try:
+    import numpy  # noqa: F401
+    import sklearn  # noqa: F401
+except ModuleNotFoundError as exc:  # pragma: no cover - dependency gate
+    raise unittest.SkipTest(f"Bundle export tests require numpy/sklearn. Missing: {exc}")
+
+from export_bundle import build_bundle, write_bundle
+import main
+from reference_scorer import ReferenceScorer, load_bundle
+from selection import select_categories
+
+QUERIES = [
+    "Chest pain radiating to left arm, sweaty, nausea",
+    "not breathing, cpr in progress, shockable rhythm",
+    "facial droop and slurred speech since 10am",
+    "GCS 14, BP 90/60, SpO2 92% on air",
+    "",
+]
+
+
+@unittest.skipIf(main.EMBEDDER.name != "tfidf", "Parity is defined against the TF-IDF backend.")
+class ReferenceScorerParityTest(unittest.TestCase):
+    def _assert_parity(self, scorer: ReferenceScorer, tolerance: float, compare_why: bool) -> None:
+        for text in QUERIES:
+            with self.subTest(text=text):
+                server = main._score_candidates(text)
+                local = scorer.score_candidates(text)
+                self.assertEqual([c.id for c in local], [c.id for c in server])
+                self.assertEqual([c.forced for c in local], [c.forced for c in server])
+                for a, b in zip(local, server):
+                    self.assertAlmostEqual(a.final_score, b.final_score, delta=tolerance)
+                    if compare_why:
+                        self.assertEqual(a.why, b.why)
+                selected_local, _ = select_categories(local, 0.12, None, 3, 8)
+                selected_server, _ = select_categories(server, 0.12, None, 3, 8)
+                self.assertEqual([c.id for c in selected_local], [c.id for c in selected_server])
+
+    def test_float32_bundle_reproduces_server_scores(self) -> None:
+        self._assert_parity(ReferenceScorer(build_bundle(main.DEFAULT_CATALOG, "f32")), 1e-6, compare_why=True)
+
+    def test_quantized_bundle_round_trips_through_disk(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "bundle.json.gz"
+            write_bundle(build_bundle(main.DEFAULT_CATALOG), path)
+            first = path.read_bytes()
+            write_bundle(build_bundle(main.DEFAULT_CATALOG), path)
+            self.assertEqual(path.read_bytes(), first)  # Reproducible exports.
+            bundle = load_bundle(path)
+        self.assertEqual(bundle["catalog_version"], main.DEFAULT_CATALOG.version)
+        self._assert_parity(ReferenceScorer(bundle), 1e-4, compare_why=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
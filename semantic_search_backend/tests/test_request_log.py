@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import io
+import json
+import threading
+import unittest
+from time import perf_counter
+from unittest import mock
+
+from loadtest import Payloads, _wav
+import request_log
+from request_log import LineWriter, RequestLog, text_digest, wav_seconds
+
+try:
+    import main
+except ModuleNotFoundError:  # pragma: no cover - dependency gate
+    main = None
+
+
+class SlowSink(io.StringIO):
+    """A sink whose writes block until released."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, text: str) -> int:
+        self.release.wait(5)
+        return super().write(text)
+
+
+def _lines(sink: io.StringIO) -> list:
+    return [json.loads(line) for line in sink.getvalue().splitlines()]
+
+
+class LineWriterTest(unittest.TestCase):
+    def test_builds_records_off_thread_in_batches(self) -> None:
+        sink = io.StringIO()
+        writer = LineWriter(sink, batch=64, flush_s=0.05)
+        threads = []
+        for n in range(10):
+            writer.put(lambda n=n: threads.append(threading.current_thread()) or {"n": n})
+        writer.put(lambda: None)  # Builders may decline to write.
+        self.assertTrue(writer.drain())
+
+        self.assertEqual([row["n"] for row in _lines(sink)], list(range(10)))
+        self.assertNotIn(threading.current_thread(), threads)
+        self.assertLess(writer.stats["batches"], 10)
+
+    def test_slow_sink_drops_instead_of_blocking(self) -> None:
+        sink = SlowSink()
+        writer = LineWriter(sink, max_queue=8, batch=4, flush_s=0.01)
+        start = perf_counter()
+        accepted = sum(writer.put({"n": n}) for n in range(1000))
+        elapsed = perf_counter() - start
+
+        self.assertLess(elapsed, 0.5)
+        self.assertLessEqual(accepted, 8 + 4)  # The queue plus the batch stuck in write().
+        self.assertEqual(writer.stats["dropped"], 1000 - accepted)
+        sink.release.set()
+        self.assertTrue(writer.drain())
+        self.assertEqual(writer.stats["written"], accepted)
+
+    def test_bad_records_are_counted_not_fatal(self) -> None:
+        sink = io.StringIO()
+        writer = LineWriter(sink, flush_s=0.01)
+        writer.put(lambda: 1 / 0)
+        writer.put({"ok": True})
+        self.assertTrue(writer.drain())
+        self.assertEqual(_lines(sink), [{"ok": True}])
+        self.assertEqual(writer.stats["failed"], 1)
+
+
+class RequestLogTest(unittest.TestCase):
+    def test_rate_limit_and_sampling(self) -> None:
+        log = RequestLog(max_per_s=5, writer=LineWriter(io.StringIO()))
+        self.assertEqual(sum(log.emit({"n": n}) for n in range(100)), 5)
+        self.assertEqual(log.stats["rate_limited"], 95)
+        self.assertFalse(RequestLog(path="").sample())
+        self.assertFalse(RequestLog(path="").emit({"n": 0}))
+        self.assertFalse(RequestLog(sample_rate=0.0, writer=LineWriter(io.StringIO())).sample())
+
+    def test_text_digest_is_keyed_and_stable(self) -> None:
+        self.assertEqual(text_digest("chest pain"), text_digest("chest pain"))
+        self.assertNotEqual(text_digest("chest pain", salt="a"), text_digest("chest pain", salt="b"))
+        self.assertNotIn("chest", text_digest("chest pain"))
+
+    def test_missing_salt_is_random_and_warned_about_once_text_is_hashed(self) -> None:
+        with mock.patch.object(request_log, "_salt_unwarned", True):
+            with self.assertNoLogs("semantic_search", "WARNING"):
+                RequestLog(writer=LineWriter(io.StringIO()))  # Tools that import main never hash text.
+            with self.assertLogs("semantic_search", "WARNING"):
+                request_log.text_fields("chest pain")
+            with self.assertNoLogs("semantic_search", "WARNING"):
+                request_log.text_fields("chest pain")
+        self.assertTrue(request_log.REQUEST_LOG_SALT)
+
+    def test_wav_seconds_from_multipart_header(self) -> None:
+        body = b"--x\r\nContent-Type: audio/wav\r\n\r\n" + _wav(2.5) + b"\r\n--x--\r\n"
+        self.assertEqual(wav_seconds(body), 2.5)
+        self.assertIsNone(wav_seconds(b"not audio"))
+
+
+class ReplayTest(unittest.TestCase):
+    def test_logged_records_become_requests(self) -> None:
+        payloads = Payloads(["chest pain", "shortness of breath", "fall at home"])
+        record = {"t": 1700000000.0, "path": "/suggest", "params": {"view": "ids"}, "text_sha256": "ab", "text_len": 40}
+        spec = payloads.materialize(record)
+        self.assertEqual(spec["json"]["view"], "ids")
+        self.assertEqual(len(spec["json"]["text"]), 40)
+        self.assertEqual(payloads.materialize(dict(record))["json"]["text"], spec["json"]["text"])
+        self.assertNotEqual(payloads.materialize({**record, "text_sha256": "cd"})["json"]["text"], spec["json"]["text"])
+
+        claude = payloads.materialize({"path": "/claude", "params": {"max_tokens": 64}, "text_sha256": "ab", "text_len": 12})
+        self.assertEqual(claude["json"]["max_tokens"], 64)
+        self.assertEqual(len(claude["json"]["messages"][0]["content"]), 12)
+        transcribe = payloads.materialize({"path": "/transcribe", "audio_s": 1.5})
+        self.assertTrue(transcribe["headers"]["Content-Type"].startswith("multipart/form-data"))
+        recorded = {"t": 0.1, "path": "/suggest", "json": {"text": "x"}}
+        self.assertIs(payloads.materialize(recorded), recorded)
+
+
+@unittest.skipIf(main is None or main.app is None, "Request log route tests require the API dependencies.")
+class RequestLogRouteTest(unittest.TestCase):
+    def test_suggest_record_has_stages_and_no_text(self) -> None:
+        from fastapi.testclient import TestClient
+
+        sink = io.StringIO()
+        log = RequestLog(writer=LineWriter(sink, flush_s=0.01))
+        text = "crushing chest pain radiating to the jaw"
+        with mock.patch.object(main, "REQUEST_LOG", log), TestClient(main.app) as client:
+            resp = client.post("/suggest", json={"text": text, "view": "ids"}, headers={"X-Priority": "batch"})
+            client.post("/suggest", json={"text": text, "catalog": "no-such-catalog"})
+        self.assertTrue(log.writer.drain())
+
+        ok, error = _lines(sink)
+        self.assertEqual(ok["selected"], [row["id"] for row in resp.json()["suggestions"]])
+        self.assertEqual(set(ok["stages_ms"]), {"queue", "score", "select", "build", "send"})
+        self.assertEqual((ok["params"], ok["headers"]), ({"view": "ids"}, {"x-priority": "batch"}))
+        self.assertEqual((ok["text_sha256"], ok["text_len"]), (text_digest(text), len(text)))
+        self.assertNotIn(text, sink.getvalue())
+        self.assertEqual(error["status"], 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
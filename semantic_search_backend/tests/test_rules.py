@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import unittest
+
+from rules import Rule, RuleEngine, MAX_RULE_BOOST, default_rules
+
+
+IDS = ["Blood Pressure.systolicBP", "Blood Pressure.diastolicBP", "Airway Assessment.airwayStatus"]
+
+
+class RuleEngineTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = RuleEngine(
+            [
+                Rule(name="bp", triggers=("bp", "blood pressure"), targets=("Blood Pressure",)),
+                Rule(
+                    name="airway",
+                    triggers=("stridor", "airway obstructed"),
+                    targets=("Airway Assessment.airwayStatus",),
+                    boost=0.3,
+                    force=True,
+                ),
+                Rule(name="obstructed", triggers=("obstructed",), targets=("Airway Assessment.airwayStatus",), boost=0.2),
+            ],
+            IDS,
+        )
+
+    def test_prefix_targets_resolve_to_children(self) -> None:
+        hits = self.engine.apply("BP 120/80")
+        self.assertEqual(set(hits), {"Blood Pressure.systolicBP", "Blood Pressure.diastolicBP"})
+        self.assertEqual(hits["Blood Pressure.systolicBP"].why, ["rule: bp", "matched: bp"])
+
+    def test_matches_respect_word_boundaries(self) -> None:
+        self.assertEqual(self.engine.apply("bpm 120, subpoena"), {})
+
+    def test_overlapping_phrases_force_and_cap_boost(self) -> None:
+        hit = self.engine.apply("Airway obstructed, stridor")["Airway Assessment.airwayStatus"]
+        self.assertTrue(hit.forced)
+        self.assertEqual(hit.boost, MAX_RULE_BOOST)
+        self.assertIn("forced_by_rule:airway", hit.why)
+        self.assertIn("matched: obstructed", hit.why)
+
+
+class DefaultRulesTest(unittest.TestCase):
+    def test_pathway_phrasing_targets_whole_conditions(self) -> None:
+        pathways = [
+            ("jrc_stroke", "Stroke / TIA"),
+            ("jrc_heat_exhaustion_stroke", "Heat Exhaustion / Heat Stroke"),
+            ("jrc_asthma", "Acute Asthma"),
+            ("jrc_convulsions_adult", "Convulsions (Adult)"),
+            ("jrc_febrile_convulsion", "Febrile Convulsion"),
+        ]
+        targets = {rule.name: rule.targets for rule in default_rules([], pathways)}
+        self.assertEqual(targets["stroke pathway phrasing"], ("jrc_stroke",))
+        self.assertEqual(targets["tia pathway phrasing"], ("jrc_stroke",))
+        self.assertEqual(targets["asthma pathway phrasing"], ("jrc_asthma",))
+        self.assertEqual(targets["convulsion pathway phrasing"], ("jrc_convulsions_adult", "jrc_febrile_convulsion"))
+        hits = RuleEngine(default_rules([], pathways), [pid for pid, _ in pathways]).apply("slurred speech")
+        self.assertEqual(set(hits), {"jrc_stroke"})
+
+
+if __name__ == "__main__":
+    unittest.main()
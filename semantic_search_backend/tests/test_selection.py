@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import unittest
+
+from selection import Candidate, select_categories
+
+
+def _candidate(cid: str, score: float, forced: bool = False) -> Candidate:
+    return Candidate(cid, cid, score, score, 0.0, [], forced)
+
+
+class SelectCategoriesTest(unittest.TestCase):
+    def test_forced_candidates_take_room_under_the_cap(self) -> None:
+        candidates = [_candidate(f"n{i}", 0.9 - 0.01 * i) for i in range(8)]
+        candidates += [_candidate("f0", 0.4, forced=True), _candidate("f1", 0.3, forced=True)]
+        selected, meta = select_categories(candidates, delta=0.2, min_score=None, min_results=3, max_results=8)
+
+        self.assertEqual([c.id for c in selected], ["f0", "f1", "n0", "n1", "n2", "n3", "n4", "n5"])
+        self.assertFalse(meta["max_exceeded_due_to_forced"])
+        self.assertEqual(meta["forced_added_ids"], ["f0", "f1"])
+
+    def test_cap_is_exceeded_only_by_forced_candidates(self) -> None:
+        candidates = [_candidate("n0", 0.9)] + [_candidate(f"f{i}", 0.5, forced=True) for i in range(3)]
+        selected, meta = select_categories(candidates, delta=0.2, min_score=None, min_results=1, max_results=2)
+        self.assertEqual({c.id for c in selected}, {"f0", "f1", "f2"})
+        self.assertTrue(meta["max_exceeded_due_to_forced"])
+
+
+if __name__ == "__main__":
+    unittest.main()
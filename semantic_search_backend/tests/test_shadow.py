@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import threading
+import unittest
+from unittest import mock
+
+from admission import EncodeExecutor
+from shadow import Observation, ShadowEvaluator, overlap_at_k, rank_biased_overlap
+
+try:
+    import main
+except ModuleNotFoundError:  # pragma: no cover - dependency gate
+    main = None
+
+
+class Scored:
+    def __init__(self, id: str, final_score: float) -> None:
+        self.id = id
+        self.final_score = final_score
+
+
+def _observation(ids: list[str], selected: int = 2) -> Observation:
+    scored = [Scored(cid, 1.0 - 0.01 * rank) for rank, cid in enumerate(ids)]
+    return Observation(scored, scored[:selected], 1.0)
+
+
+class RankAgreementTest(unittest.TestCase):
+    def test_rank_biased_overlap_weights_the_top(self) -> None:
+        ranking = list("abcdefghij")
+        self.assertAlmostEqual(rank_biased_overlap(ranking, ranking), 1.0)
+        self.assertEqual(rank_biased_overlap(ranking, list("klmnopqrst")), 0.0)
+        swapped_top = list("bacdefghij")
+        swapped_tail = list("abcdefghji")
+        self.assertLess(rank_biased_overlap(ranking, swapped_top), rank_biased_overlap(ranking, swapped_tail))
+        self.assertEqual(overlap_at_k(ranking, swapped_top), 1.0)
+
+    def test_short_rankings(self) -> None:
+        self.assertEqual(overlap_at_k(["a", "b"], ["b", "a"]), 1.0)
+        self.assertAlmostEqual(rank_biased_overlap(["a"], ["a"]), 1.0)
+
+
+class ShadowEvaluatorTest(unittest.TestCase):
+    def test_compares_primary_and_shadow_results(self) -> None:
+        evaluator = ShadowEvaluator("tfidf", sample_rate=1.0, max_queue=8, workers=1)
+        ids = list("abcdefghijkl")
+        evaluator.submit("suggest", _observation(ids), lambda: _observation(ids)).result(5)
+        evaluator.submit("suggest", _observation(ids), lambda: _observation(ids[::-1])).result(5)
+
+        stats = evaluator.snapshot()["routes"]["suggest"]
+        self.assertEqual((stats["sampled"], stats["compared"]), (2, 2))
+        self.assertEqual(stats["top1_agreement"], 0.5)
+        self.assertEqual(stats["selected_jaccard"], 0.5)
+        self.assertEqual(stats["overlap_at_k"], 0.5 * (1 + 8 / 10))
+
+    def test_queue_is_bounded_and_never_blocks(self) -> None:
+        evaluator = ShadowEvaluator("tfidf", sample_rate=1.0, max_queue=2, workers=1)
+        release, started = threading.Event(), threading.Event()
+
+        def blocked() -> Observation:
+            started.set()
+            release.wait(5)
+            return _observation(["a"])
+
+        evaluator.submit("pathways", _observation(["a"]), blocked)
+        self.assertTrue(started.wait(5))
+        queued = [evaluator.submit("pathways", _observation(["a"]), lambda: _observation(["a"])) for _ in range(5)]
+        release.set()
+        for future in queued[:2]:
+            future.result(5)
+        self.assertEqual(queued[2:], [None, None, None])
+        stats = evaluator.snapshot()["routes"]["pathways"]
+        self.assertEqual((stats["sampled"], stats["shed"], stats["compared"]), (6, 3, 3))
+
+    def test_waits_for_the_primary_pool_to_go_idle(self) -> None:
+        primary = EncodeExecutor(workers=1)
+        release, started = threading.Event(), threading.Event()
+        primary.submit(lambda: (started.set(), release.wait(5)))
+        self.assertTrue(started.wait(5))
+        evaluator = ShadowEvaluator("tfidf", sample_rate=1.0, workers=1, yield_to=primary, max_defer_s=5.0)
+        ran = threading.Event()
+
+        def shadow() -> Observation:
+            ran.set()
+            return _observation(list("abc"))
+
+        future = evaluator.submit("suggest", _observation(list("abc")), shadow)
+        self.assertFalse(ran.wait(0.1))
+        release.set()
+        future.result(2)  # Woken by the pool going idle, well before max_defer_s.
+        self.assertEqual(evaluator.snapshot()["routes"]["suggest"]["deferred"], 1)
+
+    def test_failures_are_counted_not_raised(self) -> None:
+        evaluator = ShadowEvaluator("tfidf", sample_rate=1.0)
+        with self.assertLogs("semantic_search", "ERROR"):
+            evaluator.submit("suggest", _observation(["a"]), lambda: 1 / 0).result(5)
+        self.assertEqual(evaluator.snapshot()["routes"]["suggest"]["failed"], 1)
+
+    def test_fallback_answers_are_not_compared(self) -> None:
+        evaluator = ShadowEvaluator("tfidf", sample_rate=1.0)
+        fallback = _observation(["a"])
+        fallback.tier = "fallback"
+        evaluator.submit("suggest", _observation(["a"]), lambda: fallback).result(5)
+        stats = evaluator.snapshot()["routes"]["suggest"]
+        self.assertEqual((stats["failed"], stats["compared"], stats["top1_agreement"]), (1, 0, None))
+
+    def test_disabled_without_a_backend(self) -> None:
+        self.assertFalse(ShadowEvaluator("", sample_rate=1.0).sample())
+        with self.assertRaises(ValueError):
+            ShadowEvaluator("bm25")
+
+
+@unittest.skipIf(main is None or main.app is None, "Shadow route tests require the API dependencies.")
+class ShadowRouteTest(unittest.TestCase):
+    def test_same_backend_shadow_agrees_with_primary(self) -> None:
+        backend = {"tfidf": "tfidf", "hashing": "hashing"}.get(main.EMBEDDER.name)
+        if backend is None:
+            self.skipTest("Needs a backend whose spec reproduces the primary embedder.")
+        evaluator = ShadowEvaluator(backend, sample_rate=1.0)
+        request = main.SuggestRequest(text="crushing chest pain radiating to the jaw", view="ids")
+        observed: dict = {}
+        main._suggest(request, observed)
+        with mock.patch.object(main, "SHADOW", evaluator):
+            evaluator.submit("suggest", observed["primary"], lambda: main._shadow_suggest(request, observed["catalog"])).result(30)
+
+        stats = evaluator.snapshot()["routes"]["suggest"]
+        self.assertEqual(stats["compared"], 1)
+        self.assertEqual((stats["selected_jaccard"], stats["rbo_at_k"]), (1.0, 1.0))
+        self.assertIsNot(main.DEFAULT_CATALOG.shadow(backend), main.DEFAULT_CATALOG)
+
+
+if __name__ == "__main__":
+    unittest.main()
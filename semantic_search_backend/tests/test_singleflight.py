@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import asyncio
+import gc
+import unittest
+import warnings
+
+from singleflight import SingleFlight, request_key
+
+try:
+    import main
+except ModuleNotFoundError:  # pragma: no cover - dependency gate
+    main = None
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    async def test_identical_requests_share_one_upstream_call(self) -> None:
+        flights = SingleFlight()
+        calls = 0
+
+        async def upstream() -> tuple[int, str, bytes]:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return 200, "application/json", b'{"ok": true}'
+
+        key = request_key("/claude", "key", b"body")
+        results = await asyncio.gather(*(flights.do(key, upstream, 1.0) for _ in range(5)))
+
+        self.assertEqual(calls, 1)
+        self.assertEqual({r for r, _ in results}, {(200, "application/json", b'{"ok": true}')})
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True, True, True])
+        self.assertEqual(flights.snapshot(), {"upstream_calls": 1, "coalesced": 4, "follower_timeouts": 0, "in_flight": 0})
+
+    async def test_follower_timeout_does_not_cancel_leader(self) -> None:
+        flights = SingleFlight()
+
+        async def upstream() -> str:
+            await asyncio.sleep(0.1)
+            return "done"
+
+        leader = asyncio.create_task(flights.do("k", upstream, 1.0))
+        await asyncio.sleep(0)
+        with self.assertRaises(asyncio.TimeoutError):
+            await flights.do("k", upstream, 0.01)
+        self.assertEqual(await leader, ("done", False))
+        self.assertEqual(flights.stats["follower_timeouts"], 1)
+
+    async def test_follower_takes_over_when_leader_cancelled(self) -> None:
+        flights = SingleFlight()
+
+        async def upstream() -> str:
+            await asyncio.sleep(0.05)
+            return "done"
+
+        leader = asyncio.create_task(flights.do("k", upstream, 1.0))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.do("k", upstream, 1.0))
+        await asyncio.sleep(0)
+        leader.cancel()
+        self.assertEqual(await follower, ("done", False))
+        self.assertEqual(flights.stats["upstream_calls"], 2)
+
+
+@unittest.skipIf(main is None or main.app is None, "Claude route tests require the API dependencies.")
+class ClaudeRouteTest(unittest.TestCase):
+    def test_bad_deadline_is_rejected_before_any_flight(self) -> None:
+        from fastapi.testclient import TestClient
+
+        with warnings.catch_warnings(record=True) as caught, TestClient(main.app) as client:
+            warnings.simplefilter("always")
+            resp = client.post("/claude", content=b"{}", headers={"X-Deadline-Ms": "soon"})
+            gc.collect()
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual([w for w in caught if issubclass(w.category, RuntimeWarning)], [])
+        self.assertEqual(main.CLAUDE_FLIGHTS.snapshot()["in_flight"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
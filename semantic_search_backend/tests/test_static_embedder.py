@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from distill_static import distill
+from embedder import Embedder, StaticEmbedder, static_ngrams
+
+
+class _HashTeacher(Embedder):
+    def __init__(self) -> None:
+        super().__init__(name="hash-teacher", score_range="cosine-1-1")
+
+    def embed_texts(self, texts):
+        return np.stack([np.random.default_rng(sum(map(ord, t))).standard_normal(16) for t in texts]).astype(np.float32)
+
+
+class StaticEmbedderTest(unittest.TestCase):
+    def setUp(self) -> None:
+        docs = ["Blood pressure. Systolic BP", "Pulse oximetry. Sats, SpO2", "Blood glucose. BGL"]
+        table = distill(_HashTeacher(), docs, extra=["low sugar"], dims=8)
+        self.tmp = tempfile.TemporaryDirectory()
+        path = Path(self.tmp.name) / "static.npz"
+        np.savez(path, **table)
+        self.embedder = StaticEmbedder(path)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_table_covers_ngrams_and_jargon(self) -> None:
+        self.assertEqual(self.embedder.name, "static:hash-teacher")
+        self.assertEqual(self.embedder.vectors.shape[1], 8)
+        for gram in ("blood pressure", "spo2", "low sugar", "low"):
+            self.assertIn(gram, self.embedder.vocab)
+        self.assertEqual(static_ngrams("Low-sugar!", 2), ["low", "sugar", "low sugar"])
+
+    def test_embedding_is_weighted_mean_of_known_ngrams(self) -> None:
+        vec = self.embedder.embed_text("BP and unknownword")
+        ids = [self.embedder.vocab[g] for g in ("bp",)]
+        expected = self.embedder.weights[ids] @ self.embedder.vectors[ids]
+        np.testing.assert_allclose(vec, expected / np.linalg.norm(expected), rtol=1e-5)
+        self.assertFalse(self.embedder.embed_text("zzz qqq").any())
+
+
+class ScriptImportTest(unittest.TestCase):
+    def test_importing_the_tools_leaves_the_backend_alone(self) -> None:
+        code = "import os, distill_static, export_bundle, tune_cascade; print(os.environ['EMBEDDER_MODE'])"
+        env = {**os.environ, "EMBEDDER_MODE": "hashing"}
+        cwd = Path(__file__).resolve().parents[1]
+        out = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True)
+        self.assertEqual(out.stdout.strip(), "hashing", out.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
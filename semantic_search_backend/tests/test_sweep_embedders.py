@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from pathlib import Path
+import tempfile
+import unittest
+
+try:
+    import sweep_embedders
+except ModuleNotFoundError:  # pragma: no cover - dependency gate
+    sweep_embedders = None
+
+
+@unittest.skipIf(sweep_embedders is None, "Sweep tests require numpy/sklearn.")
+class SweepEmbeddersTest(unittest.TestCase):
+    def test_specs_map_to_the_backend_environment(self) -> None:
+        env = sweep_embedders._backend_env("static:/tmp/table.npz")
+        self.assertEqual((env["EMBEDDER_MODE"], env["STATIC_EMBEDDER_PATH"]), ("static", "/tmp/table.npz"))
+        env = sweep_embedders._backend_env("cascade:paraphrase-MiniLM-L3-v2")
+        self.assertEqual((env["EMBEDDER_MODE"], env["EMBEDDER_MODEL"]), ("cascade", "paraphrase-MiniLM-L3-v2"))
+        self.assertEqual(sweep_embedders._backend_env("st")["EMBEDDER_MODE"], "")
+        with self.assertRaises(ValueError):
+            sweep_embedders._backend_env("bm25")
+
+    def test_failing_child_reports_its_own_error(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            labelled = Path(tmp) / "labelled.jsonl"
+            labelled.write_text('{"text": "chest pain", "categories": ["Cardiac"]}\n', encoding="utf-8")
+            result = sweep_embedders._run_backend(f"static:{tmp}/missing.npz", labelled, 5)
+        self.assertEqual(result["backend"], f"static:{tmp}/missing.npz")
+        self.assertEqual(result["error"], f"RuntimeError: static:{tmp}/missing.npz unavailable here (loaded tfidf)")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import json
+import unittest
+from unittest import mock
+
+from rules import RuleHit
+from vitals import VITALS_TIER, VitalsExtractor
+
+try:
+    import main
+except ModuleNotFoundError:  # pragma: no cover - dependency gate
+    main = None
+
+IDS = [
+    "Blood Pressure.systolicBP",
+    "Blood Pressure.diastolicBP",
+    "Pulse Oximetry.spO2",
+    "Respiratory Rate.value",
+    "Glasgow Coma Scale.GCSTotal",
+    "Glasgow Coma Scale.GCSItem",
+    "Blood Glucose.value",
+    "Cardiac.chestPainOnsetTime",
+]
+
+
+class VitalsExtractorTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.extractor = VitalsExtractor(IDS)
+
+    def test_parses_shorthand_and_maps_to_categories(self) -> None:
+        vitals = self.extractor.extract("BP 90/60, sats 88% ra, RR 28, GCS 12 E3V4M5, BGL 2.9")
+        self.assertTrue(vitals.only)
+        self.assertEqual(
+            [(v.kind, v.values) for v in vitals.found],
+            [
+                ("blood_pressure", {"systolic": 90, "diastolic": 60}),
+                ("spo2", {"spo2": 88, "on": "room air"}),
+                ("resp_rate", {"rr": 28}),
+                ("gcs", {"total": 12, "eye": 3, "verbal": 4, "motor": 5}),
+                ("blood_glucose", {"mmol_l": 2.9}),
+            ],
+        )
+        self.assertEqual(vitals.found[0].ids, ["Blood Pressure.systolicBP", "Blood Pressure.diastolicBP"])
+        self.assertEqual(vitals.found[3].ids, ["Glasgow Coma Scale.GCSTotal", "Glasgow Coma Scale.GCSItem"])
+        self.assertEqual(vitals.found[1].text, "sats 88% ra")
+
+    def test_decimals_with_glued_units_are_not_truncated(self) -> None:
+        extractor = VitalsExtractor(IDS + ["Body Temperature.value", "Circulatory Assessment.pulseRate"])
+        cases = {
+            "temp 38.5C": {"celsius": 38.5},
+            "Temp 37.2c": {"celsius": 37.2},
+            "BGL 2.9mmol": {"mmol_l": 2.9},
+            "BGL 12.4mmol/l": {"mmol_l": 12.4},
+            "HR 110bpm": {"hr": 110},
+            "RR 28bpm": {"rr": 28},
+            "bp 120/80mmHg": {"systolic": 120, "diastolic": 80},
+            "bgl 2.9.": {"mmol_l": 2.9},
+        }
+        for text, values in cases.items():
+            with self.subTest(text=text):
+                vitals = extractor.extract(text)
+                self.assertEqual([v.values for v in vitals.found], [values])
+                self.assertTrue(vitals.only)
+        self.assertFalse(extractor.extract("hr 1100").found)
+
+    def test_narrative_is_not_vitals_only(self) -> None:
+        vitals = self.extractor.extract("chest pain since 14:30, BP 90/60")
+        self.assertFalse(vitals.only)
+        self.assertEqual([v.kind for v in vitals.found], ["blood_pressure"])
+        self.assertFalse(self.extractor.extract("fell 2 hours ago").found)
+
+    def test_implausible_or_unmapped_readings_are_ignored(self) -> None:
+        self.assertFalse(self.extractor.extract("bp 900/60").found)
+        self.assertFalse(self.extractor.extract("gcs 19").found)
+        self.assertFalse(self.extractor.extract("temp 38.5").found)  # No Body Temperature field here.
+        self.assertEqual(self.extractor.extract("E4VTM6").found[0].values, {"total": None, "eye": 4, "verbal": "T", "motor": 6})
+
+    def test_hits_force_fields_and_merge_with_rules(self) -> None:
+        vitals = self.extractor.extract("hypo, bgl 2.9")
+        merged = vitals.merge({"Blood Glucose.value": RuleHit(0.2, False, ["rule: hypoglycaemia trigger"])})
+        hit = merged["Blood Glucose.value"]
+        self.assertTrue(hit.forced)
+        self.assertEqual(hit.why, ["rule: hypoglycaemia trigger", "vital: bgl 2.9", "forced_by_vitals"])
+        self.assertEqual(json.loads(json.dumps(vitals.to_meta()))[0]["values"], {"mmol_l": 2.9})
+
+
+@unittest.skipIf(main is None or main.app is None, "Vitals route tests require the API dependencies.")
+class VitalsFastPathTest(unittest.TestCase):
+    def test_vitals_only_query_skips_the_embedder(self) -> None:
+        catalog = main.DEFAULT_CATALOG
+        with mock.patch.object(catalog, "semantic_scores", side_effect=AssertionError("embedded")):
+            response = main._suggest(main.SuggestRequest(text="BP 90/60, sats 88% ra"))
+            lean = json.loads(main._suggest(main.SuggestRequest(text="BP 90/60", view="ids")).body)
+        self.assertEqual(response.meta["tier"], VITALS_TIER)
+        self.assertEqual(response.meta["vitals"][0]["values"], {"systolic": 90, "diastolic": 60})
+        self.assertEqual(
+            {s.id.split(".", 1)[0] for s in response.suggestions}, {"Blood Pressure", "Pulse Oximetry"}
+        )
+        self.assertEqual([row["id"] for row in lean["suggestions"]], ["Blood Pressure.systolicBP", "Blood Pressure.diastolicBP"])
+        self.assertEqual(lean["meta"]["vitals"][0]["kind"], "blood_pressure")
+
+    def test_mixed_query_is_embedded_and_forces_vitals(self) -> None:
+        response = main._suggest(main.SuggestRequest(text="central chest pain radiating to the jaw, BP 90/60"))
+        self.assertNotEqual(response.meta["tier"], VITALS_TIER)
+        self.assertIn("Blood Pressure.systolicBP", response.meta["forced_ids"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from embedder import _HAS_ST, TfidfEmbedder, _sentence_transformer, gate_margin, similarity_scores
+from selection import select_categories
+
+"""
+Tune the cascade gate (CASCADE_MIN_SCORE / CASCADE_MIN_MARGIN) on a labelled query set.
+
+For every gate on a grid, reports how often the lexical tier answers, how closely the
+cascade's selected categories agree with transformer-only selection, and (when the JSONL
+has "categories" labels) how often an expected category is selected.
+
+Also fits the calibration of lexical answers onto the transformer's score scale
+(CASCADE_LEXICAL_SCALE / CASCADE_LEXICAL_OFFSET): a least-squares line over each query's
+top CALIBRATION_TOP_K lexical categories, the ones selection looks at.
+
+    python tune_cascade.py --labelled labelled_queries.jsonl --target-agreement 0.95
+"""
+
+BASE_DIR = Path(__file__).resolve().parent
+SCORE_GRID = [round(x, 2) for x in np.arange(0.15, 0.65, 0.05)]
+MARGIN_GRID = [round(x, 2) for x in np.arange(0.0, 0.22, 0.02)]
+CALIBRATION_TOP_K = 10
+
+
+def _selected_ids(scores: np.ndarray) -> List[str]:
+    from main import _candidates_from_scores
+
+    selected, _ = select_categories(_candidates_from_scores(scores), 0.12, None, 3, 8)
+    return [c.id for c in selected]
+
+
+def fit_calibration(lexical: List[np.ndarray], semantic: List[np.ndarray], k: int = CALIBRATION_TOP_K) -> Tuple[float, float]:
+    """(scale, offset) mapping lexical scores onto semantic ones over each query's top-k lexical categories."""
+    xs, ys = [], []
+    for lex, sem in zip(lexical, semantic):
+        top = np.argsort(-lex)[:k]
+        xs.append(lex[top])
+        ys.append(sem[top])
+    x, y = np.concatenate(xs), np.concatenate(ys)
+    if np.ptp(x) == 0:
+        return 0.0, float(y.mean())
+    scale, offset = np.polyfit(x, y, 1)
+    return round(float(scale), 4), round(float(offset), 4)
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def _hit(ids: List[str], prefixes: List[str]) -> Optional[bool]:
+    if not prefixes:
+        return None
+    return any(cid == p or cid.startswith(p + ".") for p in prefixes for cid in ids)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tune the lexical->transformer cascade gate.")
+    parser.add_argument("--labelled", type=Path, default=BASE_DIR / "labelled_queries.jsonl")
+    parser.add_argument("--model", default=os.getenv("EMBEDDER_MODEL", "all-MiniLM-L6-v2"))
+    parser.add_argument("--target-agreement", type=float, default=0.95)
+    args = parser.parse_args()
+
+    if not _HAS_ST:
+        raise SystemExit("tune_cascade.py needs sentence-transformers for the reference tier.")
+    # Build the lexical and semantic tiers explicitly below; main only supplies the catalog.
+    os.environ["EMBEDDER_MODE"] = "tfidf"
+    from main import CATEGORIES, CATEGORY_DOCS
+
+    rows = [json.loads(line) for line in args.labelled.read_text(encoding="utf-8").splitlines() if line.strip()]
+    groups = np.asarray([cat.id.split(".", 1)[0] for cat in CATEGORIES])
+    lexical = TfidfEmbedder(CATEGORY_DOCS)
+    semantic = _sentence_transformer(args.model)
+    semantic_matrix = semantic.embed_texts(CATEGORY_DOCS)
+
+    lex_rows: List[np.ndarray] = []
+    sem_rows: List[np.ndarray] = []
+    lexical_ms = semantic_ms = 0.0
+    for row in rows:
+        start = perf_counter()
+        lex_rows.append(lexical.sparse_scores(row["text"]))
+        mid = perf_counter()
+        sem_rows.append(similarity_scores(semantic, semantic.embed_text(row["text"]), semantic_matrix))
+        end = perf_counter()
+        lexical_ms += (mid - start) * 1000
+        semantic_ms += (end - mid) * 1000
+    scale, offset = fit_calibration(lex_rows, sem_rows)
+
+    cases: List[Dict[str, object]] = []
+    for row, lex_scores, sem_scores in zip(rows, lex_rows, sem_rows):
+        cases.append(
+            {
+                "top": float(lex_scores.max(initial=0.0)),
+                "margin": gate_margin(lex_scores, groups),
+                # As the cascade answers: calibrated onto the semantic scale.
+                "lexical_ids": _selected_ids(np.clip(lex_scores * scale + offset, 0.0, 1.0)),
+                "semantic_ids": _selected_ids(sem_scores),
+                "expected": list(row.get("categories") or []),
+            }
+        )
+
+    results = []
+    for min_score in SCORE_GRID:
+        for min_margin in MARGIN_GRID:
+            agreement: List[float] = []
+            top1: List[bool] = []
+            hits: List[bool] = []
+            accepted = 0
+            for case in cases:
+                use_lexical = case["top"] >= min_score and case["margin"] >= min_margin
+                accepted += use_lexical
+                ids = case["lexical_ids"] if use_lexical else case["semantic_ids"]
+                agreement.append(_jaccard(set(ids), set(case["semantic_ids"])))
+                top1.append(bool(ids) and bool(case["semantic_ids"]) and ids[0] == case["semantic_ids"][0])
+                hit = _hit(ids, case["expected"])
+                if hit is not None:
+                    hits.append(hit)
+            results.append(
+                {
+                    "min_score": min_score,
+                    "min_margin": min_margin,
+                    "lexical_rate": round(accepted / len(cases), 3),
+                    "agreement": round(float(np.mean(agreement)), 3),
+                    "top1_agreement": round(float(np.mean(top1)), 3),
+                    "label_hit_rate": round(float(np.mean(hits)), 3) if hits else None,
+                }
+            )
+
+    eligible = [r for r in results if r["agreement"] >= args.target_agreement]
+    best = max(eligible, key=lambda r: (r["lexical_rate"], r["agreement"])) if eligible else None
+
+    print(f"{'score':>6} {'margin':>6} {'lexical':>8} {'agree':>6} {'top1':>6} {'labels':>6}")
+    for r in results:
+        labels = "-" if r["label_hit_rate"] is None else f"{r['label_hit_rate']:.3f}"
+        print(
+            f"{r['min_score']:>6.2f} {r['min_margin']:>6.2f} {r['lexical_rate']:>8.3f} "
+            f"{r['agreement']:>6.3f} {r['top1_agreement']:>6.3f} {labels:>6}"
+        )
+    print(
+        json.dumps(
+            {
+                "queries": len(cases),
+                "mean_lexical_ms": round(lexical_ms / len(cases), 3),
+                "mean_semantic_ms": round(semantic_ms / len(cases), 3),
+                "target_agreement": args.target_agreement,
+                "recommended": best,
+                "calibration": {"CASCADE_LEXICAL_SCALE": scale, "CASCADE_LEXICAL_OFFSET": offset},
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
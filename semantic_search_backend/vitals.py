@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from rules import MAX_RULE_BOOST, RuleHit, tokenize
+
+"""
+Fast path for vitals shorthand ("BP 90/60", "sats 88% ra", "GCS 12 E3V4M5", "BGL 2.9").
+
+One precompiled regex finds every observation in a single pass and parses its values.
+Each one forces the categories it documents, like a safety rule. A query that is nothing
+but vitals (plus filler such as "pt" or "on") skips the embedder: its semantic scores
+are zero, `meta.tier` is "vitals", and selection returns just those categories. The
+reference scorer does the same, so this module needs only the standard library.
+
+    python vitals.py --bench   # extraction cost per query
+"""
+
+VITALS_TIER = "vitals"  # meta.tier of queries answered without the embedder.
+# Out-of-range readings are not extracted: "bp 900/60" is a typo, not a vital.
+_NUM = r"(\d{1,3}(?:\.\d+)?)"
+# Ends a number without a word boundary, so a glued unit ("38.5c", "110bpm") neither blocks
+# the match nor makes it backtrack to the integer part ("2.9mmol" read as 2).
+_END = r"(?!\.?\d)"
+_DIGIT_RE = re.compile(r"\d")
+_SEP = r"\s*(?:of|is|was|=|:|-)?\s*"
+# Words a vitals-only query may still contain.
+FILLER = frozenset(
+    "pt patient and with on of is was at now then repeat repeated initial obs observations vitals vital signs "
+    "mmhg bpm mmol l c degrees percent".split()
+)
+
+
+@dataclass(frozen=True)
+class _Kind:
+    name: str
+    pattern: str
+    # Exact ids or parent prefixes, resolved against the catalog like rule targets.
+    targets: Tuple[str, ...]
+    parse: Callable[[Dict[str, Optional[str]]], Optional[Dict[str, object]]]
+
+
+def _number(raw: Optional[str]) -> Optional[float]:
+    if raw is None:
+        return None
+    value = float(raw)
+    return int(value) if value.is_integer() and "." not in raw else value
+
+
+def _within(value: Optional[float], low: float, high: float) -> bool:
+    return value is not None and low <= value <= high
+
+
+def _single(key: str, low: float, high: float) -> Callable[[Dict[str, Optional[str]]], Optional[Dict[str, object]]]:
+    def parse(groups: Dict[str, Optional[str]]) -> Optional[Dict[str, object]]:
+        value = _number(groups["value"])
+        return {key: value} if _within(value, low, high) else None
+
+    return parse
+
+
+def _blood_pressure(groups: Dict[str, Optional[str]]) -> Optional[Dict[str, object]]:
+    systolic, diastolic = _number(groups["sys"]), _number(groups["dia"])
+    if _within(systolic, 40, 300) and _within(diastolic, 20, 200) and systolic > diastolic:
+        return {"systolic": systolic, "diastolic": diastolic}
+    return None
+
+
+def _spo2(groups: Dict[str, Optional[str]]) -> Optional[Dict[str, object]]:
+    value = _number(groups["value"])
+    if not _within(value, 50, 100):
+        return None
+    on = groups["on"]
+    if on is not None:
+        flow = re.match(r"\d+", on)
+        on = f"{flow.group()} l/min" if flow else ("room air" if on in ("ra", "air", "room air") else "oxygen")
+    return {"spo2": value, "on": on}
+
+
+def _components(raw: Optional[str]) -> Dict[str, object]:
+    if raw is None:
+        return {}
+    eye, verbal, motor = re.match(r"e\s*(\d)\s*v\s*(\d|t)\s*m\s*(\d)", raw).groups()
+    return {"eye": int(eye), "verbal": "T" if verbal == "t" else int(verbal), "motor": int(motor)}
+
+
+def _gcs(groups: Dict[str, Optional[str]]) -> Optional[Dict[str, object]]:
+    total = _number(groups["total"])
+    parts = _components(groups["parts"])
+    if total is not None and not _within(total, 3, 15):
+        return None
+    if parts and not (1 <= parts["eye"] <= 4 and parts["verbal"] in ("T", 1, 2, 3, 4, 5) and 1 <= parts["motor"] <= 6):
+        return None
+    if total is None and parts and parts["verbal"] != "T":
+        total = parts["eye"] + parts["verbal"] + parts["motor"]
+    return {"total": total, **parts}
+
+
+_GCS_ITEMS = {"eye": ("eye", 4), "eyes": ("eye", 4), "verbal": ("verbal", 5), "motor": ("motor", 6)}
+
+
+def _gcs_item(groups: Dict[str, Optional[str]]) -> Optional[Dict[str, object]]:
+    item, high = _GCS_ITEMS[groups["item"]]
+    value = _number(groups["value"])
+    return {item: value} if _within(value, 1, high) else None
+
+
+_GCS_PARTS = r"e\s*\d\s*v\s*(?:\d|t)\s*m\s*\d"
+KINDS: Tuple[_Kind, ...] = (
+    _Kind(
+        "blood_pressure",
+        rf"\b(?:n?bp|b/p|blood\s+pressure){_SEP}(?P<sys>\d{{2,3}})\s*/\s*(?P<dia>\d{{2,3}}){_END}(?:\s*mmhg)?",
+        ("Blood Pressure.systolicBP", "Blood Pressure.diastolicBP"),
+        _blood_pressure,
+    ),
+    _Kind("systolic_bp", rf"\b(?:sbp|systolic(?:\s+bp)?){_SEP}{_NUM}{_END}(?:\s*mmhg)?", ("Blood Pressure.systolicBP",), _single("systolic", 40, 300)),
+    _Kind("diastolic_bp", rf"\b(?:dbp|diastolic(?:\s+bp)?){_SEP}{_NUM}{_END}(?:\s*mmhg)?", ("Blood Pressure.diastolicBP",), _single("diastolic", 20, 200)),
+    _Kind(
+        "spo2",
+        rf"\b(?:sp\s?o2|o2\s+sats?|sats?|saturations?|oxygen\s+saturations?){_SEP}{_NUM}{_END}\s*%?"
+        r"(?:\s*(?:on\s+)?(?P<on>room\s+air|ra|air|o2|oxygen|\d{1,2}\s*(?:lpm|l/min|l)\b))?",
+        ("Pulse Oximetry",),
+        _spo2,
+    ),
+    _Kind("resp_rate", rf"\b(?:rr|resps?|resp(?:iratory)?\s+rate){_SEP}{_NUM}{_END}(?:\s*(?:bpm|/min))?", ("Respiratory Rate.value",), _single("rr", 1, 80)),
+    _Kind(
+        "heart_rate",
+        rf"\b(?:hr|heart\s+rate|pulse(?:\s+rate)?){_SEP}{_NUM}{_END}(?:\s*bpm)?",
+        ("Circulatory Assessment.pulseRate",),
+        _single("hr", 20, 300),
+    ),
+    _Kind(
+        "gcs_item",
+        rf"\bgcs\s+(?P<item>eyes?|verbal|motor){_SEP}{_NUM}{_END}",
+        ("Glasgow Coma Scale.GCSItem",),
+        _gcs_item,
+    ),
+    _Kind(
+        "gcs",
+        rf"\b(?:gcs{_SEP}(?P<total>\d{{1,2}})(?:\s*/\s*15)?(?:\s*\(?\s*(?P<parts>{_GCS_PARTS})\s*\)?)?"
+        rf"|(?P<bare>{_GCS_PARTS}))\b",
+        ("Glasgow Coma Scale",),
+        _gcs,
+    ),
+    _Kind(
+        "blood_glucose",
+        rf"\b(?:bgl|bm|cbg|blood\s+(?:glucose|sugar)|glucose|sugar){_SEP}{_NUM}{_END}(?:\s*mmol(?:/l)?)?",
+        ("Blood Glucose.bloodGlucose", "Blood Glucose.value"),
+        _single("mmol_l", 0.5, 40),
+    ),
+    _Kind(
+        "temperature",
+        rf"\b(?:temp(?:erature)?){_SEP}{_NUM}{_END}(?:\s*(?:°\s*c|c\b|degrees))?",
+        ("Body Temperature.value",),
+        _single("celsius", 25, 45),
+    ),
+    _Kind("pain_score", rf"\bpain(?:\s+score)?{_SEP}{_NUM}\s*/\s*10\b", ("Pain Assessment.score",), _single("score", 0, 10)),
+)
+
+
+def _compile(kinds: Sequence[_Kind]) -> "re.Pattern[str]":
+    """One alternation behind a shared word boundary (so mid-word positions fail after one test).
+
+    Each kind's groups are renamed `<kind>__<group>` so the names stay unique; its first
+    unnamed group becomes `<kind>__value`.
+    """
+    parts = []
+    for kind in kinds:
+        assert kind.pattern.startswith(r"\b"), kind.name
+        body = re.sub(r"\(\?P<(\w+)>", lambda m: f"(?P<{kind.name}__{m.group(1)}>", kind.pattern[2:])
+        body = re.sub(r"(?<!\\)\((?!\?)", f"(?P<{kind.name}__value>", body, count=1)
+        parts.append(f"(?P<{kind.name}>{body})")
+    return re.compile(r"\b(?:" + "|".join(parts) + ")")
+
+
+@dataclass
+class Vital:
+    kind: str
+    text: str
+    values: Dict[str, object]
+    ids: List[str]
+
+    def to_meta(self) -> Dict[str, object]:
+        return {"kind": self.kind, "text": self.text, "values": self.values, "ids": self.ids}
+
+
+@dataclass
+class Vitals:
+    found: List[Vital] = field(default_factory=list)
+    only: bool = False  # Nothing but vitals and filler: the embedder can be skipped.
+
+    @property
+    def hits(self) -> Dict[str, RuleHit]:
+        hits: Dict[str, RuleHit] = {}
+        for vital in self.found:
+            for cid in vital.ids:
+                hit = hits.setdefault(cid, RuleHit(boost=MAX_RULE_BOOST, forced=True))
+                hit.why.append(f"vital: {vital.text}")
+        for hit in hits.values():
+            hit.why.append("forced_by_vitals")
+        return hits
+
+    def merge(self, rule_hits: Dict[str, RuleHit]) -> Dict[str, RuleHit]:
+        """Rule hits plus these vitals' forced hits on the same ids."""
+        if not self.found:
+            return rule_hits
+        merged = dict(rule_hits)
+        for cid, hit in self.hits.items():
+            existing = merged.get(cid)
+            merged[cid] = hit if existing is None else RuleHit(
+                boost=min(MAX_RULE_BOOST, existing.boost + hit.boost), forced=True, why=existing.why + hit.why
+            )
+        return merged
+
+    def to_meta(self) -> List[Dict[str, object]]:
+        return [vital.to_meta() for vital in self.found]
+
+
+class VitalsExtractor:
+    """KINDS compiled into one regex, with targets resolved to a catalog's ids."""
+
+    def __init__(self, ids: Sequence[str], kinds: Sequence[_Kind] = KINDS) -> None:
+        self.kinds = {kind.name: kind for kind in kinds}
+        self.pattern = _compile(kinds)
+        # Per kind: (group name without the kind prefix, group number), for parsing a match.
+        self._groups: Dict[str, List[Tuple[str, int]]] = {kind.name: [] for kind in kinds}
+        for name, number in self.pattern.groupindex.items():
+            kind, _, short = name.partition("__")
+            if short:
+                self._groups[kind].append((short, number))
+        by_parent: Dict[str, List[str]] = {}
+        for cid in ids:
+            by_parent.setdefault(cid.split(".", 1)[0], []).append(cid)
+        known = set(ids)
+        self._targets: Dict[str, List[str]] = {}
+        for kind in kinds:
+            resolved: List[str] = []
+            for target in kind.targets:
+                resolved.extend([target] if target in known else by_parent.get(target, []))
+            self._targets[kind.name] = resolved
+
+    def extract(self, text: str) -> Vitals:
+        if not _DIGIT_RE.search(text):  # Every reading has a number: most narrative skips the scan.
+            return Vitals()
+        lowered = text.lower()
+        found: List[Vital] = []
+        rest: List[str] = []
+        end = 0
+        for match in self.pattern.finditer(lowered):
+            name = match.lastgroup
+            groups = {short: match.group(number) for short, number in self._groups[name]}
+            if name == "gcs" and groups["bare"] is not None:
+                groups["parts"] = groups["bare"]
+            values = self.kinds[name].parse(groups)
+            ids = self._targets[name]
+            if values is None or not ids:
+                continue
+            rest.append(lowered[end : match.start()])
+            end = match.end()
+            found.append(Vital(name, text[match.start() : match.end()].strip(), values, ids))
+        if not found:
+            return Vitals()
+        rest.append(lowered[end:])
+        return Vitals(found, all(word in FILLER for word in tokenize(" ".join(rest))))
+
+
+def _bench(queries: int = 20000) -> None:
+    import json
+    from pathlib import Path
+    from time import perf_counter
+
+    from generate_categories import _special_examples
+
+    categories = json.loads((Path(__file__).resolve().parent / "categories.json").read_text(encoding="utf-8"))
+    extractor = VitalsExtractor([category["id"] for category in categories])
+    texts = {
+        "vitals_only": "BP 90/60, sats 88% ra, RR 28, GCS 12 E3V4M5, BGL 2.9",
+        "mixed": "central chest pain radiating to the left arm, sweaty, BP 90/60, HR 110",
+        "no_numbers": "fell down the stairs at home, pain in the right hip, unable to weight bear",
+    }
+    report: Dict[str, object] = {}
+    for label, text in texts.items():
+        start = perf_counter()
+        for _ in range(queries):
+            result = extractor.extract(text)
+        report[label] = {"us": round((perf_counter() - start) / queries * 1e6, 2), "found": len(result.found), "only": result.only}
+    # The generator's hand-written vitals examples (generate_categories._special_examples).
+    topics = ("gcs", "blood pressure", "systolic blood pressure", "blood glucose", "spo2", "respiratory rate", "temperature", "pain score")
+    examples = [example for topic in topics for example in _special_examples(topic) if any(ch.isdigit() for ch in example)]
+    report["generator_examples"] = {
+        "with_numbers": len(examples),
+        "extracted": sum(bool(extractor.extract(example).found) for example in examples),
+        "vitals_only": sum(extractor.extract(example).only for example in examples),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Vitals shorthand extraction.")
+    parser.add_argument("--bench", action="store_true", help="Time extraction per query.")
+    if parser.parse_args().bench:
+        _bench()